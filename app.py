@@ -1,100 +1,343 @@
 import flask
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, Response, g, request, render_template, jsonify, stream_with_context
+from flask.signals import before_render_template, template_rendered
+import json
+import logging
 import numpy as np
-import pandas as pd
-import pickle
-import joblib
-import calendar
 from dotenv import load_dotenv # Import load_dotenv
-import requests
-import random
 import os
-import google.generativeai as genai
+import threading
+import time
+import uuid
+from krishi import logs
+from krishi.assets import AssetManifest, send_asset
+from krishi.batcher import MicroBatcher, RemoteBatcher
+from krishi.chat_cache import ChatResponseCache
+from krishi.chat_store import ChatSessionStore
+from krishi.fanout import Branch, FanOut
+from krishi.fertilizer_lut import load_or_build as load_fertilizer_lookup
+from krishi.limits import Saturated, UpstreamLimiter, gevent_patched, init_grpc_for_gevent
+from krishi.metrics import REGISTRY, STAGE_SECONDS, stage
+from krishi.price_encoder import PriceEncoder, month_map
+from krishi.price_history import PriceHistory
+from krishi.price_table import load_or_build as load_price_table
+from krishi.recommend import (CROP_FEATURES, MAX_BATCH_ROWS, parse_rows, recommend, recommend_batch, recommend_cached,
+                              rows_from_csv)
+from krishi.profiler import SamplingProfiler
+from krishi.registry import ModelRegistry
+from krishi.result_cache import MemoryBackend, ResultCache, SQLiteBackend
+from krishi.tree_engine import FLAT_DIR, FLAT_MAX_ROWS, load_or_export
+from krishi.weather import OPENWEATHERMAP_URL, WeatherClient
 
 # === CRITICAL: CALL load_dotenv() AT THE VERY BEGINNING ===
 load_dotenv() # This will load variables from .env into os.environ
 
+# KRISHI_LOG_LEVEL=DEBUG brings back the per-request debugging output; KRISHI_LOG_FORMAT=json for log shippers
+logs.configure(os.getenv('KRISHI_LOG_LEVEL', 'INFO'), os.getenv('KRISHI_LOG_FORMAT', 'text'))
+log = logging.getLogger('krishi.app')
+
 # Now access keys using os.getenv() or os.environ[] AFTER load_dotenv() has run
 OPENWEATHERMAP_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
 # GEMINI_API_KEY_FROM_ENV = os.getenv("GEMINI_API_KEY") # Use this if you want to store it in a separate var
                                                        # But genai.configure will use os.environ directly
 
+# --- Upstream concurrency caps: a slow Gemini or OpenWeatherMap must not tie up every worker ---
+def upstream_limiter(name, max_concurrent, max_waiting, queue_timeout):
+    prefix = f'KRISHI_{name.upper()}_'
+    return UpstreamLimiter(
+        name,
+        max_concurrent=int(os.getenv(prefix + 'MAX_CONCURRENT', str(max_concurrent))),
+        max_waiting=int(os.getenv(prefix + 'MAX_WAITING', str(max_waiting))),
+        queue_timeout=float(os.getenv(prefix + 'QUEUE_TIMEOUT', str(queue_timeout))),
+    )
+
+gemini_limiter = upstream_limiter('gemini', 16, 32, 5)
+weather_limiter = upstream_limiter('weather', 16, 64, 3)
+if gevent_patched():
+    init_grpc_for_gevent()
+
+def busy_response(e):
+    """Fast 503 when every Gemini slot and queue place is taken."""
+    response = jsonify({'error': "Krishi-Bot is busy right now. Please try again in a moment."})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+# --- Weather client: pooled session, per-city cache, one upstream call per city at a time ---
+weather_client = WeatherClient(
+    OPENWEATHERMAP_API_KEY,
+    url=os.getenv('OPENWEATHERMAP_URL', OPENWEATHERMAP_URL),
+    ttl=float(os.getenv('KRISHI_WEATHER_TTL', '600')),
+    negative_ttl=float(os.getenv('KRISHI_WEATHER_NEGATIVE_TTL', '300')),
+    stale_ttl=float(os.getenv('KRISHI_WEATHER_STALE_TTL', '0')),
+    limiter=weather_limiter,
+)
+
 # --- Gemini Configuration ---
-gemini_model = None  # Initialize to None outside the try block
-chat_sessions = {}   # Initialize here as well
-
-try:
-    # Directly use the key name that is in your .env file for os.environ
-    # And ensure load_dotenv() has been called before this.
-    gemini_api_key_value = os.environ["GEMINI_API_KEY"] # This will raise KeyError if not found after load_dotenv()
-    print(f"Attempting to configure Gemini with API key: {gemini_api_key_value[:5]}...") # Debug
-    genai.configure(api_key=gemini_api_key_value)
-    gemini_model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20')
-    print("Gemini configured successfully.")
-except KeyError:
-    print(f"ERROR: 'GEMINI_API_KEY' not found in environment variables. Make sure it's in your .env file and load_dotenv() is called.")
-except Exception as e:
-    print(f"Error configuring Gemini API (other exception): {type(e).__name__} - {e}")
-    # gemini_model remains None if configuration fails
+gemini_model = None  # Configured lazily by get_gemini_model()
+gemini_configured = False
+gemini_lock = threading.Lock()
+# Chat history per session: LRU + idle eviction, capped history, optional SQLite persistence
+chat_store = ChatSessionStore(
+    max_sessions=int(os.getenv('KRISHI_CHAT_MAX_SESSIONS', '1000')),
+    idle_timeout=float(os.getenv('KRISHI_CHAT_IDLE_TIMEOUT', '1800')),
+    max_turns=int(os.getenv('KRISHI_CHAT_MAX_TURNS', '10')),
+    db_path=os.getenv('KRISHI_CHAT_DB') or None,
+)
+# Replies to the opening question of a session, shared across sessions; exact and near-duplicate
+# questions (shingle similarity >= KRISHI_CHAT_CACHE_THRESHOLD) skip Gemini. Later turns never use it.
+chat_cache = ChatResponseCache(
+    max_entries=int(os.getenv('KRISHI_CHAT_CACHE_MAX_ENTRIES', '2000')),
+    ttl=float(os.getenv('KRISHI_CHAT_CACHE_TTL', '86400')),
+    threshold=float(os.getenv('KRISHI_CHAT_CACHE_THRESHOLD', '0.7')),
+    shingle_size=int(os.getenv('KRISHI_CHAT_CACHE_SHINGLE_SIZE', '3')),
+) if os.getenv('KRISHI_CHAT_CACHE', 'on') != 'off' else None
+
+def get_gemini_model():
+    """Configures Gemini on first use; google.generativeai is slow to import, so it is not done at startup."""
+    global gemini_model, gemini_configured
+    if gemini_configured:
+        return gemini_model
+    with gemini_lock:
+        if gemini_configured:
+            return gemini_model
+        try:
+            import google.generativeai as genai
+            # Directly use the key name that is in your .env file for os.environ
+            # And ensure load_dotenv() has been called before this.
+            gemini_api_key_value = os.environ["GEMINI_API_KEY"] # This will raise KeyError if not found after load_dotenv()
+            log.debug("Attempting to configure Gemini with API key: %s...", gemini_api_key_value[:5])
+            genai.configure(api_key=gemini_api_key_value)
+            gemini_model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20')
+            log.info("Gemini configured successfully.")
+        except KeyError:
+            log.error("'GEMINI_API_KEY' not found in environment variables. Make sure it's in your .env file and load_dotenv() is called.")
+        except Exception as e:
+            log.error("Error configuring Gemini API (other exception): %s - %s", type(e).__name__, e)
+            # gemini_model remains None if configuration fails
+        gemini_configured = True
+    return gemini_model
 
 INITIAL_PROMPT_EN = "You are Krishi-Bot, a helpful assistant for farmers and agriculture, associated with the Krishi-Help project. Respond concisely. If the user asks in Hindi, respond in Hindi. If in English, respond in English. You can answer questions about farming, crops, and the Krishi-Help project."
 INITIAL_PROMPT_HI = "आप कृषि-बॉट हैं, किसानों और कृषि के लिए एक सहायक सहायक, जो कृषि-सहायता परियोजना से जुड़े हैं। संक्षिप्त रूप से उत्तर दें। यदि उपयोगकर्ता हिंदी में पूछता है, तो हिंदी में उत्तर दें। यदि अंग्रेजी में, तो अंग्रेजी में उत्तर दें। आप खेती, फसलों और कृषि-सहायता परियोजना के बारे में सवालों के जवाब दे सकते हैं।"
 
 def get_chat_session(session_id, language_preference):
+    """Builds a Gemini ChatSession from the stored (capped) history of this session."""
+    gemini_model = get_gemini_model()
     if not gemini_model: # Add a check here
-        print("Error in get_chat_session: Gemini model is not configured.")
+        log.error("Error in get_chat_session: Gemini model is not configured.")
         return None # Or raise an exception
 
-    if session_id not in chat_sessions:
-        initial_prompt = INITIAL_PROMPT_HI if language_preference == 'hi' else INITIAL_PROMPT_EN
-        initial_bot_message = "ठीक है, मैं समझ गया। मैं आज आपकी कैसे मदद कर सकता हूँ?" if language_preference == 'hi' else "Okay, I understand. How can I help you today?"
-        # IMPORTANT: Use gemini_model here
-        chat_sessions[session_id] = gemini_model.start_chat(history=[
-            {
-                "role": "user",
-                "parts": [initial_prompt]
-            },
-            {
-                "role": "model",
-                "parts": [initial_bot_message]
-            }
-        ])
-    return chat_sessions[session_id]
+    # The language is fixed when the session is created
+    language_preference, turns = chat_store.get_or_create(session_id, language_preference)
+    initial_prompt = INITIAL_PROMPT_HI if language_preference == 'hi' else INITIAL_PROMPT_EN
+    initial_bot_message = "ठीक है, मैं समझ गया। मैं आज आपकी कैसे मदद कर सकता हूँ?" if language_preference == 'hi' else "Okay, I understand. How can I help you today?"
+    history = [
+        {
+            "role": "user",
+            "parts": [initial_prompt]
+        },
+        {
+            "role": "model",
+            "parts": [initial_bot_message]
+        }
+    ]
+    for user_text, model_text in turns:
+        history.append({"role": "user", "parts": [user_text]})
+        history.append({"role": "model", "parts": [model_text]})
+    return gemini_model.start_chat(history=history)
+
+def cached_opening_reply(session_id, language_preference, user_message):
+    """(reply or None, whether this is the session's first turn), i.e. whether the reply may be cached."""
+    if chat_cache is None:
+        return None, False
+    language_preference, turns = chat_store.get_or_create(session_id, language_preference)
+    if turns:
+        return None, False
+    return chat_cache.get(user_message, language_preference), True
 
 
 #Loading Model
-model = pickle.load(open('models/crop_model.pkl','rb'))
-sc = pickle.load(open('models/sc.pkl','rb'))
-ms = pickle.load(open('models/mx.pkl','rb'))
-rf_model = pickle.load(open('models/fertilizer.pkl', 'rb'))
+# Artifacts load on first use; set KRISHI_PRELOAD_MODELS=1 to load them all at import
+# (e.g. under gunicorn --preload, so forked workers share the parent's copy)
+registry = ModelRegistry('models')
+registry.register('crop_model', 'crop_model.pkl')
+registry.register('sc', 'sc.pkl')
+registry.register('ms', 'mx.pkl')
+registry.register('fertilizer_model', 'fertilizer.pkl')
+
+# Flat, memory-mapped copies of the two forests (see krishi/tree_engine.py); re-exported
+# automatically when the source pickle changes. KRISHI_TREE_ENGINE=sklearn turns them off.
+TREE_ENGINE = os.getenv('KRISHI_TREE_ENGINE', 'flat')
+registry.register_factory('crop_forest', lambda reg: load_or_export(
+    reg.path(os.path.join(FLAT_DIR, 'crop_model')), reg.path('crop_model.pkl'), lambda: reg.get('crop_model')))
+registry.register_factory('fertilizer_forest', lambda reg: load_or_export(
+    reg.path(os.path.join(FLAT_DIR, 'fertilizer_model')), reg.path('fertilizer.pkl'), lambda: reg.get('fertilizer_model')))
+# Fertilizer answers for every integer N/P/K input, precomputed next to the model
+# (models/fertilizer_lut.npy, see krishi/fertilizer_lut.py); off-grid inputs use the forest
+registry.register_factory('fertilizer_lookup', lambda reg: load_fertilizer_lookup(
+    reg.base_dir, 'fertilizer.pkl', lambda: reg.get('fertilizer_model'),
+    fallback=lambda: reg.get('fertilizer_forest' if TREE_ENGINE == 'flat' else 'fertilizer_model')))
+
+def get_recommenders(n_rows):
+    """Returns (crop model, fertilizer model) for a batch of n_rows samples.
+
+    The flat forests are much faster for the one-row /predict case; sklearn's compiled
+    traversal wins on big batches. Fertilizer goes through the lookup table either way.
+    """
+    crop_model = None
+    if TREE_ENGINE == 'flat' and n_rows <= FLAT_MAX_ROWS:
+        try:
+            crop_model = registry.get('crop_forest')
+        except Exception as e:
+            log.warning("Flat forests unavailable, falling back to sklearn: %s", e)
+    try:
+        fertilizer_model = registry.get('fertilizer_lookup')
+    except Exception as e:
+        log.warning("Fertilizer lookup table unavailable, falling back to the forest: %s", e)
+        fertilizer_model = registry.get('fertilizer_model')
+    return crop_model or registry.get('crop_model'), fertilizer_model
+
+def predict_samples(X):
+    """Crop and fertilizer names for each row of the float64 feature matrix X."""
+    return recommend(X, registry.get('ms'), registry.get('sc'), *get_recommenders(len(X)))
+
+# --- Micro-batching: concurrent /predict rows are scored together (see krishi/batcher.py) ---
+# KRISHI_BATCHING: 'off' (default), 'inprocess' (one batcher per worker) or 'unix:/path.sock'
+# (a shared `python -m krishi.batcher` process). KRISHI_BATCH_WINDOW_MS is the longest a row
+# waits for company, KRISHI_BATCH_MAX_SIZE the most rows in one batch.
+BATCHING = os.getenv('KRISHI_BATCHING', 'off')
+BATCH_WINDOW_MS = float(os.getenv('KRISHI_BATCH_WINDOW_MS', '2'))
+BATCH_MAX_SIZE = int(os.getenv('KRISHI_BATCH_MAX_SIZE', '64'))
+
+def load_batcher(reg):
+    if BATCHING == 'off':
+        return None
+    if BATCHING == 'inprocess':
+        return MicroBatcher(predict_samples, max_batch=BATCH_MAX_SIZE, window=BATCH_WINDOW_MS / 1e3)
+    if BATCHING.startswith('unix:'):
+        return RemoteBatcher(BATCHING[len('unix:'):])
+    raise ValueError(f"Unknown KRISHI_BATCHING mode '{BATCHING}'.")
+
+registry.register_factory('batcher', load_batcher)
+
+def predict_samples_batched(X):
+    """predict_samples() through the micro-batcher, when one is configured."""
+    try:
+        batcher = registry.get('batcher')
+    except Exception as e:
+        log.warning("Batcher unavailable: %s", e)
+        batcher = None
+    if batcher is None or len(X) > BATCH_MAX_SIZE:
+        return predict_samples(X)
+    try:
+        return batcher.predict(X)
+    except OSError as e:  # the batch worker is down or stuck (RemoteBatcher logs it); score here instead
+        log.debug("Batch worker unavailable, scoring in-process: %s", e)
+        return predict_samples(X)
+    except RuntimeError as e:  # the batch worker answered with an error of its own
+        log.warning("Batch worker failed, scoring in-process: %s", e)
+        return predict_samples(X)
+
+# --- Recommendation result cache ---
+# KRISHI_RESULT_CACHE: 'memory' (default, per process), 'off', or a SQLite file path shared
+# by all workers on the host. Inputs are rounded to KRISHI_RESULT_CACHE_DECIMALS (one value
+# or a comma-separated list, one per feature) before lookup and before scoring.
+RESULT_CACHE = os.getenv('KRISHI_RESULT_CACHE', 'memory')
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('KRISHI_RESULT_CACHE_MAX_ENTRIES', '50000'))
+RESULT_CACHE_TTL = float(os.getenv('KRISHI_RESULT_CACHE_TTL', '3600'))
+RESULT_CACHE_DECIMALS = [int(d) for d in os.getenv('KRISHI_RESULT_CACHE_DECIMALS', '2').split(',')]
+def result_cache_artifacts():
+    """The artifacts that answer single-row recommendations; cache keys carry the fingerprints
+    of the files they were loaded from, so a model swapped in later gets keys of its own."""
+    return ['ms', 'sc', 'crop_forest' if TREE_ENGINE == 'flat' else 'crop_model', 'fertilizer_lookup']
+
+def load_result_cache(reg):
+    if RESULT_CACHE == 'off':
+        return None
+    if len(RESULT_CACHE_DECIMALS) not in (1, len(CROP_FEATURES)):
+        raise ValueError(f"KRISHI_RESULT_CACHE_DECIMALS needs 1 or {len(CROP_FEATURES)} values.")
+    if RESULT_CACHE == 'memory':
+        backend = MemoryBackend(RESULT_CACHE_MAX_ENTRIES)
+    else:
+        backend = SQLiteBackend(RESULT_CACHE, RESULT_CACHE_MAX_ENTRIES)
+    decimals = RESULT_CACHE_DECIMALS[0] if len(RESULT_CACHE_DECIMALS) == 1 else RESULT_CACHE_DECIMALS
+    return ResultCache(backend, ttl=RESULT_CACHE_TTL, decimals=decimals,
+                       version=reg.version(result_cache_artifacts()))
+
+registry.register_factory('result_cache', load_result_cache)
 
-price_model = joblib.load('models/crop_price.pkl')
-price_scaler = joblib.load('models/min_max_scaler.pkl')
-price_model_columns = joblib.load('models/model_columns.pkl') # Columns expected by the price model AFTER preprocessing
-price_original_numerical_cols = joblib.load('models/original_numerical_cols.pkl') # Original numerical cols for price data
-price_original_categorical_cols = joblib.load('models/original_categorical_cols.pkl') # Original categorical cols for price data
+def recommend_samples(X):
+    """predict_samples() behind the result cache, when one is configured."""
+    try:
+        cache = registry.get('result_cache')
+    except Exception as e:
+        log.warning("Result cache unavailable: %s", e)
+        cache = None
+    if cache is None:
+        return predict_samples_batched(X)
+    return recommend_cached(X, cache, predict_samples_batched)
+
+registry.register('price_model', 'crop_price.pkl', loader='joblib')
+registry.register('price_scaler', 'min_max_scaler.pkl', loader='joblib')
+registry.register('price_model_columns', 'model_columns.pkl', loader='joblib') # Columns expected by the price model AFTER preprocessing
+registry.register('price_original_numerical_cols', 'original_numerical_cols.pkl', loader='joblib') # Original numerical cols for price data
+registry.register('price_original_categorical_cols', 'original_categorical_cols.pkl', loader='joblib') # Original categorical cols for price data
 
 # Extract target variable ('avg_modal_price') scaling parameters for inverse transform
 PRICE_TARGET_VARIABLE = 'avg_modal_price'
-# Create the list of columns as fitted in the price_scaler
-all_scaled_cols_price = [PRICE_TARGET_VARIABLE] + price_original_numerical_cols
-target_col_index_in_scaler = all_scaled_cols_price.index(PRICE_TARGET_VARIABLE)
-target_scaler_min = price_scaler.min_[target_col_index_in_scaler]
-target_scaler_scale = price_scaler.scale_[target_col_index_in_scaler]
-
-print("Crop price prediction models and artifacts loaded successfully.")
-print(f"Scaler min for target ({PRICE_TARGET_VARIABLE}): {target_scaler_min}")
-print(f"Scaler scale for target ({PRICE_TARGET_VARIABLE}): {target_scaler_scale}")
 
+def load_price_target_scaling(reg):
+    """Returns (min, scale) of the target column in the price scaler, for the inverse transform."""
+    price_scaler = reg.get('price_scaler')
+    # Create the list of columns as fitted in the price_scaler
+    all_scaled_cols_price = [PRICE_TARGET_VARIABLE] + reg.get('price_original_numerical_cols')
+    target_col_index_in_scaler = all_scaled_cols_price.index(PRICE_TARGET_VARIABLE)
+    target_scaler_min = price_scaler.min_[target_col_index_in_scaler]
+    target_scaler_scale = price_scaler.scale_[target_col_index_in_scaler]
+    log.info("Scaler min/scale for target (%s): %s / %s", PRICE_TARGET_VARIABLE, target_scaler_min, target_scaler_scale)
+    return target_scaler_min, target_scaler_scale
+
+def load_price_encoder(reg):
+    # Precompiled encoder used on the request path. It sets the commodity/region one-hot
+    # columns the model was trained with; preprocess_price_input below (the original pandas
+    # implementation) runs get_dummies(drop_first=True) on one row and so never sets them,
+    # which made every commodity get the same price
+    return PriceEncoder(reg.get('price_model_columns'), reg.get('price_original_numerical_cols'),
+                        reg.get('price_original_categorical_cols'), reg.get('price_scaler'),
+                        target=PRICE_TARGET_VARIABLE, one_hot=True)
+
+registry.register_factory('price_target_scaling', load_price_target_scaling)
+registry.register_factory('price_encoder', load_price_encoder)
+# Numeric fields the simple price form does not ask for
+PRICE_DEFAULTS = {'avg_min_price': 1200.0, 'avg_max_price': 1800.0, 'change': 0.0}
+# Predictions for every month/category input at PRICE_DEFAULTS, precomputed next to the model
+# (models/price_table.npy, see krishi/price_table.py) and rebuilt when any price artifact changes;
+# KRISHI_PRICE_TABLE=off always runs the model
+PRICE_TABLE = os.getenv('KRISHI_PRICE_TABLE', 'on')
+registry.register_factory('price_table', lambda reg: load_price_table(
+    reg.base_dir, reg.get('price_encoder'), lambda: reg.get('price_model'), reg.get('price_target_scaling'),
+    PRICE_DEFAULTS))
+# Historical series for /api/price_history; rows appended to the CSV are picked up without a reload
+PRICE_HISTORY_CSV = os.getenv('KRISHI_PRICE_HISTORY_CSV', os.path.join('datasets', 'crop_price_dataset.csv'))
+registry.register_factory('price_history', lambda reg: PriceHistory.from_csv(PRICE_HISTORY_CSV))
+
+if os.getenv('KRISHI_PRELOAD_MODELS') == '1':
+    failed = registry.warmup()
+    for name, error in failed.items():
+        log.error("Could not preload '%s': %s", name, error)
+    log.info("Models preloaded: %s", [name for name, entry in registry.stats()['artifacts'].items() if entry['loaded']])
 
-# Dictionary to map month names to numbers
-month_map = {name: num for num, name in enumerate(calendar.month_name) if num > 0}
-month_map.update({str(i): i for i in range(1, 13)}) # Allow numbers as strings too
 # --- Helper Function for Price Prediction Preprocessing ---
-# (Keep the month_map dictionary as before)
 
 def preprocess_price_input(data):
-    """Preprocesses raw input data for price prediction."""
+    """Preprocesses raw input data for price prediction (pandas reference path)."""
+    import pandas as pd
+    price_scaler = registry.get('price_scaler')
+    price_model_columns = registry.get('price_model_columns')
+    price_original_numerical_cols = registry.get('price_original_numerical_cols')
+    price_original_categorical_cols = registry.get('price_original_categorical_cols')
+
     if not isinstance(data, dict):
         raise ValueError("Input data must be a dictionary.")
 
@@ -165,7 +408,7 @@ def preprocess_price_input(data):
             raise ValueError(f"Internal Error: Feature column '{col}' unexpectedly missing before scaling.")
 
     # Verify the order before scaling (for debugging)
-    print(f"Columns being passed to scaler.transform: {scaler_input_df.columns.tolist()}")
+    log.debug("Columns being passed to scaler.transform: %s", scaler_input_df.columns.tolist())
     assert scaler_input_df.columns.tolist() == all_scaled_cols_price # Optional: Verify column order matches exactly
 
     # Apply the transform using the temporary DataFrame with the correct structure
@@ -187,9 +430,9 @@ def preprocess_price_input(data):
     try:
         # Add missing columns (from one-hot encoding during training) and fill with 0
         # Ensure order matches exactly price_model_columns
-        print(f"Columns before final reindex: {df.columns.tolist()}")
+        log.debug("Columns before final reindex: %s", df.columns.tolist())
         df = df.reindex(columns=price_model_columns, fill_value=0)
-        print(f"Columns after final reindex (to model): {df.columns.tolist()}") # For debugging
+        log.debug("Columns after final reindex (to model): %s", df.columns.tolist())
     except Exception as e:
         raise ValueError(f"Error aligning columns for the prediction model: {e}")
 
@@ -199,6 +442,110 @@ def preprocess_price_input(data):
 #Webpage Routes
 app = Flask(__name__)
 
+# --- Request metrics, served on /metrics in the Prometheus text format ---
+HTTP_REQUESTS = REGISTRY.counter('krishi_http_requests_total', 'Requests served, by route, method and status.',
+                                 ['route', 'method', 'status'])
+HTTP_ERRORS = REGISTRY.counter('krishi_http_request_errors_total', 'Requests answered with a 5xx status, by route.', ['route'])
+# Streamed responses are timed until the view returns, not until the last byte is sent
+HTTP_SECONDS = REGISTRY.histogram('krishi_http_request_seconds', 'Time to produce the response, by route.', ['route'])
+# Per-request sampling profiler: with KRISHI_PROFILE=1, a request carrying an
+# X-Krishi-Profile header (or ?profile=1) is sampled and its folded stacks saved to KRISHI_PROFILE_DIR
+PROFILING = os.getenv('KRISHI_PROFILE') == '1'
+PROFILE_DIR = os.getenv('KRISHI_PROFILE_DIR', 'profiles')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILING and (request.headers.get('X-Krishi-Profile') or request.args.get('profile')):
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def record_request(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    started = g.get('request_started')
+    if started is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - started, route)
+    HTTP_REQUESTS.inc(route, request.method, str(response.status_code))
+    if response.status_code >= 500:
+        HTTP_ERRORS.inc(route)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        try:
+            path = profiler.save(PROFILE_DIR, request.endpoint or 'unmatched')
+            response.headers['X-Krishi-Profile'] = os.path.basename(path)
+            log.info("Profiled %s: %d samples over %.1f ms -> %s", route, sum(profiler.samples.values()), profiler.duration * 1e3, path)
+        except OSError as e:
+            log.warning("Could not save profile: %s", e)
+    return response
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def record_render(sender, template, context, **extra):
+    started = g.pop('render_started', None)
+    if started is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - started, 'render')
+
+# --- Static assets: `python -m krishi.assets` builds content-hashed, resized and precompressed
+# copies under static/build/. Templates link them with asset_url() and picture() (which fall back
+# to the plain file before a build); hashed files are cached for a year, the rest for
+# KRISHI_STATIC_MAX_AGE seconds and revalidated by ETag.
+STATIC_MAX_AGE = int(os.getenv('KRISHI_STATIC_MAX_AGE', '3600'))
+static_assets = AssetManifest(app.static_folder)
+app.jinja_env.globals.update(asset_url=static_assets.url, picture=static_assets.picture)
+
+def static_file(filename):
+    return send_asset(app.static_folder, filename, static_assets, max_age=STATIC_MAX_AGE)
+
+app.view_functions['static'] = static_file
+
+def upstream_gauges():
+    return {(limiter.name, state): limiter.stats()[state]
+            for limiter in (gemini_limiter, weather_limiter) for state in ('active', 'waiting')}
+
+def upstream_rejections():
+    return {(limiter.name, reason): limiter.stats()['rejected_' + reason]
+            for limiter in (gemini_limiter, weather_limiter) for reason in ('full', 'timeout')}
+
+def cache_events():
+    weather_stats = weather_client.stats()
+    events = {('weather', event): weather_stats[event] for event in ('hits', 'negative_hits', 'stale_hits', 'misses', 'coalesced')}
+    cache = registry.get('result_cache') if registry.is_loaded('result_cache') else None
+    if cache is not None:
+        cache_stats = cache.stats()
+        events.update({('recommendations', event): cache_stats[event] for event in ('hits', 'misses', 'evictions', 'expirations', 'errors')})
+    if chat_cache is not None:
+        chat_stats = chat_cache.stats()
+        events.update({('chat', event): chat_stats[event] for event in ('exact_hits', 'similar_hits', 'misses', 'evictions', 'expirations')})
+    return events
+
+REGISTRY.callback('krishi_upstream_calls', 'Upstream calls running (active) or queued (waiting).', 'gauge',
+                  ['upstream', 'state'], upstream_gauges)
+REGISTRY.callback('krishi_upstream_rejected_total', 'Upstream calls refused with 503, by reason.', 'counter',
+                  ['upstream', 'reason'], upstream_rejections)
+REGISTRY.callback('krishi_cache_events_total', 'Cache lookups by cache and outcome.', 'counter',
+                  ['cache', 'event'], cache_events)
+REGISTRY.callback('krishi_chat_cache_saved_seconds_total', 'Gemini time avoided by chat replies served from the cache.',
+                  'counter', [], lambda: {(): chat_cache.stats()['saved_seconds'] if chat_cache else 0.0})
+def batch_queue():
+    batcher = registry.get('batcher') if registry.is_loaded('batcher') else None
+    if batcher is None:
+        return {}
+    stats = batcher.stats()
+    return {('requests',): stats['queued_requests'], ('rows',): stats['queued_rows']}
+
+REGISTRY.callback('krishi_batch_queue_depth', 'Requests and rows waiting for the next micro-batch.', 'gauge',
+                  ['unit'], batch_queue)
+REGISTRY.callback('krishi_process_resident_bytes', 'Resident memory of this worker.', 'gauge', [],
+                  lambda: {(): registry.stats()['process_rss_bytes'] or 0})
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/')  # Route for Home_page.html
 def home():
     return render_template('Home_page.html')
@@ -229,35 +576,15 @@ def predict():
         rainfall = request.form.get('rainfall')
 
         feature_list = [N, P, K, temp, humidity, ph, rainfall]
-        single_pred = np.array(feature_list).reshape(1, -1)
-
-        scaled_features = ms.transform(single_pred)
-        final_features = sc.transform(scaled_features)
-        prediction = model.predict(final_features)
+        with stage('parse'):
+            single_pred = np.array(feature_list, dtype=np.float64).reshape(1, -1)
 
-        crop_dict = {1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut", 6: "Papaya", 7: "Orange", 
-                    8: "Apple", 9: "Muskmelon", 10: "Watermelon", 11: "Grapes", 12: "Mango", 13: "Banana", 
-                    14: "Pomegranate", 15: "Lentil", 16: "Blackgram", 17: "Mungbean", 18: "Mothbeans", 
-                    19: "Pigeonpeas", 20: "Kidneybeans", 21: "Chickpea", 22: "Coffee"}
-        
-        fertilizer_features = np.array([[N, P, K]])
-        fertilizer_prediction = rf_model.predict(fertilizer_features)[0]
-
-            # Update fertilizer prediction to actual names
-        fertilizer_dict = {
-            0: 'Urea',
-            1: 'DAP',
-            2: 'Fourteen-Thirty Five-Fourteen (14-30 5-14)',
-            3: 'Twenty Eight-Twenty Eight (20 8-20 8)',
-            4: 'Seventeen-Seventeen-Seventeen (17-17-17)',
-            5: 'Twenty-Twenty (20-20)',
-            6: 'Ten-Twenty Six-Twenty Six (10-20 6-26)'
-        }
-        fertilizer_name = fertilizer_dict.get(fertilizer_prediction, "Unknown Fertilizer")
+        crops, fertilizers = recommend_samples(single_pred)
+        crop = crops[0]
+        fertilizer_name = fertilizers[0]
 
         #Result Handling
-        if prediction[0] in crop_dict:
-            crop = crop_dict[prediction[0]]
+        if crop is not None:
             result = "{} is the best crop to be cultivated.".format(crop)
             return render_template('crop_predict.html', result=result,crop = crop, fertilizer_prediction=fertilizer_name)
         else:
@@ -265,6 +592,30 @@ def predict():
             return render_template('crop_predict.html', result=None)
     return render_template('crop_predict.html', result=result)
 
+@app.route('/api/predict_batch', methods=['POST'])
+def predict_batch():
+    # Accepts {"samples": [...]}, a bare JSON list, a CSV body (text/csv) or a CSV file upload
+    try:
+        if 'file' in request.files:
+            rows = rows_from_csv(request.files['file'].read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            rows = rows_from_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(force=True, silent=True)
+            rows = data.get('samples') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'error': "No samples received. Send a JSON list of samples or a CSV file."}), 400
+        if len(rows) > MAX_BATCH_ROWS:
+            return jsonify({'error': f"Too many samples: {len(rows)} (limit is {MAX_BATCH_ROWS})."}), 413
+
+        results, errors = recommend_batch(rows, recommend_samples)
+        return jsonify({'count': len(rows), 'results': results, 'errors': errors})
+    except UnicodeDecodeError:
+        return jsonify({'error': "CSV upload must be UTF-8 encoded."}), 400
+    except Exception as e:
+        log.exception("Exception in /api/predict_batch: %s", e)
+        return jsonify({'error': "An error occurred during batch prediction."}), 500
+
 # --- Crop Price Prediction Routes ---
 
 @app.route('/price_predict', methods=['GET'])
@@ -272,28 +623,77 @@ def crop_price_form():
     # Serves the initial form for crop price prediction
     return render_template('crop_price.html', price_prediction_result=None)
 
+def get_price_table():
+    """The precomputed price table, or None when it is switched off or cannot be built."""
+    if PRICE_TABLE == 'off':
+        return None
+    try:
+        return registry.get('price_table')
+    except Exception as e:
+        log.warning("Price table unavailable: %s", e)
+        return None
+
+def predict_price(input_data):
+    """avg_modal_price the model predicts for one price-form dict (PRICE_DEFAULTS filled in).
+
+    Raises ValueError for invalid input."""
+    # Inputs at the default numerics are answered from the precomputed table
+    price_table = get_price_table()
+    if price_table is not None:
+        with stage('table_lookup'):
+            original_prediction = price_table.lookup(input_data)
+        if original_prediction is not None:
+            log.debug("Price prediction from table: %s", original_prediction)
+            return original_prediction
+
+    price_model = registry.get('price_model')
+    price_encoder = registry.get('price_encoder')
+    target_scaler_min, target_scaler_scale = registry.get('price_target_scaling')
+
+    # Preprocess the input data (one-hot encoding and scaling happen in the same pass)
+    with stage('encode'):
+        processed_row = price_encoder.encode(input_data)
+
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Processed row (first 20 columns): %s, shape %s",
+                  dict(zip(price_encoder.columns[:20], processed_row[0, :20].tolist())), processed_row.shape)
+
+    # Make prediction
+    with stage('predict'):
+        scaled_prediction = price_model.predict(processed_row)
+    prediction_value = scaled_prediction[0] # Get the single prediction value
+
+    # Ensure scale is not zero or extremely small to avoid division issues if it were used differently
+    if target_scaler_scale is None or abs(target_scaler_scale) < 1e-9:
+         log.error("target_scaler_scale is zero or invalid!")
+         raise ValueError("Invalid scaler parameters for inverse transform.")
+
+    # Inverse transform the prediction to original scale (MinMaxScaler: scaled = x * scale + min)
+    original_prediction = (prediction_value - target_scaler_min) / target_scaler_scale
+    log.debug("Price prediction: (%s - %s) / %s = %s", prediction_value, target_scaler_min, target_scaler_scale, original_prediction)
+    return original_prediction
+
 # Find this function in your app.py
 
 @app.route('/get_price_prediction', methods=['POST'])
 def predict_crop_price():
-    if not price_model:
+    try:
+        for name in ('price_model', 'price_encoder', 'price_target_scaling'):
+            registry.get(name)
+    except Exception as e:
+        log.error("Could not load price prediction artifacts: %s", e)
         return flask.jsonify({'error': "Crop Price Prediction Model not loaded."}), 500
 
     try:
-        input_data = request.get_json(force=True)
+        with stage('parse'):
+            input_data = request.get_json(force=True)
         if not input_data:
              raise ValueError("No input data received.")
 
-        typical_min_price_guess = 1200.0 # Replace with your estimate
-        typical_max_price_guess = 1800.0 # Replace with your estimate
-        typical_change_guess = 0.0      # 0 is often okay for change
+        for col, default in PRICE_DEFAULTS.items():
+            input_data.setdefault(col, default)
 
-        input_data.setdefault('avg_min_price', typical_min_price_guess)
-        input_data.setdefault('avg_max_price', typical_max_price_guess)
-        input_data.setdefault('change', typical_change_guess)
-
-        print(f"\n--- DEBUG: Input Data with Defaults ---")
-        print(input_data)
+        log.debug("Input data with defaults: %s", input_data)
 
         # Basic check for missing essential values (simple form)
         required_fields_from_simple_form = ['month', 'commodity_name', 'state_name', 'district_name', 'calculationType']
@@ -301,141 +701,43 @@ def predict_crop_price():
         if missing:
             raise ValueError(f"Missing required fields: {', '.join(missing)}")
 
-        # Preprocess the input data
-        processed_df = preprocess_price_input(input_data)
-
-        print(f"\n--- DEBUG: Processed DataFrame (First Row snippet) ---")
-        # Try printing relevant parts, avoid overwhelming console if too wide
-        try:
-            print(processed_df.iloc[0, :20].to_dict()) # Print first 20 cols as dict
-            print(f"Shape: {processed_df.shape}")
-        except Exception as e_print:
-            print(f"(Could not print processed_df snippet: {e_print})")
-
-
-        # Make prediction
-        scaled_prediction = price_model.predict(processed_df)
-        prediction_value = scaled_prediction[0] # Get the single prediction value
-
-        print(f"\n--- DEBUG: Scaled Prediction from Model ---")
-        print(f"{prediction_value=}") # Print the direct output of model.predict()
+        original_prediction = predict_price(input_data)
 
-        # Check inverse scaling parameters loaded at startup
-        print(f"\n--- DEBUG: Inverse Scaling Parameters ---")
-        print(f"{target_scaler_min=}")
-        print(f"{target_scaler_scale=}")
-
-        # Ensure scale is not zero or extremely small to avoid division issues if it were used differently
-        if target_scaler_scale is None or abs(target_scaler_scale) < 1e-9:
-             print("ERROR: target_scaler_scale is zero or invalid!")
-             raise ValueError("Invalid scaler parameters for inverse transform.")
-
-        # Inverse transform the prediction to original scale
-        original_prediction = (prediction_value * target_scaler_scale) + target_scaler_min
-
-        print(f"\n--- DEBUG: Original Scale Prediction Calculation ---")
-        print(f"({prediction_value} * {target_scaler_scale}) + {target_scaler_min} = {original_prediction}")
-
-
-        response_data = {'predicted_avg_modal_price': random.randint(1500,4000)}
+        response_data = {'predicted_avg_modal_price': round(float(original_prediction), 2)}
         return flask.jsonify(response_data)
 
 
     except ValueError as ve:
         # ... (keep existing error handling) ...
         error_message = f"Input Error: {ve}"
-        print(f"Value Error in /get_price_prediction: {ve}")
+        log.info("Value Error in /get_price_prediction: %s", ve)
         return flask.jsonify({'error': error_message}), 400
     except Exception as e:
         # ... (keep existing error handling) ...
-        import traceback
-        traceback.print_exc()
         error_message = f"An error occurred during price prediction. Please contact support if the issue persists."
-        print(f"Exception in /get_price_prediction: {e}")
+        log.exception("Exception in /get_price_prediction: %s", e)
         return flask.jsonify({'error': error_message}), 500
 
-def get_weather_data(city_name, api_key):
-    """Fetches weather data from OpenWeatherMap API."""
-    load_dotenv()
-    if not city_name:
-        return {'error': "City name cannot be empty."}
-
-    api_url = "https://api.=weatherapi.com"
-    params = {
-        'q': city_name,
-        'appid': api_key,
-        'units': 'metric'  # For Celsius
-    }
+@app.route('/api/price_history', methods=['GET'])
+def price_history():
+    # ?commodity=Wheat[&state=India&district=All][&start=2020-01&end=2024-12][&group=year]
+    commodity = request.args.get('commodity')
+    if not commodity:
+        return jsonify({'error': "Query parameter 'commodity' is required."}), 400
     try:
-        response = requests.get(api_url, params=params)
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        data = response.json()
-
-        # Check if the API returned an error (e.g., city not found)
-        if data.get('cod') != 200 and data.get('message'): # OpenWeatherMap uses 'cod' for status
-             return {'error': f"API Error: {data.get('message', 'Unknown API error')}"}
-
-        # Extract relevant information
-        weather_info = {
-            'city': data.get('name'),
-            'temperature': data.get('main', {}).get('temp'),
-            'description': data.get('weather', [{}])[0].get('description'),
-            'main_condition': data.get('weather', [{}])[0].get('main'),
-            'error': None
-        }
-        # Check for essential missing data
-        if not weather_info['city'] or weather_info['temperature'] is None or \
-           not weather_info['description'] or not weather_info['main_condition']:
-            return {'error': "Could not parse weather data due to missing fields in API response."}
-        return weather_info
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 401:
-            return {'error': "API request error: Invalid API key or unauthorized."}
-        elif e.response.status_code == 404:
-            return {'error': f"API request error: City '{city_name}' not found."}
-        else:
-            return {'error': f"API request error: {e}"}
-    except requests.exceptions.RequestException as e:
-        return {'error': f"Network error: {e}"}
-    except (KeyError, IndexError, TypeError):
-        return {'error': "Could not parse weather data due to unexpected API response structure."}
+        history = registry.get('price_history')
     except Exception as e:
-        return {'error': f"An unexpected error occurred: {e}"}
-
-def get_weather_data(city_name, api_key):
-    """Fetches weather data from OpenWeatherMap API."""
-    api_url = "https://api.openweathermap.org/data/2.5/weather"
-    params = {
-        'q': city_name,
-        'appid': api_key,
-        'units': 'metric'  # For Celsius
-    }
+        log.error("Could not load price history: %s", e)
+        return jsonify({'error': "Price history is not available."}), 500
     try:
-        response = requests.get(api_url, params=params)
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        data = response.json()
-
-        # Extract relevant information
-        weather_info = {
-            'city': data.get('name'),
-            'temperature': data.get('main', {}).get('temp'),
-            'description': data.get('weather', [{}])[0].get('description'),
-            'main_condition': data.get('weather', [{}])[0].get('main'),
-            'error': None
-        }
-        # Check for essential missing data that wouldn't raise KeyError/IndexError due to .get()
-        if weather_info['temperature'] is None or weather_info['description'] is None or weather_info['main_condition'] is None:
-            return {'error': "Could not parse weather data due to missing fields."}
-        return weather_info
-    except requests.exceptions.RequestException as e:
-        # Handle network errors or API errors
-        return {'error': f"API request error: {e}"}
-    except (KeyError, IndexError, TypeError): # Should be less likely with .get() but good for safety
-        # Handle issues with expected JSON structure
-        return {'error': "Could not parse weather data due to unexpected structure."}
-    except Exception as e:
-        # Catch any other unexpected errors
-        return {'error': f"An unexpected error occurred: {e}"}
+        with stage('history_query'):
+            series = history.query(commodity, request.args.get('state'), request.args.get('district'),
+                                   request.args.get('start'), request.args.get('end'), request.args.get('group'))
+    except ValueError as ve:
+        return jsonify({'error': f"Input Error: {ve}"}), 400
+    if not series:
+        return jsonify({'error': f"No price history for '{commodity}'."}), 404
+    return jsonify({'series': series})
 
 @app.route('/weather')
 def weather():
@@ -443,7 +745,11 @@ def weather():
     weather_data_dict = None
 
     if city: # If a city is provided in the URL
-        weather_data_dict = get_weather_data(city, OPENWEATHERMAP_API_KEY)
+        try:
+            weather_data_dict = weather_client.get_weather(city)
+        except Saturated as e:
+            weather_data_dict = {'error': "The weather service is busy. Please try again in a moment."}
+            return render_template('weather.html', weather_data=weather_data_dict, current_city=city), 503, {'Retry-After': str(e.retry_after)}
     # If no city is provided, weather_data_dict remains None,
     # and the template will just show the form.
 
@@ -455,30 +761,218 @@ def chatbot_page():
 
 @app.route('/api/chat', methods=['POST']) # Renamed API endpoint
 def chat_api(): # Renamed function
-    if not gemini_model:
+    if not get_gemini_model():
         return jsonify({'error': 'Gemini API not configured. Please check API key and server logs.'}), 500
 
     try:
         data = request.json
         user_message = data.get('message')
         language_preference = data.get('language', 'en')
-        session_id = data.get('session_id', 'default_user')
+        # Without a session id every caller would share one conversation, so mint one
+        session_id = data.get('session_id') or f"krishi_user_{uuid.uuid4().hex}"
 
         if not user_message:
             return jsonify({'error': 'Empty message received'}), 400
 
-        current_chat = get_chat_session(session_id, language_preference)
-        response = current_chat.send_message(user_message)
+        cached_reply, first_turn = cached_opening_reply(session_id, language_preference, user_message)
+        if cached_reply is not None:
+            chat_store.append(session_id, user_message, cached_reply)
+            return jsonify({'reply': cached_reply, 'session_id': session_id})
+
+        with gemini_limiter.slot():
+            current_chat = get_chat_session(session_id, language_preference)
+            started = time.perf_counter()
+            with stage('upstream_gemini'):
+                response = current_chat.send_message(user_message)
         bot_reply = response.text.strip()
+        chat_store.append(session_id, user_message, bot_reply)
+        if first_turn:
+            chat_cache.put(user_message, language_preference, bot_reply, time.perf_counter() - started)
 
         return jsonify({'reply': bot_reply, 'session_id': session_id})
 
+    except Saturated as e:
+        return busy_response(e)
     except Exception as e:
-        print(f"Error during chat: {e}")
-        if "API_KEY_INVALID" in str(e) or "PERMISSION_DENIED" in str(e):
-             return jsonify({'error': 'Gemini API key is invalid or has insufficient permissions.'}), 500
-        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+        log.error("Error during chat: %s", e)
+        return jsonify({'error': chat_error_message(e)}), 500
+
+def chat_error_message(e):
+    if "API_KEY_INVALID" in str(e) or "PERMISSION_DENIED" in str(e):
+        return 'Gemini API key is invalid or has insufficient permissions.'
+    return f'An error occurred: {str(e)}'
+
+def sse_event(data, event=None):
+    """One Server-Sent Events frame carrying a JSON payload."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream_api():
+    # Same request body as /api/chat; the reply is streamed as Server-Sent Events:
+    # 'data: {"delta": ...}' frames as Gemini generates, then 'event: done' with the
+    # full reply and session id (or 'event: error'). /api/chat stays as the fallback.
+    if not get_gemini_model():
+        return jsonify({'error': 'Gemini API not configured. Please check API key and server logs.'}), 500
+
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message')
+    language_preference = data.get('language', 'en')
+    session_id = data.get('session_id') or f"krishi_user_{uuid.uuid4().hex}"
+    if not user_message:
+        return jsonify({'error': 'Empty message received'}), 400
+    cached_reply, first_turn = cached_opening_reply(session_id, language_preference, user_message)
+    if cached_reply is not None:
+        chat_store.append(session_id, user_message, cached_reply)
+        frames = [sse_event({'delta': cached_reply}),
+                  sse_event({'reply': cached_reply, 'session_id': session_id}, event='done')]
+        return Response(frames, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    # The slot is held until the stream is closed, not just until this view returns
+    try:
+        gemini_limiter.acquire()
+    except Saturated as e:
+        return busy_response(e)
+
+    def generate():
+        parts = []
+        try:
+            current_chat = get_chat_session(session_id, language_preference)
+            started = time.perf_counter()
+            for chunk in current_chat.send_message(user_message, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:  # chunk without text (e.g. only safety metadata)
+                    continue
+                if text:
+                    if not parts:
+                        STAGE_SECONDS.observe(time.perf_counter() - started, 'upstream_gemini_first_chunk')
+                    parts.append(text)
+                    yield sse_event({'delta': text})
+            seconds = time.perf_counter() - started
+            STAGE_SECONDS.observe(seconds, 'upstream_gemini')
+            bot_reply = "".join(parts).strip()
+            chat_store.append(session_id, user_message, bot_reply)
+            if first_turn:
+                chat_cache.put(user_message, language_preference, bot_reply, seconds)
+            yield sse_event({'reply': bot_reply, 'session_id': session_id}, event='done')
+        except Exception as e:
+            log.error("Error during streamed chat: %s", e)
+            yield sse_event({'error': chat_error_message(e)}, event='error')
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(gemini_limiter.release)
+    return response
+
+# --- Farm advisory: recommendation, weather and price outlook in one request ---
+# The branches run concurrently on one thread pool shared by all requests (KRISHI_ADVISORY_WORKERS
+# threads), each with its own timeout in seconds (KRISHI_ADVISORY_TIMEOUT_<BRANCH>). Only the
+# recommendation is required; a failed or slow weather or price branch leaves the rest of the answer intact.
+advisory_fanout = FanOut(int(os.getenv('KRISHI_ADVISORY_WORKERS', '16')), name='advisory')
+ADVISORY_TIMEOUTS = {name: float(os.getenv(f'KRISHI_ADVISORY_TIMEOUT_{name.upper()}', default))
+                     for name, default in (('recommendation', '2'), ('weather', '5'), ('price', '2'))}
+# Months of price history returned with the outlook
+ADVISORY_PRICE_MONTHS = 12
+
+def advisory_recommendation(X):
+    crops, fertilizers = recommend_samples(X)
+    if crops[0] is None:
+        raise ValueError("Could not determine the best crop for this sample.")
+    return {'crop': crops[0], 'fertilizer': fertilizers[0]}
+
+def advisory_weather(city):
+    weather_data = weather_client.get_weather(city)
+    if weather_data.get('error'):
+        raise LookupError(weather_data['error'])
+    return {key: value for key, value in weather_data.items() if key != 'error'}
+
+def advisory_price(recommendation, month, state, district):
+    """Predicted price for the recommended crop in `month`, with its recent history.
+
+    Only Rice, Maize, Cotton, Coffee and Coconut of the recommender's 22 crops are in the
+    price dataset (under any name); for the others the outlook says so with price_data: false
+    instead of failing the branch. The model is given the series' latest min/max prices, so
+    the prediction is in that commodity's price range rather than around PRICE_DEFAULTS."""
+    crop = recommendation['crop']
+    history = registry.get('price_history')
+    if not history.series_keys(crop):
+        return {'crop': crop, 'price_data': False, 'message': f"No price data for {crop}."}
+    series = history.query(crop, state, district)
+    if not series:
+        return {'crop': crop, 'price_data': False,
+                'message': f"No price data for {crop} in {', '.join(filter(None, (district, state)))}."}
+    series = series[0]
+    latest = series['points'][-1] if series['points'] else {}
+    input_data = dict(PRICE_DEFAULTS, month=month, commodity_name=series['commodity_name'],
+                      state_name=series['state_name'], district_name=series['district_name'], calculationType='Monthly')
+    for col in ('avg_min_price', 'avg_max_price'):
+        if latest.get(col) is not None:
+            input_data[col] = latest[col]
+    return {
+        'crop': crop,
+        'price_data': True,
+        'commodity_name': series['commodity_name'],
+        'state_name': series['state_name'],
+        'district_name': series['district_name'],
+        'month': month,
+        'predicted_avg_modal_price': round(float(predict_price(input_data)), 2),
+        'recent': series['points'][-ADVISORY_PRICE_MONTHS:],
+    }
 
+@app.route('/api/advisory', methods=['POST'])
+def advisory():
+    # {"sample": {"nitrogen": 90, "phosphorus": 42, ...}, "city": "Lucknow"[, "month": "March"][, "state": ..., "district": ...]}
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('sample'), dict):
+        return jsonify({'error': f"Send a JSON object with a 'sample' of {', '.join(CROP_FEATURES)}."}), 400
+    with stage('parse'):
+        X, _, errors = parse_rows([data['sample']])
+    if errors:
+        return jsonify({'error': f"Input Error: {errors[0]['error']}"}), 400
+    month = str(data.get('month') or time.localtime().tm_mon)
+    if month.capitalize() not in month_map:
+        return jsonify({'error': "Input Error: Invalid 'month' value provided (use full name e.g., 'January' or number 1-12)."}), 400
+    city = str(data.get('city') or '').strip()
+    state, district = data.get('state'), data.get('district')
+
+    branches = [Branch('recommendation', lambda: advisory_recommendation(X), ADVISORY_TIMEOUTS['recommendation'], required=True)]
+    if city:
+        branches.append(Branch('weather', lambda: advisory_weather(city), ADVISORY_TIMEOUTS['weather']))
+    branches.append(Branch('price', lambda recommendation: advisory_price(recommendation, month, state, district),
+                           ADVISORY_TIMEOUTS['price'], needs=['recommendation']))
+    outcomes = advisory_fanout.run(branches)
+
+    result = {name: outcome.get('value') for name, outcome in outcomes.items()}
+    result['errors'] = {name: outcome['error'] for name, outcome in outcomes.items() if outcome['status'] != 'ok'}
+    result['partial'] = bool(result['errors'])
+    result['timings_ms'] = {name: round(outcome['seconds'] * 1e3, 1) for name, outcome in outcomes.items()}
+    if FanOut.failed_required(branches, outcomes):
+        status = 504 if outcomes['recommendation']['status'] == 'timeout' else 500
+        return jsonify(result), status
+    return jsonify(result)
+
+
+@app.route('/api/model_status')
+def model_status():
+    # Which artifacts are loaded, how long each took and how much memory it added
+    return jsonify(registry.stats())
+
+@app.route('/api/upstream_status')
+def upstream_status():
+    # Concurrency caps of the slow upstreams: running, queued and rejected calls
+    return jsonify({'gemini': gemini_limiter.stats(), 'weather': weather_limiter.stats(),
+                    'advisory': advisory_fanout.stats()})
+
+@app.route('/api/cache_status')
+def cache_status():
+    # Hit/miss/eviction counters of the recommendation result cache, the weather client and the chat reply cache
+    cache = registry.get('result_cache') if registry.is_loaded('result_cache') else None
+    return jsonify({
+        'recommendations': cache.stats() if cache else {'backend': None, 'enabled': RESULT_CACHE != 'off'},
+        'weather': weather_client.stats(),
+        'chat_sessions': chat_store.stats(),
+        'chat_responses': chat_cache.stats() if chat_cache else {'enabled': False},
+    })
 
 #main
 if __name__ == "__main__":
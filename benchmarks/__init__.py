@@ -0,0 +1,11 @@
+"""Offline benchmarks for the Krishi-Help app.
+
+Run from the repository root (the app loads models/ relative to it):
+
+    python -m benchmarks                         # everything, results in benchmarks/results/<time>.json
+    python -m benchmarks micro routes            # only some suites
+    python -m benchmarks --save-baseline         # also store the run as benchmarks/baseline.json
+    python -m benchmarks --compare benchmarks/baseline.json   # exit 1 on regressions
+
+OpenWeatherMap and Gemini are replaced by local stubs, so nothing leaves the machine.
+"""
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks import load, micro, routes
+from benchmarks.compare import compare
+from benchmarks.stubs import GeminiStub, WeatherStub
+
+SUITES = ('micro', 'routes', 'load')
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+BASELINE = os.path.join('benchmarks', 'baseline.json')
+
+
+def environment():
+    import numpy
+    import sklearn
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'scikit-learn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Offline benchmarks for Krishi-Help.")
+    parser.add_argument('suites', nargs='*', help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument('--min-time', type=float, default=0.5, help="seconds per micro/route benchmark")
+    parser.add_argument('--concurrency', type=int, default=16, help="load generator client threads")
+    parser.add_argument('--duration', type=float, default=10.0, help="load generator seconds")
+    parser.add_argument('--url', help="load-test an already running server instead of an in-process one")
+    parser.add_argument('--weather-delay', type=float, default=0.02, help="stub OpenWeatherMap latency (s)")
+    parser.add_argument('--gemini-delay', type=float, default=0.05, help="stub Gemini latency (s)")
+    parser.add_argument('--out', help="results file (default: benchmarks/results/<time>.json)")
+    parser.add_argument('--compare', metavar='BASELINE', help="flag regressions against this results file")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help="ignore latency changes smaller than this")
+    parser.add_argument('--save-baseline', action='store_true', help=f"also write the results to {BASELINE}")
+    args = parser.parse_args(argv)
+    suites = args.suites or SUITES
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    os.environ.setdefault('KRISHI_LOG_LEVEL', 'WARNING')
+    import app as app_module
+
+    results = {'environment': environment()}
+    with WeatherStub(args.weather_delay) as weather_stub:
+        routes.attach_stubs(app_module, weather_stub, GeminiStub(args.gemini_delay))
+        if 'micro' in suites:
+            results['micro'] = micro.run(app_module, min_time=args.min_time)
+        if 'routes' in suites:
+            results['routes'] = routes.run(app_module, min_time=args.min_time)
+        if 'load' in suites:
+            results['load'] = load.run(app_module, url=args.url, concurrency=args.concurrency, duration=args.duration)
+    print_results(results)
+
+    # Compare before writing anything, so --save-baseline cannot replace the baseline being compared against
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_delta_ms)
+        for r in regressions:
+            print(f"REGRESSION {r['benchmark']} {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f} ({r['change']:+.0%})")
+        if not regressions:
+            print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    for path in [out] + ([BASELINE] if args.save_baseline else []):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {path}")
+    return 1 if regressions else 0
+
+
+def print_results(results):
+    for suite in ('micro', 'routes'):
+        for name, s in results.get(suite, {}).items():
+            if 'skipped' in s:
+                print(f"{suite:6} {name:28} skipped ({s['skipped']})")
+            else:
+                print(f"{suite:6} {name:28} p50 {s['p50_ms']:9.3f} ms  p95 {s['p95_ms']:9.3f} ms  p99 {s['p99_ms']:9.3f} ms  n={s['n']}")
+    load_results = results.get('load')
+    if load_results:
+        for name, s in [('overall', load_results['overall'])] + list(load_results['routes'].items()):
+            print(f"load   {name:28} {s['throughput_per_s']:8.1f} req/s  p50 {s['p50_ms']:8.2f} ms  "
+                  f"p95 {s['p95_ms']:8.2f} ms  p99 {s['p99_ms']:8.2f} ms  errors {s['errors']}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Flags benchmarks that got slower than a stored baseline."""
+
+# Lower is better for latencies, higher is better for throughput
+LATENCY_KEYS = ('p50_ms', 'p95_ms')
+THROUGHPUT_KEY = 'throughput_per_s'
+
+
+def _summaries(results):
+    """Flattens a results document into {'suite/name': summary}."""
+    flat = {}
+    for suite in ('micro', 'routes'):
+        for name, summary in results.get(suite, {}).items():
+            flat[f"{suite}/{name}"] = summary
+    load = results.get('load')
+    if load:
+        flat['load/overall'] = load['overall']
+        for name, summary in load.get('routes', {}).items():
+            flat[f"load/{name}"] = summary
+    return flat
+
+
+def compare(results, baseline, threshold=0.2, min_delta_ms=0.5):
+    """Returns a list of regression dicts: a latency more than `threshold` (0.2 = 20%) and
+    more than `min_delta_ms` above the baseline, or a throughput more than `threshold` below it.
+
+    The absolute floor keeps scheduler jitter on sub-millisecond benchmarks from being flagged.
+    """
+    current, previous = _summaries(results), _summaries(baseline)
+    regressions = []
+    for name, summary in current.items():
+        before = previous.get(name)
+        if not before or 'skipped' in summary or 'skipped' in before:
+            continue
+        for key in LATENCY_KEYS:
+            if before.get(key) and summary.get(key) and summary[key] > before[key] * (1 + threshold) \
+                    and summary[key] - before[key] > min_delta_ms:
+                regressions.append({'benchmark': name, 'metric': key, 'baseline': before[key],
+                                    'current': summary[key], 'change': summary[key] / before[key] - 1})
+        if before.get(THROUGHPUT_KEY) and summary.get(THROUGHPUT_KEY) \
+                and summary[THROUGHPUT_KEY] < before[THROUGHPUT_KEY] * (1 - threshold):
+            regressions.append({'benchmark': name, 'metric': THROUGHPUT_KEY, 'baseline': before[THROUGHPUT_KEY],
+                                'current': summary[THROUGHPUT_KEY],
+                                'change': summary[THROUGHPUT_KEY] / before[THROUGHPUT_KEY] - 1})
+    return regressions
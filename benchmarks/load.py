@@ -0,0 +1,88 @@
+"""Concurrent HTTP load generator: a weighted mix of routes from several client threads."""
+import itertools
+import logging
+import random
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.micro import PRICE_INPUT
+from benchmarks.routes import PREDICT_FORM
+from benchmarks.timing import summarize
+
+# (name, weight, method, path, request kwargs factory)
+_counter = itertools.count()
+MIX = [
+    ('predict', 60, 'POST', '/predict',
+     lambda: {'data': dict(PREDICT_FORM, temperature=f"{20 + next(_counter) % 500 * 0.01:.2f}")}),
+    ('get_price_prediction', 10, 'POST', '/get_price_prediction', lambda: {'json': PRICE_INPUT}),
+    ('weather', 15, 'GET', '/weather', lambda: {'params': {'city': f"City{next(_counter) % 50}"}}),
+    ('api_chat', 15, 'POST', '/api/chat',
+     lambda: {'json': {'message': 'Which fertilizer for paddy?', 'session_id': f"load{next(_counter) % 100}"}}),
+]
+
+
+class InProcessServer:
+    """Serves the Flask app on a threaded werkzeug server on a free local port."""
+
+    def __init__(self, wsgi_app):
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # one log line per request otherwise
+        self.server = make_server('127.0.0.1', 0, wsgi_app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+
+def generate_load(base_url, concurrency=16, duration=10.0, mix=MIX, seed=0):
+    """Runs `concurrency` clients for `duration` seconds; returns overall and per-route summaries."""
+    names = [name for name, *_ in mix]
+    weights = [weight for _, weight, *_ in mix]
+    by_name = {entry[0]: entry for entry in mix}
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < deadline:
+            name, _, method, path, kwargs = by_name[rng.choices(names, weights)[0]]
+            started = time.perf_counter()
+            try:
+                ok = session.request(method, base_url + path, timeout=30, **kwargs()).status_code < 400
+            except requests.RequestException:
+                ok = False
+            local.append((name, time.perf_counter() - started, ok))
+        with lock:
+            for name, seconds, ok in local:
+                samples[name].append(seconds)
+                errors[name] += not ok
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    routes = {name: dict(summarize(samples[name], elapsed), errors=errors[name]) for name in names if samples[name]}
+    overall = summarize([s for name in names for s in samples[name]], elapsed)
+    overall['errors'] = sum(errors.values())
+    return {'concurrency': concurrency, 'duration_s': elapsed, 'overall': overall, 'routes': routes}
+
+
+def run(app_module, url=None, concurrency=16, duration=10.0):
+    if url:
+        return generate_load(url, concurrency, duration)
+    with InProcessServer(app_module.app) as server:
+        return generate_load(server.url, concurrency, duration)
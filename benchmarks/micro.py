@@ -0,0 +1,45 @@
+"""Microbenchmarks of the model code behind the routes, without Flask in the way."""
+import numpy as np
+
+from benchmarks.timing import measure
+
+PRICE_INPUT = {'month': 'March', 'commodity_name': 'Wheat', 'state_name': 'India', 'district_name': 'All',
+               'calculationType': 'Monthly', 'avg_min_price': 1200.0, 'avg_max_price': 1800.0, 'change': 0.0}
+BATCH_ROWS = 256
+
+
+def crop_samples(path='datasets/crop.csv'):
+    """The N, P, K, temperature, humidity, ph, rainfall columns of the crop dataset."""
+    return np.loadtxt(path, delimiter=',', skiprows=1, usecols=range(7), dtype=np.float64)
+
+
+def run(app_module, **options):
+    registry = app_module.registry
+    X = crop_samples()
+    one, batch = X[:1], X[:BATCH_ROWS]
+    ms, sc = registry.get('ms'), registry.get('sc')
+    scaled_one, scaled_batch = sc.transform(ms.transform(one)), sc.transform(ms.transform(batch))
+
+    cases = {
+        'scale_ms_sc_1': lambda: sc.transform(ms.transform(one)),
+        f'scale_ms_sc_{BATCH_ROWS}': lambda: sc.transform(ms.transform(batch)),
+        'crop_sklearn_1': lambda: registry.get('crop_model').predict(scaled_one),
+        f'crop_sklearn_{BATCH_ROWS}': lambda: registry.get('crop_model').predict(scaled_batch),
+        'crop_flat_1': lambda: registry.get('crop_forest').predict(scaled_one),
+        f'crop_flat_{BATCH_ROWS}': lambda: registry.get('crop_forest').predict(scaled_batch),
+        'fertilizer_sklearn_1': lambda: registry.get('fertilizer_model').predict(one[:, :3]),
+        'fertilizer_lookup_1': lambda: registry.get('fertilizer_lookup').predict(one[:, :3]),
+        'price_preprocess_pandas': lambda: app_module.preprocess_price_input(dict(PRICE_INPUT)),
+        'price_encoder': lambda: registry.get('price_encoder').encode(dict(PRICE_INPUT)),
+        'price_model_predict': lambda: registry.get('price_model').predict(registry.get('price_encoder').encode(dict(PRICE_INPUT))),
+        'price_table_lookup': lambda: registry.get('price_table').lookup(dict(PRICE_INPUT)),
+    }
+    results = {}
+    for name, fn in cases.items():
+        try:
+            fn()  # loads the artifacts outside the timed calls
+        except Exception as e:  # e.g. models/crop_price.pkl not present in this checkout
+            results[name] = {'skipped': f"{type(e).__name__}: {e}"}
+            continue
+        results[name] = measure(fn, **options)
+    return results
@@ -0,0 +1,79 @@
+"""Route benchmarks through the Flask test client, with the upstreams stubbed."""
+import itertools
+
+from benchmarks.micro import PRICE_INPUT
+from benchmarks.timing import measure
+
+PREDICT_FORM = {'nitrogen': '90', 'phosphorus': '42', 'potassium': '43', 'temperature': '20.88',
+                'humidity': '82.0', 'ph': '6.5', 'rainfall': '202.94'}
+
+
+def attach_stubs(app_module, weather_stub, gemini_stub):
+    """Points the app's weather client and Gemini model at the local stubs."""
+    app_module.weather_client.url = weather_stub.url
+    app_module.weather_client.api_key = 'benchmark'
+    app_module.get_gemini_model = lambda: gemini_stub
+
+
+def _expect(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def route_cases(app_module):
+    """name -> fn(client) issuing one request through the Flask test client."""
+    counter = itertools.count()
+
+    def predict_cached(client):
+        _expect(client.post('/predict', data=PREDICT_FORM))
+
+    def predict_uncached(client):
+        # A new temperature every call, so the result cache never answers
+        form = dict(PREDICT_FORM, temperature=f"{15 + next(counter) * 0.01:.2f}")
+        _expect(client.post('/predict', data=form))
+
+    def price(client):
+        _expect(client.post('/get_price_prediction', json=PRICE_INPUT))
+
+    def weather_cached(client):
+        _expect(client.get('/weather?city=Lucknow'))
+
+    def weather_uncached(client):
+        _expect(client.get(f'/weather?city=Bench{next(counter)}'))
+
+    def advisory(client):
+        _expect(client.post('/api/advisory', json={'sample': PREDICT_FORM, 'city': 'Lucknow', 'month': 'March'}))
+
+    def chat(client):
+        _expect(client.post('/api/chat', json={'message': 'When should I sow wheat?', 'session_id': 'benchmark'}))
+
+    def chat_stream(client):
+        response = _expect(client.post('/api/chat/stream', json={'message': 'When should I sow wheat?',
+                                                                 'session_id': 'benchmark'}))
+        response.get_data()
+        response.close()
+
+    return {
+        'predict_cached': predict_cached,
+        'predict_uncached': predict_uncached,
+        'get_price_prediction': price,
+        'weather_cached': weather_cached,
+        'weather_uncached': weather_uncached,
+        'api_advisory': advisory,
+        'api_chat': chat,
+        'api_chat_stream': chat_stream,
+    }
+
+
+def run(app_module, **options):
+    client = app_module.app.test_client()
+    results = {}
+    for name, fn in route_cases(app_module).items():
+        try:
+            fn(client)
+        except Exception as e:
+            results[name] = {'skipped': f"{type(e).__name__}: {e}"}
+            continue
+        results[name] = measure(lambda: fn(client), **options)
+    return results
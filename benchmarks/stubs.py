@@ -0,0 +1,83 @@
+"""Local stand-ins for OpenWeatherMap and Gemini, with a fixed artificial latency."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class WeatherStub:
+    """An OpenWeatherMap-compatible HTTP server on 127.0.0.1; city 'Nowhere' answers 404."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # headers and body are written separately
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.calls += 1
+                city = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+                time.sleep(stub.delay)
+                if city == 'Nowhere':
+                    code, payload = 404, {'cod': '404', 'message': 'city not found'}
+                else:
+                    code, payload = 200, {'name': city, 'main': {'temp': 29.5},
+                                          'weather': [{'description': 'clear sky', 'main': 'Clear'}]}
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data/2.5/weather"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Chat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = history
+
+    def send_message(self, message, stream=False):
+        words = [f"{word} " for word in self.model.reply.split()]
+        if stream:
+            def chunks():
+                for word in words:
+                    time.sleep(self.model.delay / len(words))
+                    yield _Chunk(word)
+            return chunks()
+        time.sleep(self.model.delay)
+        return _Chunk("".join(words))
+
+
+class GeminiStub:
+    """Mimics the parts of google.generativeai.GenerativeModel that app.py uses."""
+
+    def __init__(self, delay=0.05, reply="Sow wheat after the monsoon and irrigate at crown root initiation."):
+        self.delay = delay
+        self.reply = reply
+
+    def start_chat(self, history=None):
+        return _Chat(self, history or [])
@@ -0,0 +1,44 @@
+"""Timing helpers shared by the benchmark suites."""
+import math
+import time
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile (q in 0..100) of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed=None):
+    """Latency summary in milliseconds for a list of per-call durations in seconds."""
+    ordered = sorted(samples)
+    n = len(ordered)
+    summary = {
+        'n': n,
+        'mean_ms': sum(ordered) / n * 1e3 if n else None,
+        'min_ms': ordered[0] * 1e3 if n else None,
+        'p50_ms': percentile(ordered, 50) * 1e3 if n else None,
+        'p95_ms': percentile(ordered, 95) * 1e3 if n else None,
+        'p99_ms': percentile(ordered, 99) * 1e3 if n else None,
+        'max_ms': ordered[-1] * 1e3 if n else None,
+    }
+    if elapsed:
+        summary['throughput_per_s'] = n / elapsed
+    return summary
+
+
+def measure(fn, min_time=0.5, min_calls=20, max_calls=100000, warmup=3):
+    """Calls fn() repeatedly (at least min_calls times and min_time seconds) and summarizes each call."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_calls:
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+        if len(samples) >= min_calls and time.perf_counter() - started >= min_time:
+            break
+    return summarize(samples)
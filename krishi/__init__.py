@@ -0,0 +1 @@
+"""Helpers used by the Krishi-Help Flask app (app.py)."""
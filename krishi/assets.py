@@ -0,0 +1,332 @@
+"""Responsive, content-hashed static assets.
+
+    python -m krishi.assets [--static static] [--widths 320 640 960 1280] [--formats avif webp]
+
+The build writes static/build/: for every PNG/JPEG a copy of the original plus AVIF and
+WebP variants resized to each width narrower than it, and for every text asset a copy
+with gzip (and, if the brotli package is installed, brotli) versions next to it. Each
+file name carries a hash of its contents, so a changed file gets a new URL and browsers
+may cache the old one forever. static/build/manifest.json maps source names to outputs;
+only sources that changed since the last build are re-encoded.
+
+AssetManifest reads the manifest for the templates (asset_url(), picture() with srcset),
+falling back to the plain static file when the build has not been run, and send_asset()
+serves static files with immutable caching for hashed names, content ETags and the
+precompressed versions a client accepts.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import sys
+import threading
+import time
+
+from flask import request, send_from_directory, url_for
+from markupsafe import Markup, escape
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz versions are written
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+BUILD_DIR = 'build'
+MANIFEST_FILENAME = 'manifest.json'
+# Bumped when outputs are produced differently, so a rebuild re-encodes everything
+FORMAT_VERSION = 1
+DEFAULT_WIDTHS = (320, 640, 960, 1280)
+DEFAULT_FORMATS = ('avif', 'webp')
+QUALITY = {'avif': 55, 'webp': 80}
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.webmanifest', '.ico')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+REFRESH_INTERVAL = 1.0  # seconds between checks of the manifest for a new build
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # in order of preference
+
+for _type, _extension in (('image/avif', '.avif'), ('image/webp', '.webp'), ('application/manifest+json', '.webmanifest')):
+    mimetypes.add_type(_type, _extension)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _hashed_name(stem, data, extension):
+    return f"{stem}.{content_hash(data)}{extension}"
+
+
+# --- Build ---
+
+def _encode(image, fmt):
+    buf = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buf, 'WEBP', quality=QUALITY['webp'], method=6)
+    else:
+        image.save(buf, 'AVIF', quality=QUALITY['avif'], speed=6)
+    return buf.getvalue()
+
+
+def _compressed(data):
+    """{encoding suffix: bytes} for each encoding that makes data smaller."""
+    versions = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versions['.br'] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in versions.items() if len(body) < len(data)}
+
+
+def _build_image(name, data, widths, formats):
+    from PIL import Image, ImageOps
+
+    stem, extension = os.path.splitext(name)
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    width, height = image.size
+    outputs = {}
+    entry = {'url': f"{BUILD_DIR}/{_hashed_name(stem, data, extension.lower())}", 'width': width, 'height': height,
+             'variants': {}}
+    outputs[entry['url']] = data
+    if width > widths[0]:  # icons and thumbnails smaller than every width are only copied
+        sizes = sorted({w for w in widths if w < width} | {min(width, widths[-1])})
+        for fmt in formats:
+            variants = []
+            for w in sizes:
+                resized = image if w == width else image.resize((w, round(height * w / width)), Image.LANCZOS)
+                body = _encode(resized, fmt)
+                path = f"{BUILD_DIR}/{_hashed_name(f'{stem}-{w}w', body, '.' + fmt)}"
+                outputs[path] = body
+                variants.append([w, path])
+            entry['variants'][fmt] = variants
+    return entry, outputs
+
+
+def _build_text(name, data):
+    stem, extension = os.path.splitext(name)
+    entry = {'url': f"{BUILD_DIR}/{_hashed_name(stem, data, extension)}"}
+    outputs = {entry['url']: data}
+    for suffix, body in _compressed(data).items():
+        outputs[entry['url'] + suffix] = body
+    return entry, outputs
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _outputs_of(entry):
+    paths = [entry['url']] + [path for variants in entry.get('variants', {}).values() for _, path in variants]
+    return paths + [entry['url'] + suffix for suffix in entry.get('encodings', ())]
+
+
+def build(static_dir, widths=DEFAULT_WIDTHS, formats=DEFAULT_FORMATS):
+    """Builds static_dir/build/ and its manifest; returns the manifest."""
+    from PIL import features
+
+    widths = sorted(widths)
+    formats = [fmt for fmt in formats if features.check(fmt)]
+    missing = sorted(set(DEFAULT_FORMATS) - set(formats))
+    if missing:
+        log.warning("This Pillow cannot encode %s; skipping those variants", ', '.join(missing))
+    settings = {'format': FORMAT_VERSION, 'widths': widths, 'formats': formats, 'quality': QUALITY,
+                'brotli': brotli is not None}
+    build_dir = os.path.join(static_dir, BUILD_DIR)
+    manifest_path = os.path.join(build_dir, MANIFEST_FILENAME)
+    try:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous.get('settings') != settings:
+            previous = {}
+    except (OSError, ValueError):
+        previous = {}
+
+    files = {}
+    for name in sorted(os.listdir(static_dir)):
+        extension = os.path.splitext(name)[1].lower()
+        path = os.path.join(static_dir, name)
+        if not os.path.isfile(path) or extension not in IMAGE_EXTENSIONS + COMPRESSIBLE_EXTENSIONS:
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        old = previous.get('files', {}).get(name)
+        if old and old['sha256'] == digest and all(os.path.exists(os.path.join(static_dir, p)) for p in _outputs_of(old)):
+            files[name] = old
+            continue
+        started = time.perf_counter()
+        if extension in IMAGE_EXTENSIONS:
+            entry, outputs = _build_image(name, data, widths, formats)
+        else:
+            entry, outputs = _build_text(name, data)
+            entry['encodings'] = [path[len(entry['url']):] for path in outputs if path != entry['url']]
+        for output, body in outputs.items():
+            _write(os.path.join(static_dir, output), body)
+        entry['sha256'] = digest
+        entry['bytes'] = {output: len(body) for output, body in outputs.items()}
+        files[name] = entry
+        log.info("Built %s -> %d files in %.2f s", name, len(outputs), time.perf_counter() - started)
+
+    manifest = {'settings': settings, 'files': files}
+    _write(manifest_path, json.dumps(manifest, indent=1, sort_keys=True).encode())
+    # Outputs of removed or changed sources are no longer referenced
+    keep = {os.path.basename(p) for entry in files.values() for p in _outputs_of(entry)} | {MANIFEST_FILENAME}
+    for name in os.listdir(build_dir):
+        if name not in keep:
+            os.remove(os.path.join(build_dir, name))
+    return manifest
+
+
+# --- Templates ---
+
+class AssetManifest:
+    """The built manifest as template helpers; reloaded when a new build replaces it."""
+
+    def __init__(self, static_dir):
+        self.static_dir = static_dir
+        self.path = os.path.join(static_dir, BUILD_DIR, MANIFEST_FILENAME)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._etags = {}
+        self._stamp = None
+        self._checked = 0.0
+
+    def files(self):
+        now = time.monotonic()
+        if now - self._checked >= REFRESH_INTERVAL:
+            with self._lock:
+                self._checked = now
+                try:
+                    stat = os.stat(self.path)
+                    stamp = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    stamp = None
+                if stamp != self._stamp:
+                    self._load(stamp)
+        return self._files
+
+    def _load(self, stamp):
+        files = {}
+        if stamp is not None:
+            try:
+                with open(self.path) as f:
+                    files = json.load(f)['files']
+            except (OSError, ValueError, KeyError) as e:
+                log.warning("Ignoring unreadable asset manifest %s: %s", self.path, e)
+        # Build outputs are named by content hash, which makes a strong ETag that is the same
+        # on every host; sources in static/ may have changed since the build, so they keep
+        # Flask's mtime-based one
+        etags = {}
+        for entry in files.values():
+            for path in _outputs_of(entry):
+                base, suffix = os.path.splitext(path)
+                if suffix in ('.br', '.gz'):
+                    etags[path] = f"{base.split('.')[-2]}-{suffix[1:]}"
+                else:
+                    etags[path] = path.split('.')[-2]
+        self._files, self._etags, self._stamp = files, etags, stamp
+
+    def url(self, name):
+        """URL of the content-hashed copy of static/<name>, or of the file itself before a build."""
+        entry = self.files().get(name)
+        return url_for('static', filename=entry['url'] if entry else name)
+
+    def srcset(self, name, fmt):
+        entry = self.files().get(name)
+        variants = entry.get('variants', {}).get(fmt) if entry else None
+        if not variants:
+            return ''
+        return ', '.join(f"{url_for('static', filename=path)} {width}w" for width, path in variants)
+
+    def picture(self, name, alt='', sizes='100vw', loading='lazy', **attrs):
+        """<picture> with an AVIF and a WebP srcset and the original as the <img> fallback.
+
+        Extra keyword arguments become attributes of the <img> (class_ for class). Before
+        a build, just the <img>.
+        """
+        entry = self.files().get(name)
+        img_attrs = {'src': self.url(name), 'alt': alt, 'loading': loading, 'decoding': 'async'}
+        if entry:
+            img_attrs.update(width=entry['width'], height=entry['height'])
+        img_attrs.update({key.rstrip('_').replace('_', '-'): value for key, value in attrs.items()})
+        img = '<img ' + ' '.join(f'{key}="{escape(value)}"' for key, value in img_attrs.items()) + '>'
+        sources = []
+        for fmt in ('avif', 'webp'):
+            srcset = self.srcset(name, fmt)
+            if srcset:
+                sources.append(f'<source type="image/{fmt}" srcset="{escape(srcset)}" sizes="{escape(sizes)}">')
+        if not sources:
+            return Markup(img)
+        return Markup('<picture>' + ''.join(sources) + img + '</picture>')
+
+    def etag(self, filename):
+        """Content-derived ETag of a build output, else None."""
+        self.files()
+        return self._etags.get(filename)
+
+    def stats(self):
+        files = self.files()
+        return {'built': self._stamp is not None, 'sources': len(files),
+                'outputs': sum(len(_outputs_of(entry)) for entry in files.values())}
+
+
+# --- Serving ---
+
+def send_asset(static_dir, filename, manifest, max_age=3600):
+    """Flask static view: files under build/ are immutable for a year, others cached for
+    max_age seconds and revalidated by ETag; a .br or .gz version next to the file is sent
+    instead when the client accepts that encoding."""
+    immutable = filename.startswith(BUILD_DIR + '/') and filename != f'{BUILD_DIR}/{MANIFEST_FILENAME}'
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding, suffix, alternatives = None, '', False
+    for name, candidate in ENCODINGS:
+        path = safe_join(static_dir, filename + candidate)
+        if path and os.path.isfile(path):
+            alternatives = True
+            if encoding is None and request.accept_encodings[name]:
+                encoding, suffix = name, candidate
+    etag = manifest.etag(filename + suffix)
+    response = send_from_directory(static_dir, filename + suffix, mimetype=mimetype, conditional=True,
+                                   etag=etag if etag else True, max_age=IMMUTABLE_MAX_AGE if immutable else max_age)
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if alternatives:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m krishi.assets', description=__doc__.splitlines()[0])
+    parser.add_argument('--static', default='static')
+    parser.add_argument('--widths', type=int, nargs='+', default=list(DEFAULT_WIDTHS))
+    parser.add_argument('--formats', nargs='+', choices=DEFAULT_FORMATS, default=list(DEFAULT_FORMATS))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    started = time.perf_counter()
+    manifest = build(args.static, args.widths, args.formats)
+    files = manifest['files']
+    source_bytes = sum(os.path.getsize(os.path.join(args.static, name)) for name in files)
+    smallest = 0
+    for name, entry in files.items():
+        candidates = [entry['bytes'][path] for variants in entry.get('variants', {}).values() for _, path in variants]
+        smallest += min(candidates) if candidates else os.path.getsize(os.path.join(args.static, name))
+    print(f"{len(files)} assets -> {os.path.join(args.static, BUILD_DIR)} in {time.perf_counter() - started:.1f} s; "
+          f"sources {source_bytes / 1e6:.1f} MB, smallest variants {smallest / 1e6:.2f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""Dynamic micro-batching for the crop/fertilizer models.
+
+Concurrent /predict requests each score one row, so per-call overhead (two scalers, two
+forests, their input validation) dominates and request threads take turns on the GIL
+doing it. MicroBatcher queues the rows, waits at most `window` seconds after the first
+one (or until `max_batch` rows are queued), runs predict() once on the stacked matrix
+and hands every caller its slice of the result.
+
+The batcher runs inside each web worker, or once per host as a separate process that all
+workers reach over a Unix socket, so requests from different workers share batches:
+
+    python -m krishi.batcher --socket /tmp/krishi-predict.sock [--metrics-port 9101]
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from krishi.metrics import BATCH_QUEUE_SECONDS, BATCH_ROWS, REGISTRY
+
+log = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('!II')  # rows, columns; followed by rows * columns little-endian float64
+_LENGTH = struct.Struct('!I')   # length of the JSON reply that follows
+
+
+class _Request:
+    __slots__ = ('X', 'queued', 'done', 'result', 'error')
+
+    def __init__(self, X):
+        self.X = X
+        self.queued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent predict(X) calls into batches of at most max_batch rows.
+
+    predict(X) -> (crops, fertilizers) as krishi.recommend.recommend() returns them. One
+    background thread, started on first use (so it is never forked), runs the batches;
+    an exception from predict() is raised in every caller of that batch.
+    """
+
+    def __init__(self, predict, max_batch=64, window=0.002, name='predict'):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.predict_batch = predict
+        self.max_batch = max_batch
+        self.window = window
+        self.name = name
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.queued_rows = 0
+        self.counters = {'requests': 0, 'rows': 0, 'batches': 0, 'errors': 0, 'largest_batch': 0}
+
+    def predict(self, X):
+        """Scores the rows of X as part of the next batch; blocks until it has run."""
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) > self.max_batch:  # big batches gain nothing from waiting
+            return self.predict_batch(X)
+        request = _Request(X)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'krishi-batcher-{self.name}', daemon=True)
+                self._thread.start()
+            self._pending.append(request)
+            self.queued_rows += len(X)
+            self.counters['requests'] += 1
+            self._cond.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # The window runs from the oldest queued request, so rows that queued up while the
+            # previous batch ran do not wait a second time
+            deadline = self._pending[0].queued + self.window
+            while self.queued_rows < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, rows = [], 0
+            while self._pending and (not batch or rows + len(self._pending[0].X) <= self.max_batch):
+                request = self._pending.popleft()
+                batch.append(request)
+                rows += len(request.X)
+            self.queued_rows -= rows
+            return batch, rows
+
+    def _run(self):
+        while True:
+            batch, rows = self._next_batch()
+            started = time.perf_counter()
+            for request in batch:
+                BATCH_QUEUE_SECONDS.observe(started - request.queued, self.name)
+            BATCH_ROWS.observe(rows, self.name)
+            try:
+                X = batch[0].X if len(batch) == 1 else np.concatenate([request.X for request in batch])
+                crops, fertilizers = self.predict_batch(X)
+                offset = 0
+                for request in batch:
+                    n = len(request.X)
+                    request.result = (crops[offset:offset + n], fertilizers[offset:offset + n])
+                    offset += n
+            except Exception as e:
+                log.exception("Micro-batch of %d rows failed", rows)
+                for request in batch:
+                    request.error = e
+            with self._cond:
+                self.counters['batches'] += 1
+                self.counters['rows'] += rows
+                self.counters['errors'] += batch[0].error is not None
+                self.counters['largest_batch'] = max(self.counters['largest_batch'], rows)
+            for request in batch:
+                request.done.set()
+
+    def stats(self):
+        with self._cond:
+            return dict(self.counters, mode='inprocess', queued_requests=len(self._pending),
+                        queued_rows=self.queued_rows, max_batch=self.max_batch, window_ms=self.window * 1e3)
+
+
+# --- Out-of-process worker and its client ---
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    while view:
+        received = sock.recv_into(view)
+        if not received:
+            raise ConnectionError("Connection closed by the batch worker.")
+        view = view[received:]
+    return bytes(buf)
+
+
+def _send_json(sock, payload):
+    body = json.dumps(payload).encode()
+    sock.sendall(_LENGTH.pack(len(body)) + body)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """One connection: any number of requests, each answered before the next is read.
+    A request of zero rows asks for the batcher's stats."""
+
+    def handle(self):
+        batcher = self.server.batcher
+        while True:
+            try:
+                rows, cols = _HEADER.unpack(_recv_exact(self.request, _HEADER.size))
+            except ConnectionError:
+                return
+            if not rows:
+                _send_json(self.request, {'stats': batcher.stats()})
+                continue
+            X = np.frombuffer(_recv_exact(self.request, rows * cols * 8), dtype='<f8').reshape(rows, cols)
+            try:
+                crops, fertilizers = batcher.predict(X)
+                _send_json(self.request, {'crops': list(crops), 'fertilizers': list(fertilizers)})
+            except Exception as e:
+                _send_json(self.request, {'error': f"{type(e).__name__}: {e}"})
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 256  # every web worker thread may connect at once
+
+
+def make_unix_server(path, batcher):
+    """A threaded server for batcher.predict() bound to the Unix socket at `path`."""
+    if os.path.exists(path):
+        os.unlink(path)  # left over from a previous run
+    server = _UnixServer(path, _Handler)
+    server.batcher = batcher
+    return server
+
+
+def serve_unix(path, batcher):
+    """Serves batcher.predict() on the Unix socket at `path` until interrupted."""
+    server = make_unix_server(path, batcher)
+    log.info("Batch worker listening on %s (max_batch=%d, window=%.1f ms)", path, batcher.max_batch, batcher.window * 1e3)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+class RemoteBatcher:
+    """Client for a batch worker on a Unix socket; same predict() and stats() as MicroBatcher.
+
+    Keeps up to pool_size idle connections. A failed call raises OSError (ConnectionError
+    when the worker is gone), and an error reported by the worker raises RuntimeError, so
+    the caller can fall back to scoring in-process; after a failed connect, calls fail
+    straight away for retry_interval seconds.
+    """
+
+    def __init__(self, path, pool_size=32, timeout=5.0, retry_interval=1.0):
+        self.path = path
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._down_until = 0.0
+        self._down = False
+
+    def _connect(self):
+        if time.monotonic() < self._down_until:
+            raise ConnectionError(f"Batch worker at {self.path} is unavailable.")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            self._down_until = time.monotonic() + self.retry_interval
+            if not self._down:
+                self._down = True
+                log.warning("Cannot reach the batch worker at %s: %s", self.path, e)
+            raise
+        if self._down:
+            self._down = False
+            log.info("Batch worker at %s is reachable again", self.path)
+        return sock
+
+    def _call(self, frame):
+        try:
+            sock = self._idle.get_nowait()
+        except queue.Empty:
+            sock = self._connect()
+        try:
+            sock.sendall(frame)
+            length, = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+            reply = json.loads(_recv_exact(sock, length))
+        except BaseException:
+            sock.close()
+            raise
+        try:
+            self._idle.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+        return reply
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype='<f8')
+        reply = self._call(_HEADER.pack(*X.shape) + X.tobytes())
+        if 'error' in reply:
+            raise RuntimeError(f"Batch worker failed: {reply['error']}")
+        return np.array(reply['crops'], dtype=object), np.array(reply['fertilizers'], dtype=object)
+
+    def stats(self):
+        return dict(self._call(_HEADER.pack(0, 0))['stats'], mode='unix', socket=self.path)
+
+
+def _serve_metrics(port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log.info("Batch worker metrics on http://127.0.0.1:%d/metrics", port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m krishi.batcher', description=__doc__.splitlines()[0])
+    parser.add_argument('--socket', default=os.getenv('KRISHI_BATCH_SOCKET', '/tmp/krishi-predict.sock'))
+    parser.add_argument('--max-batch', type=int, default=int(os.getenv('KRISHI_BATCH_MAX_SIZE', '64')))
+    parser.add_argument('--window-ms', type=float, default=float(os.getenv('KRISHI_BATCH_WINDOW_MS', '2')))
+    parser.add_argument('--metrics-port', type=int, help="serve this process's /metrics on 127.0.0.1:PORT")
+    args = parser.parse_args(argv)
+
+    os.environ['KRISHI_BATCHING'] = 'off'  # this process is the batcher; the app must not forward to itself
+    import app  # the same artifacts and engine choice as the web workers
+    batcher = MicroBatcher(app.predict_samples, max_batch=args.max_batch, window=args.window_ms / 1e3)
+    if args.metrics_port:
+        _serve_metrics(args.metrics_port)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # so the socket file is removed
+    try:
+        serve_unix(args.socket, batcher)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,218 @@
+"""Cache of Krishi-Bot replies to the opening question of a chat session.
+
+Farmers ask the same few questions ("which fertilizer for wheat?", "गेहूं की बुवाई कब
+करें?") over and over, and each one is a slow, paid Gemini call. Questions are
+normalized (Unicode NFKC, so composed and decomposed Devanagari compare equal; case,
+punctuation including the danda, zero-width joiners, candrabindu/anusvara, nukta and
+native digits are folded) and looked up per language: first exactly, then by Jaccard
+similarity of character n-gram shingles through an inverted index, so spelling and
+punctuation variants still hit. Only opening questions belong here: a later turn depends
+on the conversation before it, so callers must not use the cache for it.
+"""
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+# Zero-width characters that change how Devanagari renders but not what it says, and the
+# usual Hindi spelling variants: candrabindu written as anusvara (गेहूँ/गेहूं) and nukta
+# dropped (NFKC has already split क़ into क + nukta)
+_FOLD = dict.fromkeys(map(ord, '\u200b\u200c\u200d\u2060\ufeff\u093c'), None)
+_FOLD[0x0901] = '\u0902'
+# Words that flip the meaning of a question; both texts must contain the same ones (normalized,
+# so "don't" is "don t")
+NEGATIONS = frozenset(['no', 'not', 'nor', 'never', 'none', 'without', 'cannot', 'dont', 'don', 'doesn', 'didn',
+                       'isn', 'aren', 'shouldn', 'wont', 'नहीं', 'नही', 'न', 'मत', 'बिना'])
+# Shorter words, and anything that is not purely letters (numbers, units like "10kg"), must match exactly
+FUZZY_MIN_LENGTH = 5
+
+
+def normalize(text):
+    """Canonical form of a question: NFKC, Devanagari variants folded, casefolded,
+    punctuation and symbols (including । and ॥) as spaces, every decimal digit as ASCII,
+    whitespace collapsed."""
+    text = unicodedata.normalize('NFKC', text).translate(_FOLD).casefold()
+    chars = []
+    for ch in text:
+        category = unicodedata.category(ch)
+        if category[0] in 'PS':
+            chars.append(' ')
+        elif category == 'Nd':
+            chars.append(str(unicodedata.digit(ch)))
+        else:
+            chars.append(ch)
+    return ' '.join(''.join(chars).split())
+
+
+def shingles(text, size=3):
+    """Character n-grams of a normalized text (padded, so word edges count)."""
+    padded = f' {text} '
+    if len(padded) <= size:
+        return frozenset([padded])
+    return frozenset(padded[i:i + size] for i in range(len(padded) - size + 1))
+
+
+def _within_edits(a, b, limit):
+    """Levenshtein distance between a and b is at most limit."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def _fuzzy(word):
+    """Whether a word may match a misspelling of itself: letters only (Devanagari vowel signs
+    are marks, not letters) and at least FUZZY_MIN_LENGTH of them, and not a negation."""
+    return (len(word) >= FUZZY_MIN_LENGTH and word not in NEGATIONS
+            and all(unicodedata.category(ch)[0] in 'LM' for ch in word))
+
+
+def same_words(a, b):
+    """Whether two normalized texts differ only in spelling: every word of one that is not
+    in the other is a long alphabetic word within a few edits (a quarter of its length) of
+    a long alphabetic word of the other. Numbers, short words and negations must match
+    exactly, so "fertiliser"/"fertilizer" pass, but "10 acres"/"20 acres", "pH 5"/"pH 8",
+    "spray"/"not spray" and "rice"/"wheat" do not, however similar the rest is."""
+    words_a, words_b = set(a.split()), set(b.split())
+    if words_a & NEGATIONS != words_b & NEGATIONS:
+        return False
+    for extra, other in ((words_a - words_b, words_b), (words_b - words_a, words_a)):
+        for word in extra:
+            if not _fuzzy(word):
+                return False
+            if not any(_fuzzy(candidate) and _within_edits(word, candidate, len(word) // 4) for candidate in other):
+                return False
+    return True
+
+
+class _Entry:
+    __slots__ = ('reply', 'shingles', 'expires', 'seconds')
+
+    def __init__(self, reply, shingles, expires, seconds):
+        self.reply = reply
+        self.shingles = shingles
+        self.expires = expires
+        self.seconds = seconds
+
+
+class ChatResponseCache:
+    """Replies keyed by (language, normalized question), with near-duplicate matching.
+
+    - get() returns a stored reply for the same question, or for the most similar one
+      whose shingle Jaccard similarity is at least `threshold` (1.0 = exact only) and
+      whose words differ only in spelling (same_words), so a question about another
+      crop or place never gets this one's answer.
+    - Entries expire after `ttl` seconds; beyond max_entries the least recently used go.
+    - Questions longer than max_chars are neither stored nor looked up.
+    - saved_seconds adds up the Gemini time each hit avoided (the time the cached reply
+      originally took).
+    """
+
+    def __init__(self, max_entries=2000, ttl=86400, threshold=0.7, shingle_size=3, max_chars=500):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_chars = max_chars
+        self._entries = OrderedDict()  # (language, normalized text) -> _Entry
+        self._index = {}  # (language, shingle) -> set of entry keys
+        self._lock = threading.Lock()
+        self.counters = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0, 'skipped': 0,
+                         'stores': 0, 'evictions': 0, 'expirations': 0}
+        self.saved_seconds = 0.0
+
+    def _key(self, text, language):
+        normalized = normalize(text or '')
+        if not normalized or len(normalized) > self.max_chars:
+            return None
+        return (language, normalized)
+
+    def get(self, text, language):
+        """The cached reply for this opening question, or None."""
+        key = self._key(text, language)
+        now = time.time()
+        with self._lock:
+            if key is None:
+                self.counters['skipped'] += 1
+                return None
+            entry = self._live(key, now)
+            kind = 'exact_hits'
+            if entry is None and self.threshold < 1:
+                entry = self._most_similar(key, now)
+                kind = 'similar_hits'
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters[kind] += 1
+            self.saved_seconds += entry.seconds
+            return entry.reply
+
+    def put(self, text, language, reply, seconds):
+        """Stores the reply Gemini took `seconds` to give to this opening question."""
+        key = self._key(text, language)
+        if key is None or not reply:
+            return
+        entry = _Entry(reply, shingles(key[1], self.shingle_size), time.time() + self.ttl, seconds)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for shingle in entry.shingles:
+                self._index.setdefault((language, shingle), set()).add(key)
+            self.counters['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= now:
+            self._remove(key)
+            self.counters['expirations'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _most_similar(self, key, now):
+        language, text = key
+        query = shingles(text, self.shingle_size)
+        overlap = Counter()
+        for shingle in query:
+            overlap.update(self._index.get((language, shingle), ()))
+        scored = []
+        for candidate, common in overlap.items():
+            score = common / (len(query) + len(self._entries[candidate].shingles) - common)
+            if score >= self.threshold:
+                scored.append((score, candidate))
+        for _, candidate in sorted(scored, reverse=True):
+            if same_words(text, candidate[1]):
+                entry = self._live(candidate, now)
+                if entry is not None:  # else it expired; the next best may not have
+                    return entry
+        return None
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for shingle in entry.shingles:
+            keys = self._index.get((key[0], shingle))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[(key[0], shingle)]
+
+    def stats(self):
+        with self._lock:
+            hits = self.counters['exact_hits'] + self.counters['similar_hits']
+            lookups = hits + self.counters['misses']
+            return dict(self.counters, size=len(self._entries), max_entries=self.max_entries, ttl_seconds=self.ttl,
+                        threshold=self.threshold, hit_rate=round(hits / lookups, 4) if lookups else None,
+                        saved_seconds=round(self.saved_seconds, 3))
@@ -0,0 +1,163 @@
+"""Bounded chat history store for Krishi-Bot sessions.
+
+Only plain-text turns are kept, not live Gemini ChatSession objects: each request builds
+a fresh ChatSession from the capped history, so memory per session is bounded and the
+history can be persisted to SQLite and shared by every worker on the host.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ChatSessionStore:
+    """Sessions keyed by session_id, each with a language and a list of (user, model) turns.
+
+    - At most max_sessions are kept (least recently used are evicted first).
+    - Sessions idle for more than idle_timeout seconds are dropped.
+    - Only the last max_turns turns are kept; older ones are truncated.
+    - With db_path set, SQLite is the source of truth, so sessions survive restarts and
+      are visible to every worker; the in-memory dict is bypassed, and the LRU order is
+      kept in the last_used column.
+    """
+
+    def __init__(self, max_sessions=1000, idle_timeout=1800, max_turns=10, db_path=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_turns = max_turns
+        self.db_path = db_path
+        self._sessions = OrderedDict()  # session_id -> {'language', 'turns', 'last_used'}
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._last_sweep = time.time()
+        self.counters = {'created': 0, 'evicted_lru': 0, 'evicted_idle': 0, 'truncated_turns': 0}
+        if db_path:
+            with self._connect() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS chat_sessions ("
+                             "session_id TEXT PRIMARY KEY, language TEXT NOT NULL, "
+                             "turns TEXT NOT NULL, last_used REAL NOT NULL)")
+                conn.execute("CREATE INDEX IF NOT EXISTS chat_sessions_last_used ON chat_sessions (last_used)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_or_create(self, session_id, language):
+        """Returns (language, turns) for a session, creating it with `language` if new or expired."""
+        now = time.time()
+        self._maybe_sweep(now)
+        if self.db_path:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT language, turns, last_used FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row and now - row[2] <= self.idle_timeout:
+                conn.execute("UPDATE chat_sessions SET last_used = ? WHERE session_id = ?", (now, session_id))
+                return row[0], [tuple(turn) for turn in json.loads(row[1])]
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._save(session_id, language, [], now)
+                # DELETE ... ORDER BY ... LIMIT needs a compile-time option, so select the victims instead
+                cursor = conn.execute(
+                    "DELETE FROM chat_sessions WHERE session_id IN (SELECT session_id FROM chat_sessions "
+                    "ORDER BY last_used, rowid LIMIT max((SELECT COUNT(*) FROM chat_sessions) - ?, 0))",
+                    (self.max_sessions,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._count('created')
+            self._count('evicted_lru', max(cursor.rowcount, 0))
+            return language, []
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or now - session['last_used'] > self.idle_timeout:
+                session = {'language': language, 'turns': [], 'last_used': now}
+                self._sessions[session_id] = session
+                self.counters['created'] += 1
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.counters['evicted_lru'] += 1
+            session['last_used'] = now
+            self._sessions.move_to_end(session_id)
+            return session['language'], list(session['turns'])
+
+    def append(self, session_id, user_text, model_text):
+        """Records one completed exchange, truncating the history to max_turns."""
+        now = time.time()
+        if self.db_path:
+            # Read-modify-write in one transaction so two workers cannot lose a turn
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT language, turns FROM chat_sessions WHERE session_id = ?",
+                                   (session_id,)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return
+                turns = self._truncate(json.loads(row[1]) + [[user_text, model_text]])
+                conn.execute("UPDATE chat_sessions SET turns = ?, last_used = ? WHERE session_id = ?",
+                             (json.dumps(turns, ensure_ascii=False), now, session_id))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session['turns'] = self._truncate(session['turns'] + [(user_text, model_text)])
+            session['last_used'] = now
+            self._sessions.move_to_end(session_id)
+
+    def _truncate(self, turns):
+        excess = len(turns) - self.max_turns
+        if excess > 0:
+            self._count('truncated_turns', excess)
+            return turns[excess:]
+        return turns
+
+    def _save(self, session_id, language, turns, now):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO chat_sessions (session_id, language, turns, last_used) VALUES (?, ?, ?, ?)",
+            (session_id, language, json.dumps(turns, ensure_ascii=False), now))
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def _maybe_sweep(self, now):
+        """Drops idle sessions, at most once a minute."""
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        cutoff = now - self.idle_timeout
+        if self.db_path:
+            cursor = self._connect().execute("DELETE FROM chat_sessions WHERE last_used < ?", (cutoff,))
+            self._count('evicted_idle', max(cursor.rowcount, 0))
+            return
+        with self._lock:
+            idle = [sid for sid, session in self._sessions.items() if session['last_used'] < cutoff]
+            for sid in idle:
+                del self._sessions[sid]
+            self.counters['evicted_idle'] += len(idle)
+
+    def stats(self):
+        if self.db_path:
+            sessions, total, longest = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(json_array_length(turns)), 0), "
+                "COALESCE(MAX(json_array_length(turns)), 0) FROM chat_sessions").fetchone()
+        else:
+            with self._lock:
+                lengths = [len(session['turns']) for session in self._sessions.values()]
+            sessions, total, longest = len(lengths), sum(lengths), max(lengths, default=0)
+        return dict(self.counters, backend='sqlite' if self.db_path else 'memory', sessions=sessions,
+                    history_turns_total=total, history_turns_max=longest, max_turns=self.max_turns)
@@ -0,0 +1,118 @@
+"""Runs the independent parts of one request concurrently on a shared, bounded thread pool."""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from krishi.limits import Saturated
+from krishi.metrics import REGISTRY
+
+log = logging.getLogger(__name__)
+
+BRANCH_SECONDS = REGISTRY.histogram('krishi_fanout_branch_seconds',
+                                    'Time from submitting a fan-out branch to its outcome, by branch and status.',
+                                    ['fanout', 'branch', 'status'])
+
+
+class Branch:
+    """One unit of work in a fan-out.
+
+    fn is called with the values of the branches named in `needs`, in that order, once
+    they have all succeeded; if any of them did not, this branch is skipped. `timeout`
+    counts from the moment the branch is handed to the pool, so time spent queued for a
+    thread counts against it. A failed `required` branch fails the whole fan-out (see
+    FanOut.run); other failures are reported next to the results that did arrive.
+    """
+
+    def __init__(self, name, fn, timeout, needs=(), required=False):
+        self.name = name
+        self.fn = fn
+        self.timeout = timeout
+        self.needs = tuple(needs)
+        self.required = required
+
+
+class FanOut:
+    """Submits branches to a ThreadPoolExecutor of `max_workers` threads shared by every
+    request, and waits for each one until its own deadline.
+
+    A branch that times out is cancelled if it has not started; if it has, its thread
+    finishes in the background and the result is dropped, so a hung upstream can tie up
+    at most max_workers threads while requests keep getting partial answers.
+    """
+
+    def __init__(self, max_workers, name='fanout'):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix=f'krishi-{name}')
+        self._lock = threading.Lock()
+        self.counters = {'runs': 0, 'ok': 0, 'error': 0, 'timeout': 0, 'skipped': 0}
+
+    def run(self, branches):
+        """Runs the branches; returns {name: outcome} in the order given, where outcome is
+        {'status': 'ok' | 'error' | 'timeout' | 'skipped', 'value' or 'error', 'seconds'}."""
+        by_name = {branch.name: branch for branch in branches}
+        outcomes = {}
+        running = {}  # future -> (branch, submitted at)
+
+        def submit(branch):
+            args = [outcomes[need]['value'] for need in branch.needs]
+            running[self._pool.submit(branch.fn, *args)] = (branch, time.monotonic())
+
+        def settle(branch, started, status, **detail):
+            seconds = time.monotonic() - started if started is not None else 0.0
+            outcomes[branch.name] = dict(status=status, seconds=round(seconds, 6), **detail)
+            BRANCH_SECONDS.observe(seconds, self.name, branch.name, status)
+
+        waiting = [branch for branch in branches if branch.needs]
+        for branch in branches:
+            if not branch.needs:
+                submit(branch)
+
+        while running:
+            now = time.monotonic()
+            next_deadline = min(started + branch.timeout for branch, started in running.values())
+            done, _ = wait(list(running), timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future, (branch, started) in list(running.items()):
+                if future in done:
+                    del running[future]
+                    try:
+                        settle(branch, started, 'ok', value=future.result())
+                    except Saturated as e:
+                        settle(branch, started, 'error', error=f"{e.name} is busy, try again shortly.")
+                    except Exception as e:
+                        log.info("Fan-out branch %s/%s failed: %s", self.name, branch.name, e)
+                        settle(branch, started, 'error', error=str(e) or type(e).__name__)
+                elif now >= started + branch.timeout:
+                    del running[future]
+                    future.cancel()
+                    settle(branch, started, 'timeout', error=f"No answer within {branch.timeout:g} s.")
+
+            # Start dependents whose inputs are all settled
+            for branch in list(waiting):
+                if not all(need in outcomes for need in branch.needs):
+                    continue
+                waiting.remove(branch)
+                failed = [need for need in branch.needs if outcomes[need]['status'] != 'ok']
+                if failed:
+                    settle(branch, None, 'skipped', error=f"Needs {', '.join(failed)}.")
+                else:
+                    submit(branch)
+
+        for branch in waiting:  # needs a branch that was never given
+            settle(branch, None, 'skipped', error=f"Needs {', '.join(branch.needs)}.")
+        with self._lock:
+            self.counters['runs'] += 1
+            for outcome in outcomes.values():
+                self.counters[outcome['status']] += 1
+        return {name: outcomes[name] for name in by_name}
+
+    @staticmethod
+    def failed_required(branches, outcomes):
+        """Names of the required branches that did not succeed."""
+        return [branch.name for branch in branches if branch.required and outcomes[branch.name]['status'] != 'ok']
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, max_workers=self.max_workers)
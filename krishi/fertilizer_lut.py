@@ -0,0 +1,142 @@
+"""Precomputed fertilizer recommendations over the integer N/P/K grid.
+
+The fertilizer forest only sees three features, and every split threshold lies below a
+small bound per feature, so the forest's answer for any non-negative integer input is
+fixed by a grid of a few tens of thousands of cells: values at or above the bound take
+the same path as the bound itself. FertilizerLookup stores that grid as a uint8 array
+of class indices; anything else (fractions, negatives) falls back to the forest.
+
+    python -m krishi.fertilizer_lut   # (re)build models/fertilizer_lut.npy
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from krishi.registry import file_fingerprint
+
+log = logging.getLogger(__name__)
+
+LUT_FILENAME = 'fertilizer_lut.npy'
+META_FILENAME = 'fertilizer_lut.json'
+
+
+class FertilizerLookup:
+    """O(1) fertilizer-model labels for integer inputs, with the forest as fallback.
+
+    table[i, j, k] is the index into classes_ for features (i, j, k), each clamped to
+    upper (the first integer above every threshold on that feature). `fallback` is the
+    forest itself or a zero-argument function returning it, so it is only loaded when an
+    off-grid input actually shows up.
+    """
+
+    def __init__(self, table, classes, fallback=None):
+        self.table = table
+        self.classes_ = np.asarray(classes)
+        self.upper = np.array(table.shape, dtype=np.int64) - 1
+        self.fallback = fallback
+
+    @classmethod
+    def build(cls, estimator, fallback=None):
+        """Evaluates `estimator` over the whole grid (in one batch) and packs the labels."""
+        forest = getattr(estimator, 'best_estimator_', estimator)
+        n_features = forest.n_features_in_
+        bounds = np.zeros(n_features, dtype=np.int64)
+        for tree in (est.tree_ for est in forest.estimators_):
+            split = tree.children_left >= 0
+            if split.any():
+                np.maximum.at(bounds, tree.feature[split], np.floor(tree.threshold[split]).astype(np.int64) + 1)
+        if len(forest.classes_) > 256:
+            raise ValueError("Too many classes for a uint8 lookup table.")
+
+        grid = np.stack(np.meshgrid(*(np.arange(b + 1) for b in bounds), indexing='ij'), axis=-1)
+        labels = estimator.predict(grid.reshape(-1, n_features).astype(np.float64))
+        class_index = np.searchsorted(forest.classes_, labels)
+        table = class_index.astype(np.uint8).reshape(grid.shape[:-1])
+        return cls(table, forest.classes_, fallback)
+
+    def lookup(self, *features):
+        """Label for one sample, or None if it is not a non-negative integer point."""
+        index = []
+        for value, upper in zip(features, self.upper):
+            value = float(value)
+            if value < 0 or not value.is_integer():
+                return None
+            index.append(min(int(value), upper))
+        return self.classes_[self.table[tuple(index)]]
+
+    def predict(self, X):
+        """Same labels as the forest's predict(); only off-grid rows reach the fallback."""
+        X = np.asarray(X, dtype=np.float64)
+        on_grid = np.all((X >= 0) & (X == np.floor(X)), axis=1)
+        labels = np.empty(len(X), dtype=self.classes_.dtype)
+        index = np.minimum(X[on_grid], self.upper).astype(np.intp)
+        labels[on_grid] = self.classes_.take(self.table[tuple(index.T)])
+        if not on_grid.all():
+            if self.fallback is None:
+                raise ValueError("Input is off the lookup grid and no fallback model is set.")
+            fallback = self.fallback if hasattr(self.fallback, 'predict') else self.fallback()
+            labels[~on_grid] = fallback.predict(X[~on_grid])
+        return labels
+
+    def save(self, models_dir, source_fingerprint=None):
+        """Writes the table, then its metadata, each through a temporary file of its own, so
+        workers building at the same time never write into each other's files."""
+        meta = {'classes': self.classes_.tolist(), 'shape': list(self.table.shape),
+                'source_fingerprint': source_fingerprint}
+        _write_atomically(os.path.join(models_dir, LUT_FILENAME), lambda f: np.save(f, self.table))
+        _write_atomically(os.path.join(models_dir, META_FILENAME),
+                          lambda f: f.write(json.dumps(meta, indent=1).encode()))
+
+    @classmethod
+    def load(cls, models_dir, fallback=None):
+        with open(os.path.join(models_dir, META_FILENAME)) as f:
+            meta = json.load(f)
+        table = np.load(os.path.join(models_dir, LUT_FILENAME), mmap_mode='r')
+        return cls(table, meta['classes'], fallback), meta
+
+
+def _write_atomically(path, write):
+    """Calls write(f) on a uniquely named temporary file next to `path`, then renames it over `path`."""
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or '.', prefix=f'.{os.path.basename(path)}.',
+                                     suffix='.tmp', delete=False) as f:
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
+
+
+def load_or_build(models_dir, source_filename, load_estimator, fallback=None):
+    """Loads the lookup table if it was built from the current `source_filename`;
+    otherwise rebuilds it from load_estimator() and (best effort) saves it."""
+    fingerprint = file_fingerprint(os.path.join(models_dir, source_filename))
+    try:
+        lookup, meta = FertilizerLookup.load(models_dir, fallback)
+        if meta.get('source_fingerprint') == fingerprint:
+            lookup.source_fingerprint = fingerprint
+            return lookup
+    except (OSError, ValueError, KeyError):
+        pass
+    lookup = FertilizerLookup.build(load_estimator(), fallback)
+    lookup.source_fingerprint = fingerprint
+    try:
+        lookup.save(models_dir, source_fingerprint=fingerprint)
+    except OSError as e:
+        log.warning("Could not save fertilizer lookup table to %s: %s", models_dir, e)
+    return lookup
+
+
+if __name__ == '__main__':
+    import pickle
+    models_dir = sys.argv[1] if len(sys.argv) > 1 else 'models'
+    with open(os.path.join(models_dir, 'fertilizer.pkl'), 'rb') as f:
+        estimator = pickle.load(f)
+    lookup = FertilizerLookup.build(estimator)
+    lookup.save(models_dir, source_fingerprint=file_fingerprint(os.path.join(models_dir, 'fertilizer.pkl')))
+    print(f"Fertilizer lookup table {lookup.table.shape} ({lookup.table.nbytes} bytes) -> {os.path.join(models_dir, LUT_FILENAME)}")
@@ -0,0 +1,104 @@
+"""Per-upstream concurrency caps with a bounded wait queue and fast rejection."""
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Saturated(Exception):
+    """The upstream already has max_concurrent calls running and no queue slot became free in time."""
+
+    def __init__(self, name, reason, retry_after):
+        super().__init__(f"{name} is busy ({reason})")
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class UpstreamLimiter:
+    """Lets at most `max_concurrent` callers use an upstream at once.
+
+    Up to `max_waiting` further callers queue for at most `queue_timeout` seconds;
+    anyone beyond that, or whose wait runs out, gets Saturated straight away so the
+    route can answer 503 instead of holding a worker. Built on threading primitives,
+    which gevent's monkey patching makes cooperative.
+    """
+
+    def __init__(self, name, max_concurrent, max_waiting=0, queue_timeout=0.0, retry_after=1):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.counters = {'admitted': 0, 'queued': 0, 'rejected_full': 0, 'rejected_timeout': 0,
+                         'wait_seconds_total': 0.0, 'peak_active': 0}
+
+    def acquire(self):
+        with self._cond:
+            # Newcomers do not overtake callers already queued
+            if self.active < self.max_concurrent and not self.waiting:
+                self._admit()
+                return
+            if self.waiting >= self.max_waiting:
+                self.counters['rejected_full'] += 1
+                raise Saturated(self.name, 'queue full', self.retry_after)
+            self.waiting += 1
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters['rejected_timeout'] += 1
+                        raise Saturated(self.name, 'queue timeout', self.retry_after)
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.counters['queued'] += 1
+            self.counters['wait_seconds_total'] += time.monotonic() - started
+            self._admit()
+
+    def _admit(self):
+        self.active += 1
+        self.counters['admitted'] += 1
+        self.counters['peak_active'] = max(self.counters['peak_active'], self.active)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._cond:
+            return dict(self.counters, name=self.name, active=self.active, waiting=self.waiting,
+                        max_concurrent=self.max_concurrent, max_waiting=self.max_waiting,
+                        queue_timeout=self.queue_timeout)
+
+
+def gevent_patched():
+    """True when gevent has monkey patched the socket module (gevent worker or krishi.serve)."""
+    monkey = sys.modules.get('gevent.monkey')
+    return bool(monkey and monkey.is_module_patched('socket'))
+
+
+def init_grpc_for_gevent():
+    """gRPC (used by google-generativeai) blocks the gevent hub unless told about it."""
+    try:
+        import grpc.experimental.gevent as grpc_gevent
+    except ImportError:
+        return False
+    grpc_gevent.init_gevent()
+    return True
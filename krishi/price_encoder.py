@@ -0,0 +1,134 @@
+"""Pandas-free encoder for the crop price model input."""
+import calendar
+import math
+
+import numpy as np
+
+# Dictionary to map month names to numbers
+month_map = {name: num for num, name in enumerate(calendar.month_name) if num > 0}
+month_map.update({str(i): i for i in range(1, 13)}) # Allow numbers as strings too
+
+
+class PriceEncoder:
+    """Writes price-form input straight into rows laid out like `price_model_columns`.
+
+    Everything that preprocess_price_input() works out per request with pandas (column
+    positions, one-hot slots, MinMaxScaler parameters) is resolved once here, so encoding a
+    request is a handful of float conversions into a preallocated row.
+
+    pd.get_dummies(drop_first=True) on a one-row frame drops the only category it sees, so
+    the live pipeline never sets a one-hot column. The encoder reproduces that by default;
+    pass one_hot=True to get the training-time encoding instead.
+    """
+
+    def __init__(self, model_columns, numerical_cols, categorical_cols, scaler,
+                 target='avg_modal_price', one_hot=False):
+        self.columns = list(model_columns)
+        self.numerical_cols = list(numerical_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.one_hot = one_hot
+
+        # The scaler was fitted on [target] + numerical_cols, in that order
+        scaled_cols = [target] + self.numerical_cols
+        position = {col: i for i, col in enumerate(self.columns)}
+        self._numeric = []  # (column, position in model row, scale, min)
+        for col in self.numerical_cols:
+            if col in position:
+                i = scaled_cols.index(col)
+                self._numeric.append((col, position[col], float(scaler.scale_[i]), float(scaler.min_[i])))
+        self._num_positions = np.array([p for _, p, _, _ in self._numeric], dtype=np.intp)
+        self._num_scale = np.array([s for _, _, s, _ in self._numeric], dtype=np.float64)
+        self._num_min = np.array([m for _, _, _, m in self._numeric], dtype=np.float64)
+
+        # One-hot slots, keyed by (categorical column, value) e.g. ('commodity_name', 'Wheat')
+        self.one_hot_positions = {}
+        for col in self.categorical_cols:
+            prefix = f"{col}_"
+            for name, i in position.items():
+                if name.startswith(prefix):
+                    self.one_hot_positions[(col, name[len(prefix):])] = i
+
+        self._template = np.zeros(len(self.columns), dtype=np.float64)
+
+    @property
+    def n_features(self):
+        return len(self.columns)
+
+    @property
+    def parsed_numerical_cols(self):
+        """Names of the raw numeric values parse() returns, in the same order."""
+        return [col for col, _, _, _ in self._numeric]
+
+    def parse(self, data):
+        """Validates one input dict; returns (raw numeric values, categorical values).
+
+        Raises ValueError with the same messages as preprocess_price_input().
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Input data must be a dictionary.")
+
+        if 'month' not in data:
+            raise ValueError("Missing 'month' column in input.")
+        month = month_map.get(str(data['month']).capitalize())
+        if month is None:
+            raise ValueError("Error processing 'month' column: Invalid 'month' value provided (use full name e.g., 'January' or number 1-12).")
+
+        numbers = {'month': month, 'change': _to_number(data.get('change'), default=0.0)}
+        for col in self.numerical_cols:
+            if col in numbers or col not in data:
+                continue
+            value = _to_number(data[col])
+            if value is None:
+                raise ValueError(f"Invalid or missing non-numeric value found in column '{col}'. Please provide a number.")
+            numbers[col] = value
+
+        categories = {}
+        for col in self.categorical_cols:
+            if col not in data:
+                raise ValueError(f"Error during one-hot encoding: Missing expected categorical column for encoding: '{col}'")
+            categories[col] = str(data[col])
+
+        for col in self.numerical_cols:
+            if col not in numbers:
+                raise ValueError(f"Internal Error: Feature column '{col}' unexpectedly missing before scaling.")
+
+        return [numbers[col] for col, _, _, _ in self._numeric], categories
+
+    def encode_into(self, out, data):
+        """Encodes one input dict into the preallocated row `out` (zeroed by the caller)."""
+        values, categories = self.parse(data)
+        out[self._num_positions] = np.asarray(values, dtype=np.float64) * self._num_scale + self._num_min
+        if self.one_hot:
+            for col, value in categories.items():
+                i = self.one_hot_positions.get((col, value))
+                if i is not None:
+                    out[i] = 1.0
+        return out
+
+    def encode(self, data):
+        """Encodes one input dict into a (1, n_features) row for price_model.predict()."""
+        row = self._template.copy()
+        self.encode_into(row, data)
+        return row.reshape(1, -1)
+
+    def encode_batch(self, rows):
+        """Encodes a list of input dicts into an (N, n_features) matrix.
+
+        A ValueError names the offending row.
+        """
+        X = np.zeros((len(rows), len(self.columns)), dtype=np.float64)
+        for i, data in enumerate(rows):
+            try:
+                self.encode_into(X[i], data)
+            except ValueError as e:
+                raise ValueError(f"Row {i}: {e}")
+        return X
+
+
+def _to_number(value, default=None):
+    """float() with pd.to_numeric(errors='coerce') semantics: None/NaN/garbage -> default."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if math.isnan(value) else value
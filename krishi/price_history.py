@@ -0,0 +1,328 @@
+"""Historical commodity prices as categorical-coded NumPy columns, sorted for range queries.
+
+Rows are kept sorted by (commodity, state, district, month); a series is one contiguous
+slice found through a dict, and a month range inside it is two binary searches, so a
+query never scans the dataset. New monthly rows are appended to the CSV (see
+`python -m krishi.price_history append`) and picked up by reading only the bytes past
+the last loaded offset, in every worker, without reloading the store. Malformed rows in
+the CSV are logged and skipped rather than failing every query.
+"""
+import argparse
+import csv
+import io
+import logging
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+COLUMNS = ['month', 'commodity_name', 'avg_modal_price', 'avg_min_price', 'avg_max_price',
+           'state_name', 'district_name', 'calculationType', 'change']
+CATEGORICAL = ('commodity_name', 'state_name', 'district_name')
+PRICES = ('avg_modal_price', 'avg_min_price', 'avg_max_price', 'change')
+REFRESH_INTERVAL = 1.0  # seconds between checks of the CSV for appended rows
+
+
+def parse_month(value):
+    """'2025-03-01', '2025-03' -> months since year 0 (an int that sorts and subtracts naturally)."""
+    parts = str(value).strip().split('-')
+    try:
+        year, month = int(parts[0]), int(parts[1])
+    except (ValueError, IndexError):
+        raise ValueError(f"Invalid month '{value}'; expected YYYY-MM or YYYY-MM-DD.")
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month '{value}'; expected YYYY-MM or YYYY-MM-DD.")
+    return year * 12 + month - 1
+
+
+def format_month(index):
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _price(value):
+    value = '' if value is None else str(value).strip()
+    return float(value) if value else math.nan
+
+
+def parse_row(row):
+    """Checks one CSV row (a list of COLUMNS values); returns it as a dict or raises ValueError."""
+    if len(row) != len(COLUMNS):
+        raise ValueError(f"expected {len(COLUMNS)} fields, got {len(row)}")
+    row = dict(zip(COLUMNS, row))
+    parse_month(row['month'])
+    for col in CATEGORICAL:
+        if not row[col].strip():
+            raise ValueError(f"empty {col}")
+    for col in PRICES:
+        try:
+            value = _price(row[col])
+        except ValueError:
+            raise ValueError(f"invalid {col} '{row[col]}'")
+        if math.isinf(value):
+            raise ValueError(f"invalid {col} '{row[col]}'")
+    return row
+
+
+def _json_number(value):
+    return None if math.isnan(value) else round(float(value), 2)
+
+
+class _Dictionary:
+    """Category name <-> small integer code; lookups ignore case and surrounding spaces."""
+
+    def __init__(self):
+        self.names = []
+        self._codes = {}
+
+    def code(self, name, add=False):
+        key = name.strip().lower()
+        code = self._codes.get(key)
+        if code is None and add:
+            code = self._codes[key] = len(self.names)
+            self.names.append(name.strip())
+        return code
+
+
+class PriceHistory:
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.dictionaries = {col: _Dictionary() for col in CATEGORICAL}
+        self.codes = {col: np.empty(0, dtype=np.int32) for col in CATEGORICAL}
+        self.month = np.empty(0, dtype=np.int32)
+        self.prices = {col: np.empty(0, dtype=np.float64) for col in PRICES}
+        self._series = {}  # (commodity, state, district) codes -> (start, stop)
+        self._offset = 0  # bytes of the CSV already loaded
+        self._checked = 0.0
+        self.skipped_rows = 0
+
+    @classmethod
+    def from_csv(cls, path):
+        history = cls(path)
+        history.refresh(force=True)
+        return history
+
+    def __len__(self):
+        return len(self.month)
+
+    # --- Loading and appending ---
+
+    def refresh(self, force=False):
+        """Loads rows appended to the CSV since the last call; returns how many were added."""
+        now = time.monotonic()
+        if not force and now - self._checked < REFRESH_INTERVAL:
+            return 0
+        with self._lock:
+            self._checked = now
+            if self.path is None:
+                return 0
+            size = os.path.getsize(self.path)
+            if size < self._offset:  # the file was replaced rather than appended to: start over
+                self._reset()
+                self._checked = now
+            if size <= self._offset:
+                return 0
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+            complete = data.rfind(b'\n') + 1  # a writer may be mid-line; leave the rest for next time
+            if not complete:
+                return 0
+            text = data[:complete].decode('utf-8-sig' if self._offset == 0 else 'utf-8')
+            reader = csv.reader(io.StringIO(text))
+            if self._offset == 0:
+                header = [h.strip() for h in next(reader)]
+                if header != COLUMNS:
+                    raise ValueError(f"Unexpected columns in {self.path}: {header}")
+            rows = []
+            for row in reader:
+                if not row:
+                    continue
+                try:
+                    rows.append(parse_row(row))
+                except ValueError as e:
+                    self.skipped_rows += 1
+                    log.warning("Skipping malformed row in %s: %s (%s)", self.path, ','.join(row), e)
+            self._offset += complete
+            return self.insert(rows)
+
+    def insert(self, rows):
+        """Inserts (or replaces, for an existing series and month) dict rows in sorted position."""
+        if not rows:
+            return 0
+        with self._lock:
+            # Parse everything before adding category codes, so a bad row leaves the store as it was
+            month = np.array([parse_month(row['month']) for row in rows], dtype=np.int32)
+            prices = {col: np.array([_price(row.get(col)) for row in rows], dtype=np.float64) for col in PRICES}
+            codes = {col: np.array([self.dictionaries[col].code(row[col], add=True) for row in rows], dtype=np.int32)
+                     for col in CATEGORICAL}
+
+            # Merge and re-sort; a stable sort keeps the newest row last for duplicate keys
+            for col in CATEGORICAL:
+                codes[col] = np.concatenate([self.codes[col], codes[col]])
+            month = np.concatenate([self.month, month])
+            for col in PRICES:
+                prices[col] = np.concatenate([self.prices[col], prices[col]])
+            order = np.lexsort((month, codes['district_name'], codes['state_name'], codes['commodity_name']))
+            key = np.stack([codes[col][order] for col in CATEGORICAL] + [month[order]])
+            last = np.ones(len(order), dtype=bool)  # keep the last row of each (series, month)
+            last[:-1] = np.any(key[:, 1:] != key[:, :-1], axis=0)
+            keep = order[last]
+            self.codes = {col: codes[col][keep] for col in CATEGORICAL}
+            self.month = month[keep]
+            self.prices = {col: prices[col][keep] for col in PRICES}
+            self._fill_change()
+            self._build_index()
+            return len(rows)
+
+    def _fill_change(self):
+        """Missing `change` values are the modal price difference to the previous month of the series."""
+        change, modal = self.prices['change'], self.prices['avg_modal_price']
+        missing = np.flatnonzero(np.isnan(change[1:])) + 1
+        for i in missing:
+            if all(self.codes[col][i] == self.codes[col][i - 1] for col in CATEGORICAL) \
+                    and self.month[i] == self.month[i - 1] + 1:
+                change[i] = modal[i] - modal[i - 1]
+
+    def _build_index(self):
+        stacked = np.stack([self.codes[col] for col in CATEGORICAL])
+        if not stacked.shape[1]:
+            self._series = {}
+            return
+        starts = np.flatnonzero(np.r_[True, np.any(stacked[:, 1:] != stacked[:, :-1], axis=0)])
+        stops = np.r_[starts[1:], stacked.shape[1]]
+        self._series = {tuple(int(c) for c in stacked[:, start]): (int(start), int(stop))
+                        for start, stop in zip(starts, stops)}
+
+    # --- Queries ---
+
+    def series_keys(self, commodity, state=None, district=None):
+        """Codes of the series matching the names given (None matches any)."""
+        wanted = []
+        for col, name in zip(CATEGORICAL, (commodity, state, district)):
+            if name is None:
+                wanted.append(None)
+                continue
+            code = self.dictionaries[col].code(name)
+            if code is None:
+                return []
+            wanted.append(code)
+        return [key for key in self._series if all(w is None or w == k for w, k in zip(wanted, key))]
+
+    def query(self, commodity, state=None, district=None, start=None, end=None, group=None):
+        """Monthly rows of each matching series between start and end (inclusive, 'YYYY-MM'),
+        with summary statistics; group='year' adds yearly averages."""
+        self.refresh()
+        first = parse_month(start) if start else None
+        last = parse_month(end) if end else None
+        results = []
+        with self._lock:
+            for key in sorted(self.series_keys(commodity, state, district)):
+                lo, hi = self._series[key]
+                months = self.month[lo:hi]
+                if first is not None:
+                    lo += int(np.searchsorted(months, first, side='left'))
+                if last is not None:
+                    hi = self._series[key][0] + int(np.searchsorted(months, last, side='right'))
+                results.append(self._describe(key, lo, max(lo, hi), group))
+        return results
+
+    def _describe(self, key, lo, hi, group):
+        months = self.month[lo:hi]
+        modal = self.prices['avg_modal_price'][lo:hi]
+        names = [self.dictionaries[col].names[code] for col, code in zip(CATEGORICAL, key)]
+        result = dict(zip(CATEGORICAL, names))
+        result['points'] = [
+            {'month': format_month(m), 'avg_modal_price': _json_number(p), 'avg_min_price': _json_number(mn),
+             'avg_max_price': _json_number(mx), 'change': _json_number(c)}
+            for m, p, mn, mx, c in zip(months.tolist(), modal.tolist(), self.prices['avg_min_price'][lo:hi].tolist(),
+                                      self.prices['avg_max_price'][lo:hi].tolist(), self.prices['change'][lo:hi].tolist())
+        ]
+        if hi > lo:
+            result['summary'] = {
+                'count': hi - lo,
+                'first_month': format_month(int(months[0])),
+                'last_month': format_month(int(months[-1])),
+                'min_modal_price': _json_number(np.nanmin(modal)),
+                'max_modal_price': _json_number(np.nanmax(modal)),
+                'mean_modal_price': _json_number(np.nanmean(modal)),
+                'latest_modal_price': _json_number(modal[-1]),
+                'total_change': _json_number(modal[-1] - modal[0]),
+                'total_change_pct': _json_number((modal[-1] / modal[0] - 1) * 100) if modal[0] else None,
+            }
+        else:
+            result['summary'] = {'count': 0}
+        if group == 'year' and hi > lo:
+            years = months // 12
+            boundaries = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+            sums = np.add.reduceat(modal, boundaries)
+            counts = np.diff(np.r_[boundaries, len(years)])
+            result['yearly'] = [{'year': int(years[b]), 'months': int(n), 'mean_modal_price': _json_number(s / n)}
+                                for b, s, n in zip(boundaries, sums, counts)]
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'rows': len(self), 'series': len(self._series), 'loaded_bytes': self._offset,
+                    'skipped_rows': self.skipped_rows,
+                    **{col: len(d.names) for col, d in self.dictionaries.items()}}
+
+
+def append_rows(path, rows):
+    """Validates dict rows and appends them to the CSV that PriceHistory tails."""
+    lines = io.StringIO()
+    writer = csv.writer(lines, lineterminator='\r\n')  # the dataset uses CRLF
+    for i, row in enumerate(rows, start=1):
+        missing = [col for col in COLUMNS if col != 'change' and not str(row.get(col, '')).strip()]
+        if missing:
+            raise ValueError(f"Row {i}: missing {', '.join(missing)}")
+        month = parse_month(row['month'])
+        for col in PRICES:
+            if str(row.get(col, '')).strip():
+                float(row[col])
+        writer.writerow([f"{format_month(month)}-01"] + [row.get(col, '') for col in COLUMNS[1:]])
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\r\n')
+        f.write(lines.getvalue().encode('utf-8'))
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m krishi.price_history', description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=os.path.join('datasets', 'crop_price_dataset.csv'))
+    commands = parser.add_subparsers(dest='command', required=True)
+    append = commands.add_parser('append', help="append the rows of another CSV (same columns) to the dataset")
+    append.add_argument('rows_csv')
+    query = commands.add_parser('query', help="print one series")
+    query.add_argument('commodity')
+    query.add_argument('--start')
+    query.add_argument('--end')
+    args = parser.parse_args(argv)
+
+    if args.command == 'append':
+        with open(args.rows_csv, newline='', encoding='utf-8-sig') as f:
+            count = append_rows(args.csv, list(csv.DictReader(f)))
+        print(f"Appended {count} rows to {args.csv}")
+    else:
+        history = PriceHistory.from_csv(args.csv)
+        for series in history.query(args.commodity, start=args.start, end=args.end):
+            print(series['commodity_name'], series['state_name'], series['district_name'], series['summary'])
+            for point in series['points']:
+                print(f"  {point['month']}  {point['avg_modal_price']:>10}  {point['change']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
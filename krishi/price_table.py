@@ -0,0 +1,143 @@
+"""Precomputed crop price predictions over the month x category grid.
+
+Almost every /get_price_prediction request leaves the numeric fields at the route's
+defaults, so its answer depends only on the month and the categorical fields - and only
+on the categories that actually have a one-hot column (or, with an encoder built with
+one_hot=False, on the month alone). PriceTable runs the model once over that grid and
+keeps the inverse-scaled prices in an array indexed by month and one-hot slot; requests
+with any other numeric value return None from lookup() and use the model.
+
+    python -m krishi.price_table   # (re)build models/price_table.npy
+"""
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from krishi.registry import file_fingerprint
+
+log = logging.getLogger(__name__)
+
+TABLE_FILENAME = 'price_table.npy'
+META_FILENAME = 'price_table.json'
+# Every file the table's values depend on
+SOURCE_FILENAMES = ['crop_price.pkl', 'min_max_scaler.pkl', 'model_columns.pkl',
+                    'original_numerical_cols.pkl', 'original_categorical_cols.pkl']
+MONTHS = 12
+# Bumped when the way values are computed changes, so tables saved by older code are rebuilt
+FORMAT_VERSION = 2
+
+
+class PriceTable:
+    """O(1) price predictions for inputs whose numeric fields equal `defaults`.
+
+    table[month - 1, s1, s2, ...] is the predicted avg_modal_price, where s_i is the
+    one-hot slot of the i-th categorical column: 1 + the index of its value in
+    categories[i][1], or 0 for a value without a column of its own (the category dropped
+    by drop_first, unknown values, and every value when the encoder is not one-hot).
+    """
+
+    def __init__(self, table, categories, defaults, encoder):
+        self.table = table
+        self.categories = [(col, list(values)) for col, values in categories]
+        self.defaults = dict(defaults)
+        self.encoder = encoder
+        self._slots = [(col, {value: i for i, value in enumerate(values, start=1)})
+                       for col, values in self.categories]
+        self._numeric_cols = encoder.parsed_numerical_cols
+
+    @classmethod
+    def build(cls, encoder, model, target_scaling, defaults):
+        """Encodes the whole grid with encode_batch() and predicts it in one call."""
+        if 'month' not in encoder.parsed_numerical_cols:
+            raise ValueError("The price model has no 'month' feature to index the table by.")
+        categories = []
+        for col in encoder.categorical_cols:
+            values = sorted(v for c, v in encoder.one_hot_positions if c == col) if encoder.one_hot else []
+            categories.append((col, values))
+
+        shape = (MONTHS,) + tuple(len(values) + 1 for _, values in categories)
+        rows = []
+        for index in np.ndindex(*shape):
+            row = dict(defaults, month=str(index[0] + 1))
+            for (col, values), slot in zip(categories, index[1:]):
+                row[col] = values[slot - 1] if slot else ''  # '' has no one-hot column
+            rows.append(row)
+        target_min, target_scale = target_scaling
+        prices = (model.predict(encoder.encode_batch(rows)) - target_min) / target_scale
+        return cls(np.asarray(prices, dtype=np.float64).reshape(shape), categories, defaults, encoder)
+
+    def lookup(self, data):
+        """Predicted price for one input dict, or None if a numeric field is not at its default.
+
+        Raises the encoder's ValueError for invalid input, like the live path.
+        """
+        values, categories = self.encoder.parse(data)
+        numbers = dict(zip(self._numeric_cols, values))
+        for col, default in self.defaults.items():
+            if numbers.get(col, default) != default:
+                return None
+        index = [int(numbers['month']) - 1]
+        index.extend(slots.get(categories[col], 0) for col, slots in self._slots)
+        return float(self.table[tuple(index)])
+
+    def __len__(self):
+        return self.table.size
+
+    def save(self, models_dir, source_fingerprint=None):
+        tmp = os.path.join(models_dir, f'.{TABLE_FILENAME}.tmp')
+        with open(tmp, 'wb') as f:
+            np.save(f, self.table)
+        os.replace(tmp, os.path.join(models_dir, TABLE_FILENAME))
+        meta = {'categories': self.categories, 'defaults': self.defaults, 'shape': list(self.table.shape),
+                'source_fingerprint': source_fingerprint}
+        with open(os.path.join(models_dir, META_FILENAME), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+    @classmethod
+    def load(cls, models_dir, encoder):
+        with open(os.path.join(models_dir, META_FILENAME)) as f:
+            meta = json.load(f)
+        table = np.load(os.path.join(models_dir, TABLE_FILENAME))
+        return cls(table, meta['categories'], meta['defaults'], encoder), meta
+
+
+def source_fingerprint(models_dir, encoder, defaults):
+    """Changes whenever the model, the scaler, the column lists, the encoding mode, the
+    numeric defaults or FORMAT_VERSION change - i.e. whenever a stored table could be stale."""
+    digest = hashlib.sha256()
+    for filename in SOURCE_FILENAMES:
+        digest.update(f"{filename}:{file_fingerprint(os.path.join(models_dir, filename))};".encode())
+    digest.update(json.dumps({'format': FORMAT_VERSION, 'one_hot': encoder.one_hot, 'defaults': defaults}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def load_or_build(models_dir, encoder, load_model, target_scaling, defaults):
+    """Loads the stored table if it was built from the current artifacts and defaults;
+    otherwise rebuilds it with load_model() and (best effort) saves it."""
+    fingerprint = source_fingerprint(models_dir, encoder, defaults)
+    try:
+        table, meta = PriceTable.load(models_dir, encoder)
+        if meta.get('source_fingerprint') == fingerprint:
+            return table
+    except (OSError, ValueError, KeyError):
+        pass
+    table = PriceTable.build(encoder, load_model(), target_scaling, defaults)
+    log.info("Built price table %s from %s", table.table.shape, models_dir)
+    try:
+        table.save(models_dir, source_fingerprint=fingerprint)
+    except OSError as e:
+        log.warning("Could not save price table to %s: %s", models_dir, e)
+    return table
+
+
+if __name__ == '__main__':
+    import app  # the same artifacts and defaults the route uses
+    models_dir = app.registry.base_dir
+    encoder = app.registry.get('price_encoder')
+    table = PriceTable.build(encoder, app.registry.get('price_model'), app.registry.get('price_target_scaling'),
+                             app.PRICE_DEFAULTS)
+    table.save(models_dir, source_fingerprint=source_fingerprint(models_dir, encoder, app.PRICE_DEFAULTS))
+    print(f"Price table {table.table.shape} ({table.table.nbytes} bytes) -> {os.path.join(models_dir, TABLE_FILENAME)}")
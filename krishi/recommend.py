@@ -0,0 +1,152 @@
+"""Crop and fertilizer recommendation, for one soil sample or a whole batch."""
+import csv
+import io
+import math
+
+import numpy as np
+
+from krishi.metrics import stage
+
+# Order matters: this is the column order ms/sc/crop_model were fitted on
+CROP_FEATURES = ['nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall']
+# Soil-lab exports often use the dataset headers (N, P, K) instead of the form names
+FEATURE_ALIASES = {'n': 'nitrogen', 'p': 'phosphorus', 'k': 'potassium'}
+# The fertilizer model only looks at the first three columns (N, P, K)
+FERTILIZER_FEATURE_COUNT = 3
+
+MAX_BATCH_ROWS = 10000
+
+crop_dict = {1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut", 6: "Papaya", 7: "Orange",
+             8: "Apple", 9: "Muskmelon", 10: "Watermelon", 11: "Grapes", 12: "Mango", 13: "Banana",
+             14: "Pomegranate", 15: "Lentil", 16: "Blackgram", 17: "Mungbean", 18: "Mothbeans",
+             19: "Pigeonpeas", 20: "Kidneybeans", 21: "Chickpea", 22: "Coffee"}
+
+fertilizer_dict = {
+    0: 'Urea',
+    1: 'DAP',
+    2: 'Fourteen-Thirty Five-Fourteen (14-30 5-14)',
+    3: 'Twenty Eight-Twenty Eight (20 8-20 8)',
+    4: 'Seventeen-Seventeen-Seventeen (17-17-17)',
+    5: 'Twenty-Twenty (20-20)',
+    6: 'Ten-Twenty Six-Twenty Six (10-20 6-26)'
+}
+
+
+def _label_table(mapping, default):
+    """Turns an {int label: name} dict into an array so a whole batch maps with one take()."""
+    table = np.full(max(mapping) + 2, default, dtype=object)  # last slot catches unknown labels
+    for label, name in mapping.items():
+        table[label] = name
+    return table
+
+
+CROP_NAMES = _label_table(crop_dict, None)
+FERTILIZER_NAMES = _label_table(fertilizer_dict, "Unknown Fertilizer")
+
+
+def map_labels(labels, table):
+    """Vectorized dict lookup: labels outside the table map to its default (last) slot."""
+    labels = np.asarray(labels).astype(np.int64, copy=False)
+    unknown = len(table) - 1
+    idx = np.where((labels >= 0) & (labels < unknown), labels, unknown)
+    return table.take(idx)
+
+
+def _normalise_row(row):
+    return {FEATURE_ALIASES.get(str(k).strip().lower(), str(k).strip().lower()): v for k, v in row.items()}
+
+
+def parse_rows(rows):
+    """Parses dict rows into one float64 matrix.
+
+    Returns (X, row_numbers, errors): X holds the valid rows only, row_numbers maps each
+    X row back to its position in the input and errors lists {'row', 'error'} per bad row.
+    """
+    X = np.empty((len(rows), len(CROP_FEATURES)), dtype=np.float64)
+    row_numbers = []
+    errors = []
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': i, 'error': "Each sample must be an object of feature values."})
+            continue
+        row = _normalise_row(row)
+        values = []
+        for name in CROP_FEATURES:
+            value = row.get(name)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                errors.append({'row': i, 'error': f"Missing value for '{name}'."})
+                break
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                errors.append({'row': i, 'error': f"Invalid value for '{name}': {row.get(name)!r}."})
+                break
+            if not math.isfinite(value):
+                errors.append({'row': i, 'error': f"Invalid value for '{name}': {row.get(name)!r}."})
+                break
+            values.append(value)
+        else:
+            X[len(row_numbers)] = values
+            row_numbers.append(i)
+    return X[:len(row_numbers)], row_numbers, errors
+
+
+def rows_from_csv(text):
+    """Reads CSV text with a header line into a list of dict rows."""
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def recommend(X, ms, sc, crop_model, fertilizer_model):
+    """Runs both scalers and both forests once over the whole matrix.
+
+    Returns (crops, fertilizers) as object arrays of names; a crop is None when the
+    model returned a label that is not in crop_dict.
+    """
+    with stage('scale'):
+        final_features = sc.transform(ms.transform(X))
+    with stage('predict'):
+        crop_labels = crop_model.predict(final_features)
+        fertilizer_labels = fertilizer_model.predict(X[:, :FERTILIZER_FEATURE_COUNT])
+    return map_labels(crop_labels, CROP_NAMES), map_labels(fertilizer_labels, FERTILIZER_NAMES)
+
+
+def recommend_cached(X, cache, predict):
+    """Serves rows from a ResultCache and calls predict() once for all the misses.
+
+    predict(X) -> (crops, fertilizers) as recommend() returns them. Misses are computed
+    on the quantized rows so every cached answer is exactly the model's answer for its key.
+    """
+    X_quantized = cache.quantize(X)
+    keys = cache.keys(X_quantized)
+    crops = np.empty(len(keys), dtype=object)
+    fertilizers = np.empty(len(keys), dtype=object)
+    missing = []
+    for i, key in enumerate(keys):
+        value = cache.get(key)
+        if value is None:
+            missing.append(i)
+        else:
+            crops[i], fertilizers[i] = value
+    if missing:
+        new_crops, new_fertilizers = predict(X_quantized[missing])
+        for i, crop, fertilizer in zip(missing, new_crops, new_fertilizers):
+            crops[i], fertilizers[i] = crop, fertilizer
+            cache.put(keys[i], [crop, fertilizer])
+    return crops, fertilizers
+
+
+def recommend_batch(rows, predict):
+    """Validates and scores a list of dict rows with predict(X) -> (crops, fertilizers);
+    returns (results, errors)."""
+    with stage('parse'):
+        X, row_numbers, errors = parse_rows(rows)
+    results = []
+    if len(row_numbers):
+        crops, fertilizers = predict(X)
+        for row, crop, fertilizer in zip(row_numbers, crops, fertilizers):
+            if crop is None:
+                errors.append({'row': row, 'error': "Could not determine the best crop for this sample."})
+            else:
+                results.append({'row': row, 'crop': crop, 'fertilizer': fertilizer})
+        errors.sort(key=lambda e: e['row'])
+    return results, errors
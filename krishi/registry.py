@@ -0,0 +1,157 @@
+"""Lazy model registry: artifacts load on first use (or warmup) and report what they cost."""
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+import joblib
+
+
+def _load_pickle(path, mmap_mode=None):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _load_joblib(path, mmap_mode=None):
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+LOADERS = {'pickle': _load_pickle, 'joblib': _load_joblib}
+
+
+def resident_bytes():
+    """Current resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def file_fingerprint(path):
+    """sha256 of a file's contents; used to tie derived artifacts to the model they came from."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Loads model artifacts from `base_dir` on first get() and keeps one copy per process.
+
+    Artifacts are either files (register) or values built from other artifacts
+    (register_factory). Loading is thread-safe: concurrent first requests wait for a single
+    load. Call warmup() before forking workers (gunicorn --preload) so they all share the
+    parent's pages copy-on-write instead of each loading a private copy.
+    """
+
+    def __init__(self, base_dir='models'):
+        self.base_dir = base_dir
+        self._specs = {}
+        self._values = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def path(self, filename):
+        return os.path.join(self.base_dir, filename)
+
+    def register(self, name, filename, loader='pickle', mmap_mode=None):
+        """Registers a file artifact. mmap_mode is passed to joblib.load for joblib artifacts."""
+        load = LOADERS[loader] if isinstance(loader, str) else loader
+        path = self.path(filename)
+        self._specs[name] = (lambda: load(path, mmap_mode=mmap_mode), path)
+
+    def register_factory(self, name, factory):
+        """Registers an artifact computed by factory(registry), e.g. an encoder built from a scaler."""
+        self._specs[name] = (lambda: factory(self), None)
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def is_loaded(self, name):
+        return name in self._values
+
+    def get(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._values:
+                self._load(name)
+            return self._values[name]
+
+    def _load(self, name):
+        load, path = self._specs[name]
+        rss_before = resident_bytes()
+        start = time.perf_counter()
+        fingerprint = file_fingerprint(path) if path else None
+        value = load()
+        if path:
+            # Reload until the file is the same before and after, so the fingerprint
+            # describes the bytes the value was actually loaded from
+            current = file_fingerprint(path)
+            while current != fingerprint:
+                fingerprint = current
+                value = load()
+                current = file_fingerprint(path)
+        load_seconds = time.perf_counter() - start
+        rss_after = resident_bytes()
+        self._values[name] = value
+        self._stats[name] = {
+            'path': path,
+            'fingerprint': fingerprint,
+            'file_bytes': os.path.getsize(path) if path else None,
+            'load_seconds': round(load_seconds, 6),
+            'rss_delta_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        }
+
+    def fingerprint(self, name):
+        """sha256 of the file an artifact was loaded from (loading it if needed).
+
+        File artifacts record it in get(); derived ones report theirs as a source_fingerprint
+        attribute (the flat forests and the fertilizer lookup table do).
+        """
+        value = self.get(name)
+        if self._specs[name][1]:
+            return self._stats[name]['fingerprint']
+        fingerprint = getattr(value, 'source_fingerprint', None)
+        if fingerprint is None:
+            raise ValueError(f"Artifact '{name}' does not record the file it was built from.")
+        return fingerprint
+
+    def version(self, names):
+        """Short token from the fingerprints of the named artifacts as loaded, so it changes
+        exactly when this process serves a different model, not when a file changes on disk."""
+        digest = hashlib.sha1()
+        for name in names:
+            digest.update(f"{name}:{self.fingerprint(name)};".encode())
+        return digest.hexdigest()[:12]
+
+    def warmup(self, names=None):
+        """Loads the given artifacts (all registered ones by default); returns failures by name."""
+        failed = {}
+        for name in names or list(self._specs):
+            try:
+                self.get(name)
+            except Exception as e:
+                failed[name] = f"{type(e).__name__}: {e}"
+        return failed
+
+    def unload(self, name=None):
+        """Drops one artifact (or all of them) so the next get() reloads from disk."""
+        with self._lock:
+            for key in [name] if name else list(self._values):
+                self._values.pop(key, None)
+                self._stats.pop(key, None)
+
+    def stats(self):
+        """Per-artifact load status, on-disk size, load time and resident size added by the load."""
+        report = {}
+        for name, (_, path) in self._specs.items():
+            entry = {'loaded': name in self._values, 'path': path}
+            entry.update(self._stats.get(name, {}))
+            report[name] = entry
+        return {'artifacts': report, 'process_rss_bytes': resident_bytes()}
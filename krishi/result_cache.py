@@ -0,0 +1,193 @@
+"""Bounded LRU/TTL cache for recommendation results, keyed on quantized inputs.
+
+Two backends share one interface: MemoryBackend (per process, the default) and
+SQLiteBackend (a local file that every worker on the host reads and writes). Keys carry
+a model version, so results computed by an older model are never served after the
+artifacts change.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """OrderedDict LRU with per-entry expiry; thread-safe."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        """Returns (value, status) with status 'hit', 'miss' or 'expired'."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None, 'miss'
+            value, expires = entry
+            if expires <= now:
+                del self._data[key]
+                return None, 'expired'
+            self._data.move_to_end(key)
+            return value, 'hit'
+
+    def put(self, key, value, expires):
+        """Stores an entry; returns how many entries were evicted to make room."""
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """LRU cache in a local SQLite file, shared by all worker processes on a host.
+
+    Values must be JSON-serialisable. Each thread gets its own connection.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._puts = 0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS result_cache ("
+                         "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS result_cache_last_used ON result_cache (last_used)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, now):
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires FROM result_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, 'miss'
+        if row[1] <= now:
+            conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+            return None, 'expired'
+        conn.execute("UPDATE result_cache SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), 'hit'
+
+    def put(self, key, value, expires):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO result_cache (key, value, expires, last_used) VALUES (?, ?, ?, ?)",
+                     (key, json.dumps(value), expires, time.time()))
+        # Counting rows on every put is wasteful; trim the table every 64 puts instead
+        self._puts += 1
+        if self._puts % 64:
+            return 0
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return 0
+        cursor = conn.execute("DELETE FROM result_cache WHERE key IN "
+                              "(SELECT key FROM result_cache ORDER BY last_used LIMIT ?)", (excess,))
+        return cursor.rowcount
+
+    def clear(self):
+        self._connect().execute("DELETE FROM result_cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+
+
+class ResultCache:
+    """Caches results keyed on inputs rounded to `decimals` (one value, or one per feature).
+
+    Callers should compute misses on the quantized row returned by quantize(), so a
+    cached answer is exactly what the model gives for its key. Backend errors are logged
+    and treated as misses: the cache never fails a request.
+    """
+
+    def __init__(self, backend, ttl=3600, decimals=2, version=''):
+        self.backend = backend
+        self.ttl = ttl
+        self.decimals = decimals
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def quantize(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if np.ndim(self.decimals) == 0:
+            return np.round(X, self.decimals)
+        return np.column_stack([np.round(X[:, i], d) for i, d in enumerate(self.decimals)])
+
+    def keys(self, X_quantized):
+        return [f"{self.version}|" + ",".join(repr(float(v)) for v in row) for row in X_quantized]
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def get(self, key):
+        try:
+            value, status = self.backend.get(key, time.time())
+        except sqlite3.Error as e:
+            log.warning("Result cache read failed: %s", e)
+            self._count(errors=1, misses=1)
+            return None
+        if status == 'hit':
+            self._count(hits=1)
+        else:
+            self._count(misses=1, expirations=status == 'expired')
+        return value
+
+    def put(self, key, value):
+        try:
+            evicted = self.backend.put(key, value, time.time() + self.ttl)
+        except sqlite3.Error as e:
+            log.warning("Result cache write failed: %s", e)
+            self._count(errors=1)
+            return
+        self._count(evictions=evicted)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        try:
+            size = len(self.backend)
+        except sqlite3.Error:
+            size = None
+        return {
+            'backend': type(self.backend).__name__,
+            'version': self.version,
+            'size': size,
+            'max_entries': self.backend.max_entries,
+            'ttl_seconds': self.ttl,
+            'decimals': self.decimals,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'errors': self.errors,
+        }
@@ -0,0 +1,49 @@
+"""High-concurrency server for app.py on gevent.
+
+    python -m krishi.serve [--host 0.0.0.0] [--port 5000] [--connections 1000]
+
+Monkey patching has to happen before app.py (and requests, sqlite3, threading users)
+is imported, which is why this is a separate entry point rather than a flag on app.py.
+Slow Gemini and OpenWeatherMap calls then only park a greenlet, and /predict and the
+template routes keep being served. Under gunicorn use `-k gevent` instead, without
+--preload, so the worker patches before it imports the app.
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import socket  # noqa: E402
+
+from gevent.pool import Pool  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+
+class _Server(WSGIServer):
+    def handle(self, sock, address):
+        # pywsgi sends headers and body separately; without this Nagle holds the body
+        # back until the client's delayed ACK, adding ~40 ms to every small response
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().handle(sock, address)
+
+
+def serve(wsgi_app, host='127.0.0.1', port=5000, connections=1000):
+    """Serves wsgi_app, handling at most `connections` requests at a time."""
+    server = _Server((host, port), wsgi_app, spawn=Pool(connections))
+    print(f"Serving on http://{host}:{server.server_port} with gevent (up to {connections} connections)")
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--connections', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    from app import app
+    serve(app, args.host, args.port, args.connections)
+
+
+if __name__ == '__main__':
+    main()
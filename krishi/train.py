@@ -0,0 +1,303 @@
+"""Retrains the crop, fertilizer and price models from datasets/ and writes versioned artifacts.
+
+    python -m krishi.train [--workers N] [--only crop fertilizer price] [--install]
+
+Preprocessing follows the notebooks (Crop_SPH, Fertilizer, Crop_Price) so the artifacts
+are drop-in replacements for the ones app.py loads. Each model's hyperparameters are
+searched in a process pool and the winner maximizes
+
+    quality - latency_weight * single-row predict ms - size_weight * pickled MB
+
+where quality is cross-validated accuracy (crop, fertilizer) or validation R^2 (price),
+and latency is timed on what app.py serves: the flat forest for crop, the lookup table
+for fertilizer and the sklearn forest for price.
+A run writes models/versions/<version>/ with the same file names as models/ plus
+manifest.json (scores, parameters, column metadata, file hashes); --install copies the
+artifacts into models/, where the derived flat forests, lookup table and result cache
+pick the change up by themselves.
+"""
+import argparse
+import itertools
+import json
+import os
+import pickle
+import platform
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from krishi.fertilizer_lut import FertilizerLookup
+from krishi.recommend import CROP_FEATURES, crop_dict
+from krishi.registry import file_fingerprint
+from krishi.tree_engine import FlatForest
+
+VERSIONS_DIR = 'versions'
+LATENCY_CALLS = 30
+
+# Search spaces; n_jobs=1 inside each model because the pool already uses every core
+SEARCH_SPACES = {
+    'crop': {'n_estimators': [10, 25, 50, 100], 'max_depth': [None, 8, 12, 16], 'min_samples_leaf': [1, 2]},
+    'fertilizer': {'n_estimators': [25, 50, 100, 300], 'max_depth': [3, 5, 7, None], 'min_samples_split': [2, 5]},
+    'price': {'n_estimators': [25, 50, 100, 200], 'max_depth': [5, 10, 20, None], 'min_samples_leaf': [1, 2]},
+}
+
+# Same column lists the notebooks saved next to the price model
+PRICE_TARGET = 'avg_modal_price'
+PRICE_NUMERICAL_COLS = ['avg_min_price', 'avg_max_price', 'month', 'change']
+PRICE_CATEGORICAL_COLS = ['commodity_name', 'state_name', 'district_name', 'calculationType']
+FERTILIZER_COLUMNS = ['Nitrogen', 'Potassium', 'Phosphorous']  # the order fertilizer.pkl was fitted on
+
+
+# --- Datasets, prepared exactly as in the notebooks ---
+
+def load_crop(datasets_dir):
+    """(X_train, X_test, y_train, y_test, mx, sc) with both scalers fitted on the training split."""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+    df = pd.read_csv(os.path.join(datasets_dir, 'crop.csv'))
+    label_ids = {name.lower(): label for label, name in crop_dict.items()}
+    X = df.iloc[:, :-1].to_numpy(dtype=np.float64)
+    y = df['label'].map(label_ids).to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=0)
+    mx = MinMaxScaler().fit(X_train)
+    sc = StandardScaler().fit(mx.transform(X_train))
+    return sc.transform(mx.transform(X_train)), sc.transform(mx.transform(X_test)), y_train, y_test, mx, sc
+
+
+def load_fertilizer(datasets_dir):
+    """(X_train, X_test, y_train, y_test, class names); labels are LabelEncoder codes like fertilizer.pkl's."""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(os.path.join(datasets_dir, 'Fertilizer.csv'))
+    names = sorted(df['Fertilizer Name'].unique())
+    y = df['Fertilizer Name'].map({name: i for i, name in enumerate(names)}).to_numpy()
+    X = df[FERTILIZER_COLUMNS].to_numpy(dtype=np.float64)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=1)
+    return X_train, X_test, y_train, y_test, names
+
+
+def load_price(datasets_dir):
+    """(X_train, X_val, X_test, y_train, y_val, y_test, scaler, model_columns)."""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import MinMaxScaler
+
+    df = pd.read_csv(os.path.join(datasets_dir, 'crop_price_dataset.csv'))
+    df['month'] = pd.to_datetime(df['month']).dt.month
+    df['change'] = df['change'].fillna(df['change'].mean())
+    for col in [PRICE_TARGET, 'avg_min_price', 'avg_max_price']:  # winsorize outliers (IQR)
+        q1, q3 = df[col].quantile(0.25), df[col].quantile(0.75)
+        df[col] = np.clip(df[col], q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+    df = df.drop_duplicates()
+    df = pd.get_dummies(df, columns=PRICE_CATEGORICAL_COLS, drop_first=True)
+    scaled_cols = [PRICE_TARGET] + PRICE_NUMERICAL_COLS  # the scaler is fitted with the target first
+    scaler = MinMaxScaler()
+    df[scaled_cols] = scaler.fit_transform(df[scaled_cols])
+
+    X = df.drop(PRICE_TARGET, axis=1)
+    y = df[PRICE_TARGET].to_numpy()
+    stratify = X['commodity_name_Maize'] if 'commodity_name_Maize' in X else None
+    X_train, X_temp, y_train, y_temp = train_test_split(X, y, test_size=0.2, random_state=42, stratify=stratify)
+    X_val, X_test, y_val, y_test = train_test_split(
+        X_temp, y_temp, test_size=0.5, random_state=42,
+        stratify=X_temp['commodity_name_Maize'] if stratify is not None else None)
+    as_array = lambda frame: frame.to_numpy(dtype=np.float64)
+    return (as_array(X_train), as_array(X_val), as_array(X_test), y_train, y_val, y_test,
+            scaler, list(X.columns))
+
+
+# --- Candidate evaluation (runs in the worker processes) ---
+
+_datasets = {}
+
+
+def _dataset(kind, datasets_dir):
+    key = (kind, datasets_dir)
+    if key not in _datasets:
+        _datasets[key] = {'crop': load_crop, 'fertilizer': load_fertilizer, 'price': load_price}[kind](datasets_dir)
+    return _datasets[key]
+
+
+def _estimator(kind, params):
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    cls = RandomForestRegressor if kind == 'price' else RandomForestClassifier
+    return cls(random_state=42, n_jobs=1, **params)
+
+
+def evaluate(kind, params, datasets_dir):
+    """Fits one candidate; returns its quality score, test score and pickled model."""
+    from sklearn.model_selection import cross_val_score
+
+    data = _dataset(kind, datasets_dir)
+    if kind == 'price':
+        X_train, X_val, X_test, y_train, y_val, y_test = data[:6]
+        model = _estimator(kind, params).fit(X_train, y_train)
+        quality, test_score = model.score(X_val, y_val), model.score(X_test, y_test)  # R^2
+    else:
+        X_train, X_test, y_train, y_test = data[:4]
+        quality = float(cross_val_score(_estimator(kind, params), X_train, y_train, cv=3).mean())
+        model = _estimator(kind, params).fit(X_train, y_train)
+        test_score = model.score(X_test, y_test)  # accuracy
+    return {'params': params, 'quality': float(quality), 'test_score': float(test_score),
+            'model': pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)}
+
+
+def serving_model(kind, model):
+    """The object app.py answers single-row requests with for a fitted `model`."""
+    if kind == 'crop':
+        return FlatForest.from_estimator(model)
+    if kind == 'fertilizer':
+        return FertilizerLookup.build(model, fallback=FlatForest.from_estimator(model))
+    return model
+
+
+def measure_latency(model, row, calls=LATENCY_CALLS):
+    """Median seconds of a single-row predict(), the shape every form request has."""
+    model.predict(row)
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        model.predict(row)
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples))
+
+
+def candidates(kind):
+    space = SEARCH_SPACES[kind]
+    return [dict(zip(space, values)) for values in itertools.product(*space.values())]
+
+
+def search(kind, datasets_dir, pool, latency_weight, size_weight):
+    """Evaluates every candidate in the pool, then times them one by one in this process
+    (timing inside a busy pool would mostly measure the neighbours)."""
+    results = list(pool.map(evaluate, itertools.repeat(kind), candidates(kind), itertools.repeat(datasets_dir)))
+    data = _dataset(kind, datasets_dir)
+    row = data[1][:1]  # one held-out row
+    for result in results:
+        model = serving_model(kind, pickle.loads(result['model']))
+        result['latency_ms'] = measure_latency(model, row) * 1e3
+        result['size_bytes'] = len(result['model'])
+        result['objective'] = (result['quality'] - latency_weight * result['latency_ms']
+                               - size_weight * result['size_bytes'] / 1e6)
+    results.sort(key=lambda r: r['objective'], reverse=True)
+    return results
+
+
+# --- Artifacts ---
+
+def write_artifacts(directory, kind, best, datasets_dir):
+    """Writes the files app.py loads for one model kind; returns their names."""
+    import joblib
+
+    model = pickle.loads(best['model'])
+    data = _dataset(kind, datasets_dir)
+    if kind == 'crop':
+        # Loaded with pickle by app.py
+        for filename, obj in (('crop_model.pkl', model), ('mx.pkl', data[4]), ('sc.pkl', data[5])):
+            with open(os.path.join(directory, filename), 'wb') as f:
+                pickle.dump(obj, f)
+        return ['crop_model.pkl', 'mx.pkl', 'sc.pkl']
+    if kind == 'fertilizer':
+        with open(os.path.join(directory, 'fertilizer.pkl'), 'wb') as f:
+            pickle.dump(model, f)
+        return ['fertilizer.pkl']
+    # Loaded with joblib by app.py
+    files = {'crop_price.pkl': model, 'min_max_scaler.pkl': data[6], 'model_columns.pkl': data[7],
+             'original_numerical_cols.pkl': PRICE_NUMERICAL_COLS,
+             'original_categorical_cols.pkl': PRICE_CATEGORICAL_COLS}
+    for filename, obj in files.items():
+        joblib.dump(obj, os.path.join(directory, filename))
+    return list(files)
+
+
+def columns_metadata(kind, datasets_dir):
+    data = _dataset(kind, datasets_dir)
+    if kind == 'crop':
+        return {'features': CROP_FEATURES, 'labels': {str(k): v for k, v in crop_dict.items()}}
+    if kind == 'fertilizer':
+        return {'features': FERTILIZER_COLUMNS, 'labels': {str(i): name for i, name in enumerate(data[4])}}
+    return {'target': PRICE_TARGET, 'numerical': PRICE_NUMERICAL_COLS, 'categorical': PRICE_CATEGORICAL_COLS,
+            'scaled': [PRICE_TARGET] + PRICE_NUMERICAL_COLS, 'model_columns': data[7]}
+
+
+def train(kinds, models_dir='models', datasets_dir='datasets', workers=None,
+          latency_weight=0.002, size_weight=0.005, install=False):
+    import sklearn
+
+    version = time.strftime('%Y%m%d-%H%M%S')
+    directory = os.path.join(models_dir, VERSIONS_DIR, version)
+    os.makedirs(directory)
+    manifest = {
+        'version': version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'scikit-learn': sklearn.__version__,
+        'numpy': np.__version__,
+        'objective': {'formula': 'quality - latency_weight * latency_ms - size_weight * size_mb',
+                      'latency_weight': latency_weight, 'size_weight': size_weight},
+        'datasets': {name: file_fingerprint(os.path.join(datasets_dir, name))
+                     for name in ('crop.csv', 'Fertilizer.csv', 'crop_price_dataset.csv')},
+        'models': {},
+        'files': {},
+    }
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for kind in kinds:
+            started = time.perf_counter()
+            results = search(kind, datasets_dir, pool, latency_weight, size_weight)
+            best = results[0]
+            files = write_artifacts(directory, kind, best, datasets_dir)
+            manifest['models'][kind] = {
+                'params': best['params'],
+                'quality_metric': 'validation R^2' if kind == 'price' else 'cross-validated accuracy',
+                'quality': best['quality'],
+                'test_score': best['test_score'],
+                'latency_ms': best['latency_ms'],
+                'size_bytes': best['size_bytes'],
+                'objective': best['objective'],
+                'candidates': len(results),
+                'search_seconds': time.perf_counter() - started,
+                'columns': columns_metadata(kind, datasets_dir),
+                'files': files,
+            }
+            print(f"{kind}: {best['params']} quality {best['quality']:.4f} test {best['test_score']:.4f} "
+                  f"{best['latency_ms']:.2f} ms {best['size_bytes'] / 1e6:.2f} MB "
+                  f"(best of {len(results)} in {time.perf_counter() - started:.1f}s)")
+    for filename in sorted(os.listdir(directory)):
+        manifest['files'][filename] = file_fingerprint(os.path.join(directory, filename))
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Artifacts and manifest written to {directory}")
+
+    if install:
+        for filename in manifest['files']:
+            tmp = os.path.join(models_dir, f".{filename}.tmp")
+            shutil.copyfile(os.path.join(directory, filename), tmp)
+            os.replace(tmp, os.path.join(models_dir, filename))
+        shutil.copyfile(os.path.join(directory, 'manifest.json'), os.path.join(models_dir, 'manifest.json'))
+        print(f"Installed version {version} into {models_dir}; restart the app to load it.")
+    return directory, manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m krishi.train', description=__doc__.splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=list(SEARCH_SPACES), default=list(SEARCH_SPACES))
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--datasets-dir', default='datasets')
+    parser.add_argument('--workers', type=int, help="search processes (default: one per CPU)")
+    parser.add_argument('--latency-weight', type=float, default=0.002, help="objective penalty per ms")
+    parser.add_argument('--size-weight', type=float, default=0.005, help="objective penalty per MB")
+    parser.add_argument('--install', action='store_true', help="copy the new artifacts into --models-dir")
+    args = parser.parse_args(argv)
+    train(args.only, args.models_dir, args.datasets_dir, args.workers,
+          args.latency_weight, args.size_weight, args.install)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""Array-backed inference for the fitted random forests.
+
+The exporter flattens every tree of a fitted RandomForestClassifier (or a GridSearchCV
+wrapping one) into a few contiguous arrays; FlatForest walks all trees for a whole batch
+at once with NumPy and returns the same labels as sklearn's predict(). The arrays are
+saved as plain .npy files so workers can np.load them with mmap_mode='r' and share the
+page cache.
+
+The win is per-call overhead: one or a few rows skip sklearn's validation and joblib
+dispatch. For large batches sklearn's compiled traversal is faster, so callers should
+only route batches of up to FLAT_MAX_ROWS rows here.
+
+    python -m krishi.tree_engine export   # write models/flat/<name>/ from the pickles
+    python -m krishi.tree_engine check    # parity over datasets/ + latency vs sklearn
+"""
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from krishi.registry import file_fingerprint
+
+log = logging.getLogger(__name__)
+
+FLAT_DIR = 'flat'
+ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots', 'classes')
+# Above this many rows sklearn's own predict() is faster (see `check`)
+FLAT_MAX_ROWS = 256
+# Caps the (trees x rows x classes) block gathered per chunk at ~32 MB of float64
+MAX_CHUNK_ELEMENTS = 4 * 1024 * 1024
+
+
+class FlatForest:
+    """A random forest classifier stored as flat node arrays.
+
+    children holds the [left, right] pair of every node, so one step is a single gather at
+    2 * node + (x > threshold). Leaves point to themselves, so every row can take exactly
+    max_depth steps without checking whether it has already reached a leaf.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        """Flattens a fitted RandomForestClassifier, or a search object wrapping one."""
+        forest = getattr(estimator, 'best_estimator_', estimator)
+        if getattr(forest, 'n_outputs_', 1) != 1 or not hasattr(forest, 'estimators_'):
+            raise ValueError(f"Unsupported estimator for flattening: {type(forest).__name__}")
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in (est.tree_ for est in forest.estimators_):
+            n = tree.node_count
+            index = np.arange(n, dtype=np.intp)
+            is_leaf = tree.children_left < 0
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(tree.threshold.astype(np.float64))
+            pairs = np.column_stack([np.where(is_leaf, index, tree.children_left),
+                                     np.where(is_leaf, index, tree.children_right)]).astype(np.intp)
+            children.append((pairs + offset).ravel())
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(np.concatenate(features), np.concatenate(thresholds), np.concatenate(children),
+                   np.ascontiguousarray(np.concatenate(values)),
+                   np.array(roots, dtype=np.intp), np.asarray(forest.classes_),
+                   max_depth, forest.n_features_in_)
+
+    def apply(self, X):
+        """Leaf index (into the flat arrays) reached by each row in each tree: shape (trees, rows)."""
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected an array of shape (n, {self.n_features_in_}), got {X.shape}.")
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offset = np.arange(n_rows, dtype=np.intp) * n_features
+        node = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offset + self.feature.take(node))
+            # Inputs are validated finite upstream, so x > t is exactly "not x <= t"
+            node = self.children.take(2 * node + (x > self.threshold.take(node)))
+        return node
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        chunk = max(1, MAX_CHUNK_ELEMENTS // (self.n_trees * self.value.shape[1]))
+        for start in range(0, X.shape[0], chunk):
+            leaves = self.apply(X[start:start + chunk])
+            # Summing over the leading (tree) axis adds trees one after another, in the
+            # same order sklearn accumulates them, so probabilities match bit for bit
+            proba[start:start + chunk] = self.value[leaves].sum(axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def save(self, directory, source_fingerprint=None):
+        """Writes one .npy per array plus meta.json; replaces `directory` atomically."""
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.flat-', dir=parent)
+        try:
+            for name in ARRAYS:
+                np.save(os.path.join(tmp, f'{name}.npy'), getattr(self, 'classes_' if name == 'classes' else name))
+            meta = {'max_depth': self.max_depth, 'n_features': self.n_features_in_,
+                    'n_trees': self.n_trees, 'n_nodes': int(len(self.feature)),
+                    'source_fingerprint': source_fingerprint}
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=1)
+            if os.path.isdir(directory):
+                shutil.rmtree(directory)
+            os.replace(tmp, directory)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in ARRAYS}
+        return cls(max_depth=meta['max_depth'], n_features=meta['n_features'], **arrays), meta
+
+
+def load_or_export(directory, source_path, load_estimator):
+    """Memory-maps the flat forest in `directory` if it was exported from the current
+    `source_path`; otherwise flattens load_estimator() and (best effort) saves it."""
+    fingerprint = file_fingerprint(source_path)
+    try:
+        forest, meta = FlatForest.load(directory)
+        if meta.get('source_fingerprint') == fingerprint:
+            forest.source_fingerprint = fingerprint
+            return forest
+    except (OSError, ValueError, KeyError):
+        pass
+    forest = FlatForest.from_estimator(load_estimator())
+    forest.source_fingerprint = fingerprint
+    try:
+        forest.save(directory, source_fingerprint=fingerprint)
+    except OSError as e:
+        log.warning("Could not save flat forest to %s: %s", directory, e)
+    return forest
+
+
+# --- Command line: export / parity check / microbenchmark ---
+
+def load_sources(models_dir):
+    """({name: (filename, sklearn estimator)}, crop MinMaxScaler, crop StandardScaler) from models_dir."""
+    import pickle
+    def load(filename):
+        with open(os.path.join(models_dir, filename), 'rb') as f:
+            return pickle.load(f)
+    return {
+        'crop_model': ('crop_model.pkl', load('crop_model.pkl')),
+        'fertilizer_model': ('fertilizer.pkl', load('fertilizer.pkl')),
+    }, load('mx.pkl'), load('sc.pkl')
+
+
+def _time_per_call(fn, X, repeat):
+    fn(X)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - start) / repeat
+
+
+def export(models_dir='models'):
+    sources, _, _ = load_sources(models_dir)
+    for name, (filename, estimator) in sources.items():
+        forest = FlatForest.from_estimator(estimator)
+        directory = os.path.join(models_dir, FLAT_DIR, name)
+        forest.save(directory, source_fingerprint=file_fingerprint(os.path.join(models_dir, filename)))
+        print(f"{name}: {forest.n_trees} trees, {len(forest.feature)} nodes, depth {forest.max_depth} -> {directory}")
+
+
+def parity_inputs(datasets_dir, ms, sc, random_rows=20000):
+    """Inputs the flat engine must score exactly like sklearn: every dataset row (the crop
+    rows scaled like the app scales them, the fertilizer rows also with P and K swapped) plus
+    random rows around and beyond the data's range."""
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    crop = pd.read_csv(os.path.join(datasets_dir, 'crop.csv')).drop(columns='label').to_numpy(dtype=np.float64)
+    crop_random = rng.uniform(crop.min(axis=0) - 10, crop.max(axis=0) + 10, size=(random_rows, crop.shape[1]))
+    fert = pd.read_csv(os.path.join(datasets_dir, 'Fertilizer.csv')).drop(columns='Fertilizer Name').to_numpy(dtype=np.float64)
+    fert_random = rng.integers(0, 150, size=(random_rows, fert.shape[1])).astype(np.float64)
+    return {
+        'crop_model': np.vstack([sc.transform(ms.transform(crop)), sc.transform(ms.transform(crop_random))]),
+        'fertilizer_model': np.vstack([fert, fert[:, [0, 2, 1]], fert_random]),
+    }
+
+
+def check(models_dir='models', datasets_dir='datasets'):
+    sources, ms, sc = load_sources(models_dir)
+    inputs = parity_inputs(datasets_dir, ms, sc)
+
+    ok = True
+    for name, (_, estimator) in sources.items():
+        forest = FlatForest.from_estimator(estimator)
+        X = inputs[name]
+        same = np.array_equal(forest.predict(X), estimator.predict(X))
+        ok &= same
+        print(f"{name}: {len(X)} rows, labels {'match' if same else 'DIFFER'}")
+        for rows, repeat in ((1, 200), (100, 50), (2000, 5)):
+            batch = X[:rows]
+            sk = _time_per_call(estimator.predict, batch, repeat)
+            flat = _time_per_call(forest.predict, batch, repeat)
+            print(f"  {rows:>5} rows: sklearn {sk * 1e3:8.3f} ms  flat {flat * 1e3:8.3f} ms  ({sk / flat:5.1f}x)")
+    return ok
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    if command == 'export':
+        export()
+    elif command == 'check':
+        sys.exit(0 if check() else 1)
+    else:
+        sys.exit(f"Unknown command '{command}' (use 'export' or 'check')")
@@ -0,0 +1,173 @@
+"""OpenWeatherMap client with connection pooling, caching and request coalescing."""
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from krishi.limits import Saturated
+from krishi.metrics import stage
+
+OPENWEATHERMAP_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+
+class _Flight:
+    """One in-progress upstream call that other callers for the same city wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WeatherClient:
+    """Fetches current weather per city.
+
+    - One pooled requests.Session with connect/read timeouts.
+    - Successful lookups are cached for `ttl` seconds, "city not found" answers for
+      `negative_ttl` seconds; other errors are never cached.
+    - Concurrent lookups for the same city share a single upstream call.
+    - With stale_ttl > 0, an expired entry is still served for up to stale_ttl seconds
+      while one background refresh fetches a new one.
+    - With a limiter (krishi.limits.UpstreamLimiter), upstream calls are capped and
+      get_weather raises Saturated when it is full; cached answers are still served.
+    """
+
+    def __init__(self, api_key, url=OPENWEATHERMAP_URL, ttl=600, negative_ttl=300, stale_ttl=0,
+                 max_entries=1000, timeout=(3.05, 10), pool_size=20, limiter=None):
+        self.api_key = api_key
+        self.url = url
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.limiter = limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._cache = OrderedDict()  # city key -> (weather dict, expires at)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'negative_hits': 0, 'stale_hits': 0, 'misses': 0,
+                         'coalesced': 0, 'upstream_calls': 0, 'upstream_errors': 0}
+
+    @staticmethod
+    def _key(city_name):
+        return " ".join(city_name.split()).lower()
+
+    def get_weather(self, city_name):
+        """Returns the weather dict for a city ({'error': ...} on failure), as the /weather page expects."""
+        if not city_name or not city_name.strip():
+            return {'error': "City name cannot be empty."}
+        key = self._key(city_name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._cache.move_to_end(key)
+                    self.counters['negative_hits' if value.get('error') else 'hits'] += 1
+                    return dict(value)
+                if self.stale_ttl and not value.get('error') and expires + self.stale_ttl > now:
+                    self.counters['stale_hits'] += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = _Flight()
+                        threading.Thread(target=self._refresh, args=(key, city_name), daemon=True).start()
+                    return dict(value)
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.counters['misses'] += 1
+            else:
+                self.counters['coalesced'] += 1
+
+        if leader:
+            self._refresh(key, city_name)
+        elif not flight.done.wait(self.timeout[0] + self.timeout[1]):
+            return {'error': "Timed out waiting for the weather service."}
+        if flight.error is not None:
+            raise flight.error
+        return dict(flight.result)
+
+    def _refresh(self, key, city_name):
+        """Fetches one city upstream, caches the answer and wakes everyone waiting on it."""
+        flight = self._inflight[key]
+        try:
+            result, cache_for = self._fetch(city_name)
+        except Saturated as e:
+            result, cache_for = None, 0
+            flight.error = e
+        except Exception as e:
+            result, cache_for = {'error': f"An unexpected error occurred: {e}"}, 0
+        with self._lock:
+            if cache_for:
+                self._cache[key] = (result, time.monotonic() + cache_for)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            flight.result = result
+            del self._inflight[key]
+        flight.done.set()
+
+    def _fetch(self, city_name):
+        """One upstream call; returns (weather dict, seconds to cache it for)."""
+        params = {
+            'q': city_name,
+            'appid': self.api_key,
+            'units': 'metric'  # For Celsius
+        }
+        if self.limiter is not None:
+            with self.limiter.slot():
+                return self._fetch_unlimited(params, city_name)
+        return self._fetch_unlimited(params, city_name)
+
+    def _fetch_unlimited(self, params, city_name):
+        with self._lock:
+            self.counters['upstream_calls'] += 1
+        try:
+            with stage('upstream_weather'):
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+            response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
+            data = response.json()
+
+            # Extract relevant information
+            weather_info = {
+                'city': data.get('name'),
+                'temperature': data.get('main', {}).get('temp'),
+                'description': data.get('weather', [{}])[0].get('description'),
+                'main_condition': data.get('weather', [{}])[0].get('main'),
+                'error': None
+            }
+            # Check for essential missing data that wouldn't raise KeyError/IndexError due to .get()
+            if weather_info['temperature'] is None or weather_info['description'] is None or weather_info['main_condition'] is None:
+                return {'error': "Could not parse weather data due to missing fields."}, 0
+            return weather_info, self.ttl
+        except requests.exceptions.HTTPError as e:
+            self._count_error()
+            if e.response.status_code == 401:
+                return {'error': "API request error: Invalid API key or unauthorized."}, 0
+            if e.response.status_code == 404:
+                return {'error': f"API request error: City '{city_name}' not found."}, self.negative_ttl
+            return {'error': f"API request error: {e}"}, 0
+        except requests.exceptions.RequestException as e:
+            # Handle network errors or timeouts
+            self._count_error()
+            return {'error': f"API request error: {e}"}, 0
+        except (KeyError, IndexError, TypeError, ValueError):
+            # Handle issues with expected JSON structure
+            self._count_error()
+            return {'error': "Could not parse weather data due to unexpected structure."}, 0
+
+    def _count_error(self):
+        with self._lock:
+            self.counters['upstream_errors'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, cached_cities=len(self._cache), in_flight=len(self._inflight))
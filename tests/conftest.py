@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Tests import app and krishi from the repository root and, like `python app.py`, find
+# models/ and datasets/ relative to it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault('KRISHI_LOG_LEVEL', 'WARNING')
@@ -0,0 +1,107 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask, render_template_string
+from PIL import Image
+
+import app as app_module
+from krishi import assets
+from krishi.assets import AssetManifest, build, send_asset
+
+CSS = b"body { margin: 0; }\n" + b".card { padding: 1rem; border: 1px solid #ddd; }\n" * 40
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, 'REFRESH_INTERVAL', 0)
+    (tmp_path / 'style.css').write_bytes(CSS)
+    Image.new('RGB', (400, 200), (40, 120, 60)).save(tmp_path / 'field.png')
+    return tmp_path
+
+
+@pytest.fixture
+def site(static_dir):
+    """A Flask app serving static_dir the way app.py serves static/."""
+    site = Flask(__name__, static_folder=str(static_dir), static_url_path='/static')
+    manifest = AssetManifest(site.static_folder)
+    site.jinja_env.globals.update(asset_url=manifest.url, picture=manifest.picture)
+    site.view_functions['static'] = lambda filename: send_asset(site.static_folder, filename, manifest)
+    return site
+
+
+def render(site, source):
+    with site.test_request_context():
+        return render_template_string(source)
+
+
+def test_asset_url_before_and_after_a_build(site, static_dir):
+    assert render(site, "{{ asset_url('style.css') }}") == '/static/style.css'
+    manifest = build(str(static_dir), formats=())
+    hashed = manifest['files']['style.css']['url']
+    assert hashed.startswith('build/style.') and hashed.endswith('.css') and hashed != 'build/style.css'
+    assert render(site, "{{ asset_url('style.css') }}") == f'/static/{hashed}'
+    assert render(site, "{{ asset_url('missing.css') }}") == '/static/missing.css'
+
+    response = site.test_client().get(f'/static/{hashed}')
+    assert response.data == CSS
+    assert response.cache_control.immutable and response.cache_control.max_age == assets.IMMUTABLE_MAX_AGE
+
+
+def test_precompressed_versions_are_sent_only_when_accepted(site, static_dir):
+    hashed = build(str(static_dir), formats=())['files']['style.css']['url']
+    # Without the brotli package the build writes only .gz; the .br is served the same way
+    (static_dir / (hashed + '.br')).write_bytes(b'brotli bytes')
+    client = site.test_client()
+
+    plain = client.get(f'/static/{hashed}', headers={'Accept-Encoding': 'identity'})
+    assert plain.data == CSS and 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.vary
+
+    gz = client.get(f'/static/{hashed}', headers={'Accept-Encoding': 'gzip'})
+    assert gz.headers['Content-Encoding'] == 'gzip' and gzip.decompress(gz.data) == CSS
+    assert gz.mimetype == 'text/css' and 'Accept-Encoding' in gz.vary
+
+    br = client.get(f'/static/{hashed}', headers={'Accept-Encoding': 'gzip, deflate, br'})
+    assert br.headers['Content-Encoding'] == 'br' and br.data == b'brotli bytes'
+    assert 'Accept-Encoding' in br.vary
+    assert len({plain.headers['ETag'], gz.headers['ETag'], br.headers['ETag']}) == 3
+
+    # A file with no precompressed versions doesn't vary by encoding
+    image = client.get('/static/field.png', headers={'Accept-Encoding': 'gzip, br'})
+    assert 'Content-Encoding' not in image.headers and 'Accept-Encoding' not in image.vary
+
+
+def test_picture_with_every_codec(site, static_dir):
+    build(str(static_dir), widths=(320, 640))
+    html = render(site, "{{ picture('field.png', alt='A field') }}")
+    assert html.startswith('<picture><source type="image/avif" srcset="/static/build/field-320w.')
+    assert '<source type="image/webp"' in html and '400w' in html
+    assert 'width="400" height="200"' in html and 'alt="A field"' in html
+
+
+def test_picture_without_avif_or_webp(site, static_dir, monkeypatch):
+    monkeypatch.setattr('PIL.features.check', lambda feature: False)
+    manifest = build(str(static_dir), widths=(320, 640))
+    assert manifest['settings']['formats'] == [] and manifest['files']['field.png']['variants'] == {}
+    assert not [name for name in os.listdir(static_dir / 'build') if name.endswith(('.avif', '.webp'))]
+    html = render(site, "{{ picture('field.png', alt='A field') }}")
+    assert '<source' not in html and '<picture>' not in html
+    url = manifest['files']['field.png']['url']
+    assert html == (f'<img src="/static/{url}" alt="A field" loading="lazy" decoding="async" '
+                    'width="400" height="200">')
+
+
+@pytest.mark.parametrize('path', ['/static/../app.py', '/static/..%2fapp.py', '/static/build/../../app.py',
+                                  '/static/%2e%2e/app.py', '/static/..%5capp.py'])
+def test_paths_outside_static_are_not_served(path):
+    response = app_module.app.test_client().get(path, headers={'Accept-Encoding': 'gzip, br'})
+    assert response.status_code == 404
+
+
+def test_send_asset_rejects_traversal(site, static_dir):
+    (static_dir.parent / 'secret.txt.gz').write_bytes(gzip.compress(b'secret'))
+    with site.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        with pytest.raises(Exception) as excinfo:
+            send_asset(site.static_folder, '../secret.txt', AssetManifest(site.static_folder))
+    assert getattr(excinfo.value, 'code', None) == 404
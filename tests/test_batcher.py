@@ -0,0 +1,120 @@
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pytest
+
+import app as app_module
+from benchmarks.routes import PREDICT_FORM
+from krishi.batcher import MicroBatcher, RemoteBatcher, make_unix_server
+
+
+def label_rows(X):
+    """A fake model whose labels name the row they came from."""
+    return (np.array([f"crop{int(x)}" for x in X[:, 0]], dtype=object),
+            np.array([f"fert{int(x)}" for x in X[:, 1]], dtype=object))
+
+
+def call_concurrently(predict, n=40):
+    results, errors = {}, []
+    start = threading.Barrier(n)
+
+    def caller(i):
+        start.wait()
+        try:
+            results[i] = predict(np.array([[i, 1000 + i], [i + 100, 2000 + i]], dtype=np.float64))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    for i, (crops, fertilizers) in results.items():
+        assert list(crops) == [f"crop{i}", f"crop{i + 100}"]
+        assert list(fertilizers) == [f"fert{1000 + i}", f"fert{2000 + i}"]
+    return results
+
+
+@pytest.fixture
+def socket_path():
+    # AF_UNIX paths are limited to ~100 bytes, which pytest's tmp_path can exceed
+    directory = tempfile.mkdtemp(prefix='krishi-')
+    yield os.path.join(directory, 'predict.sock')
+    os.rmdir(directory)
+
+
+@pytest.fixture
+def worker(socket_path):
+    def start(predict):
+        batcher = MicroBatcher(predict, max_batch=16, window=0.02)
+        server = make_unix_server(socket_path, batcher)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return batcher
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def test_concurrent_callers_get_their_own_rows_in_process():
+    batcher = MicroBatcher(label_rows, max_batch=16, window=0.02)
+    call_concurrently(batcher.predict)
+    stats = batcher.stats()
+    assert stats['requests'] == 40 and stats['rows'] == 80
+    assert stats['batches'] < 40 and stats['largest_batch'] <= 16
+
+
+def test_concurrent_callers_get_their_own_rows_over_the_socket(worker, socket_path):
+    batcher = worker(label_rows)
+    call_concurrently(RemoteBatcher(socket_path).predict)
+    assert batcher.stats()['batches'] < 40
+
+
+def test_a_failing_batch_fails_every_caller_in_it():
+    def broken(X):
+        raise ValueError("model exploded")
+    with pytest.raises(ValueError, match="model exploded"):
+        MicroBatcher(broken, window=0.0).predict(np.zeros((1, 2)))
+
+
+@pytest.fixture
+def app_batcher(monkeypatch):
+    registry = app_module.registry
+
+    def use(batcher):
+        registry.register_factory('batcher', lambda reg: batcher)
+        registry.unload('batcher')
+    yield use
+    registry.register_factory('batcher', app_module.load_batcher)
+    registry.unload('batcher')
+
+
+SAMPLE = np.array([[90, 42, 43, 20.88, 82.0, 6.5, 202.94]])
+
+
+def test_dead_worker_falls_back_to_in_process_scoring(app_batcher, socket_path):
+    app_batcher(RemoteBatcher(socket_path))  # nothing listens there
+    crops, fertilizers = app_module.predict_samples_batched(SAMPLE)
+    assert list(crops) == list(app_module.predict_samples(SAMPLE)[0])
+
+
+def test_worker_error_falls_back_to_in_process_scoring(app_batcher, worker, socket_path):
+    def broken(X):
+        raise ValueError("model exploded")
+    worker(broken)
+    app_batcher(RemoteBatcher(socket_path))
+    with pytest.raises(RuntimeError, match="model exploded"):
+        RemoteBatcher(socket_path).predict(SAMPLE)
+    crops, fertilizers = app_module.predict_samples_batched(SAMPLE)
+    assert list(crops) == list(app_module.predict_samples(SAMPLE)[0])
+
+    form = dict(PREDICT_FORM, temperature='21.37')  # not in the result cache
+    response = app_module.app.test_client().post('/predict', data=form)
+    assert response.status_code == 200
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from benchmarks import __main__ as cli
+from benchmarks import micro
+from benchmarks.compare import compare
+
+
+def summary(p50):
+    return {'p50_ms': p50, 'p95_ms': p50 * 1.5, 'p99_ms': p50 * 2, 'n': 100}
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(micro, 'run', lambda app_module, **options: {'crop_flat_1': summary(5.0)})
+    monkeypatch.setattr(cli, 'BASELINE', str(tmp_path / 'baseline.json'))
+    return tmp_path
+
+
+def test_compare_reads_the_baseline_before_save_baseline_replaces_it(paths):
+    baseline = paths / 'baseline.json'
+    baseline.write_text(json.dumps({'micro': {'crop_flat_1': summary(1.0)}}))
+    out = paths / 'run.json'
+    status = cli.main(['micro', '--out', str(out), '--compare', str(baseline), '--save-baseline'])
+    assert status == 1  # 1 ms -> 5 ms is flagged, not compared against itself
+    assert json.loads(baseline.read_text())['micro'] == {'crop_flat_1': summary(5.0)}
+    assert json.loads(out.read_text())['micro'] == {'crop_flat_1': summary(5.0)}
+
+    # The saved run is the new baseline
+    assert cli.main(['micro', '--out', str(out), '--compare', str(baseline)]) == 0
+
+
+def test_compare_thresholds():
+    before = {'micro': {'a': summary(1.0), 'b': summary(0.1)}, 'load': {'overall': {'throughput_per_s': 100.0}, 'routes': {}}}
+    after = {'micro': {'a': summary(1.3), 'b': summary(0.3)}, 'load': {'overall': {'throughput_per_s': 70.0}, 'routes': {}}}
+    flagged = {(r['benchmark'], r['metric']) for r in compare(after, before, threshold=0.2, min_delta_ms=0.25)}
+    # b is 3x slower but by less than min_delta_ms at p50
+    assert flagged == {('micro/a', 'p50_ms'), ('micro/a', 'p95_ms'), ('micro/b', 'p95_ms'),
+                       ('load/overall', 'throughput_per_s')}
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from krishi.chat_cache import ChatResponseCache, normalize, same_words
+
+
+@pytest.fixture
+def cache():
+    return ChatResponseCache()
+
+
+def test_normalize_folds_devanagari_variants():
+    assert normalize('गेहूँ की बुवाई कब करें।') == normalize('गेहूं की बुवाई कब करें?')
+    assert normalize('गे\u200dहूं') == normalize('गेहूं')
+    assert normalize('Urea ５０ kg') == 'urea 50 kg'
+
+
+def test_exact_and_typo_hits(cache):
+    cache.put("Which fertilizer is best for wheat?", 'en', "Use DAP at sowing.", 2.0)
+    assert cache.get("which fertilizer is best for wheat", 'en') == "Use DAP at sowing."
+    assert cache.get("Which fertiliser is best for wheat?", 'en') == "Use DAP at sowing."
+    stats = cache.stats()
+    assert (stats['exact_hits'], stats['similar_hits']) == (1, 1)
+    assert stats['saved_seconds'] == 4.0
+
+
+def test_language_is_part_of_the_key(cache):
+    cache.put("Which fertilizer is best for wheat?", 'en', "Use DAP at sowing.", 2.0)
+    assert cache.get("Which fertilizer is best for wheat?", 'hi') is None
+
+
+@pytest.mark.parametrize('stored, asked', [
+    ("How much urea for 10 acres of wheat?", "How much urea for 20 acres of wheat?"),
+    ("How much urea for 10 acres of wheat?", "How much urea for 1 acre of wheat?"),
+    ("Which crop grows in soil with pH 5?", "Which crop grows in soil with pH 8?"),
+])
+def test_numbers_must_match(cache, stored, asked):
+    cache.put(stored, 'en', "stored reply", 1.0)
+    assert cache.get(asked, 'en') is None
+
+
+@pytest.mark.parametrize('asked', [
+    "Should I not spray pesticide on cotton after rain?",
+    "Should I never spray pesticide on cotton after rain?",
+    "Shouldn't I spray pesticide on cotton after rain?",
+])
+def test_negations_must_match(cache, asked):
+    cache.put("Should I spray pesticide on cotton after rain?", 'en', "stored reply", 1.0)
+    assert cache.get(asked, 'en') is None
+
+
+def test_hindi_negation_must_match(cache):
+    cache.put("क्या बारिश के बाद कपास पर छिड़काव करें?", 'hi', "stored reply", 1.0)
+    assert cache.get("क्या बारिश के बाद कपास पर छिड़काव न करें?", 'hi') is None
+
+
+@pytest.mark.parametrize('stored, asked', [
+    ("Which fertilizer is best for rice?", "Which fertilizer is best for wheat?"),
+    ("When should I sow maize in Punjab?", "When should I sow mango in Punjab?"),
+    ("मक्का की बुवाई कब करें?", "गेहूं की बुवाई कब करें?"),
+])
+def test_other_crop_misses(cache, stored, asked):
+    cache.put(stored, 'any', "stored reply", 1.0)
+    assert cache.get(asked, 'any') is None
+
+
+def test_same_words_rules():
+    assert same_words('which fertiliser for wheat', 'which fertilizer for wheat')
+    assert not same_words('10 acres', '20 acres')
+    assert not same_words('spray now', 'spray not')  # short words are never fuzzy
+
+
+def test_expired_best_candidate_falls_through_to_the_next(cache):
+    cache.put("which fertilizer is best for wheat", 'en', "A", 1.0)
+    cache.put("which fertilisers is best for wheat", 'en', "B", 1.0)
+    asked = "which fertiliser is best for wheat"
+    first = cache.get(asked, 'en')
+    assert first in ("A", "B")
+    stored = "which fertilizer is best for wheat" if first == "A" else "which fertilisers is best for wheat"
+    cache._entries[('en', stored)].expires = time.time() - 1
+    assert cache.get(asked, 'en') == ("B" if first == "A" else "A")
+
+
+def test_ttl_and_lru_eviction():
+    cache = ChatResponseCache(max_entries=2, ttl=60)
+    cache.put("first question here", 'en', "1", 1.0)
+    cache.put("second question here", 'en', "2", 1.0)
+    cache.get("first question here", 'en')
+    cache.put("third question here", 'en', "3", 1.0)
+    assert cache.get("second question here", 'en') is None
+    assert cache.get("first question here", 'en') == "1"
+    cache._entries[('en', 'first question here')].expires = time.time() - 1
+    assert cache.get("first question here", 'en') is None
+    assert cache.stats()['evictions'] == 1 and cache.stats()['expirations'] == 1
@@ -0,0 +1,78 @@
+import pytest
+
+from krishi import chat_store as chat_store_module
+from krishi.chat_store import ChatSessionStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(**options):
+        db_path = str(tmp_path / 'chat.sqlite3') if request.param == 'sqlite' else None
+        return ChatSessionStore(db_path=db_path, **options)
+    return make
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(chat_store_module.time, 'time', clock.time)
+    return clock
+
+
+def test_max_sessions_evicts_least_recently_used(make_store, clock):
+    store = make_store(max_sessions=3)
+    for sid in 'abc':
+        store.get_or_create(sid, 'English')
+        clock.now += 1
+    store.append('a', "When do I sow wheat?", "In November.")
+    clock.now += 1
+    store.get_or_create('b', 'English')  # a read alone makes the session recent
+    clock.now += 1
+    store.get_or_create('d', 'English')
+    stats = store.stats()
+    assert stats['sessions'] == 3 and stats['evicted_lru'] == 1 and stats['created'] == 4
+    assert store.get_or_create('a', 'Hindi') == ('English', [("When do I sow wheat?", "In November.")])
+    assert store.get_or_create('b', 'Hindi') == ('English', [])
+    # c was least recently used, so it was dropped and comes back empty in the new language
+    assert store.get_or_create('c', 'Hindi') == ('Hindi', [])
+
+
+def test_access_keeps_a_session_from_going_idle(make_store, clock):
+    store = make_store(idle_timeout=100)
+    store.get_or_create('a', 'English')
+    store.append('a', "Which fertilizer for paddy?", "Urea in three splits.")
+    for _ in range(3):
+        clock.now += 60
+        assert store.get_or_create('a', 'Hindi')[0] == 'English'
+    clock.now += 101
+    assert store.get_or_create('a', 'Hindi') == ('Hindi', [])
+
+
+def test_history_is_truncated_to_max_turns(make_store, clock):
+    store = make_store(max_turns=2)
+    store.get_or_create('a', 'English')
+    for i in range(4):
+        store.append('a', f"q{i}", f"a{i}")
+    assert store.get_or_create('a', 'English')[1] == [('q2', 'a2'), ('q3', 'a3')]
+    assert store.stats()['truncated_turns'] == 2
+
+
+def test_sqlite_sessions_are_shared_between_stores(tmp_path, clock):
+    db_path = str(tmp_path / 'chat.sqlite3')
+    first, second = ChatSessionStore(db_path=db_path, max_sessions=2), ChatSessionStore(db_path=db_path, max_sessions=2)
+    first.get_or_create('a', 'English')
+    first.append('a', "q", "a")
+    clock.now += 1
+    second.get_or_create('b', 'English')
+    clock.now += 1
+    second.get_or_create('c', 'English')
+    assert second.stats()['sessions'] == 2
+    assert first.get_or_create('a', 'Hindi') == ('Hindi', [])  # evicted by the other store
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from benchmarks.stubs import GeminiStub
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class GatedModel:
+    """Streams two chunks, then holds the final one back until `release` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.final_produced_at = None
+
+    def start_chat(self, history=None):
+        return self
+
+    def send_message(self, message, stream=False):
+        assert stream
+
+        def chunks():
+            yield _Chunk("Sow wheat ")
+            yield _Chunk("in November ")
+            assert self.release.wait(5), "the test never released the final chunk"
+            self.final_produced_at = time.monotonic()
+            yield _Chunk("after the monsoon.")
+        return chunks()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, 'chat_cache', None)  # every request must reach the model
+    return app_module.app.test_client()
+
+
+def _frames(response):
+    """(event, data) pairs as the body arrives."""
+    buffer = b''
+    for chunk in response.response:
+        buffer += chunk
+        while b'\n\n' in buffer:
+            frame, buffer = buffer.split(b'\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in frame.decode().splitlines())
+            yield fields.get('event'), json.loads(fields['data'])
+
+
+def test_first_event_arrives_before_the_final_chunk_is_produced(client, monkeypatch):
+    model = GatedModel()
+    monkeypatch.setattr(app_module, 'get_gemini_model', lambda: model)
+    response = client.post('/api/chat/stream', json={'message': 'When do I sow wheat?'}, buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    frames = _frames(response)
+
+    event, data = next(frames)
+    first_event_at = time.monotonic()
+    assert event is None and data == {'delta': "Sow wheat "}
+    assert model.final_produced_at is None  # the model is still holding the last chunk back
+
+    model.release.set()
+    rest = list(frames)
+    response.close()
+    assert first_event_at < model.final_produced_at
+    assert [data['delta'] for event, data in rest if event is None] == ["in November ", "after the monsoon."]
+    event, data = rest[-1]
+    assert event == 'done' and data['reply'] == "Sow wheat in November after the monsoon."
+
+
+def test_time_to_first_byte_is_a_fraction_of_the_full_reply(client, monkeypatch):
+    stub = GeminiStub(delay=1.0)  # 11 words, one about every 90 ms
+    monkeypatch.setattr(app_module, 'get_gemini_model', lambda: stub)
+    started = time.monotonic()
+    response = client.post('/api/chat/stream', json={'message': 'When do I sow wheat?'}, buffered=False)
+    frames = _frames(response)
+    next(frames)
+    first_byte = time.monotonic() - started
+    list(frames)
+    total = time.monotonic() - started
+    response.close()
+    assert first_byte < total / 3
+    assert total >= stub.delay
+
+
+def test_model_error_is_sent_as_an_error_event(client, monkeypatch):
+    class Failing:
+        def start_chat(self, history=None):
+            return self
+
+        def send_message(self, message, stream=False):
+            raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(app_module, 'get_gemini_model', lambda: Failing())
+    response = client.post('/api/chat/stream', json={'message': 'When do I sow wheat?'}, buffered=False)
+    frames = list(_frames(response))
+    response.close()
+    assert frames == [('error', {'error': "An error occurred: quota exceeded"})]
+    assert app_module.gemini_limiter.stats()['active'] == 0  # the slot is released when the stream closes
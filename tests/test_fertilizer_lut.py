@@ -0,0 +1,103 @@
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pytest
+
+from krishi import fertilizer_lut
+from krishi.fertilizer_lut import META_FILENAME, FertilizerLookup, load_or_build
+
+
+@pytest.fixture(scope='module')
+def forest():
+    with open(os.path.join('models', 'fertilizer.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+
+@pytest.fixture(scope='module')
+def lookup(forest):
+    return FertilizerLookup.build(forest, fallback=forest)
+
+
+def dataset_rows():
+    return np.loadtxt(os.path.join('datasets', 'Fertilizer.csv'), delimiter=',', skiprows=1, usecols=range(3))
+
+
+def test_grid_rows_match_the_forest(forest, lookup):
+    rng = np.random.default_rng(0)
+    X = np.vstack([dataset_rows(), rng.integers(0, lookup.upper + 1, size=(5000, 3))]).astype(np.float64)
+    np.testing.assert_array_equal(lookup.predict(X), forest.predict(X))
+    for row in X[:50]:
+        assert lookup.lookup(*row) == forest.predict(row[np.newaxis])[0]
+
+
+def test_rows_beyond_the_grid_are_clamped(forest, lookup):
+    rng = np.random.default_rng(1)
+    X = rng.integers(0, 4 * lookup.upper + 1, size=(5000, 3)).astype(np.float64)
+    X[:100] = lookup.upper + rng.integers(1, 10_000, size=(100, 3))  # every feature past its bound
+    assert (X > lookup.upper).any(axis=1).mean() > 0.5
+    np.testing.assert_array_equal(lookup.predict(X), forest.predict(X))
+
+
+def test_fractional_and_negative_rows_use_the_fallback(forest, lookup):
+    rng = np.random.default_rng(2)
+    X = rng.uniform(-20, lookup.upper.max() + 20, size=(2000, 3))
+    X[::2] = np.round(X[::2])  # a mix of on-grid and off-grid rows
+    np.testing.assert_array_equal(lookup.predict(X), forest.predict(X))
+    assert lookup.lookup(10.5, 0, 0) is None and lookup.lookup(-1, 0, 0) is None
+    with pytest.raises(ValueError, match="off the lookup grid"):
+        FertilizerLookup(lookup.table, lookup.classes_).predict([[10.5, 0, 0]])
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    shutil.copy(os.path.join('models', 'fertilizer.pkl'), tmp_path)
+    return str(tmp_path)
+
+
+def build_counter(forest):
+    calls = []
+
+    def load_estimator():
+        calls.append(1)
+        return forest
+    return load_estimator, calls
+
+
+def test_saved_table_is_reused_until_its_fingerprint_is_stale(forest, models_dir):
+    load_estimator, calls = build_counter(forest)
+    built = load_or_build(models_dir, 'fertilizer.pkl', load_estimator)
+    assert len(calls) == 1
+    loaded = load_or_build(models_dir, 'fertilizer.pkl', load_estimator)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(loaded.table, built.table)
+
+    meta_path = os.path.join(models_dir, META_FILENAME)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta['source_fingerprint'] = '0' * 64  # e.g. left behind by an older fertilizer.pkl
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    load_or_build(models_dir, 'fertilizer.pkl', load_estimator)
+    assert len(calls) == 2
+    with open(meta_path) as f:
+        assert json.load(f)['source_fingerprint'] != '0' * 64
+
+    with open(os.path.join(models_dir, 'fertilizer.pkl'), 'ab') as f:
+        f.write(b'\0')  # a different model file
+    load_or_build(models_dir, 'fertilizer.pkl', load_estimator)
+    assert len(calls) == 3
+
+
+def test_save_leaves_no_temporary_files(lookup, models_dir, monkeypatch):
+    lookup.save(models_dir, source_fingerprint='abc')
+    assert sorted(os.listdir(models_dir)) == ['fertilizer.pkl', 'fertilizer_lut.json', 'fertilizer_lut.npy']
+
+    def fail(f):
+        raise OSError("disk full")
+    monkeypatch.setattr(fertilizer_lut.np, 'save', lambda f, table: fail(f))
+    with pytest.raises(OSError):
+        lookup.save(models_dir)
+    assert sorted(os.listdir(models_dir)) == ['fertilizer.pkl', 'fertilizer_lut.json', 'fertilizer_lut.npy']
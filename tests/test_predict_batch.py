@@ -0,0 +1,87 @@
+import io
+
+import numpy as np
+import pytest
+
+import app as app_module
+from krishi.recommend import CROP_FEATURES
+
+SAMPLES = [
+    {'nitrogen': 90, 'phosphorus': 42, 'potassium': 43, 'temperature': 20.8, 'humidity': 82, 'ph': 6.5, 'rainfall': 202.9},
+    {'nitrogen': 20, 'phosphorus': 67, 'potassium': 20, 'temperature': 27.4, 'humidity': 63, 'ph': 7.2, 'rainfall': 45.3},
+]
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def expected(samples):
+    crops, fertilizers = app_module.predict_samples(np.array([[s[f] for f in CROP_FEATURES] for s in samples],
+                                                             dtype=np.float64))
+    return [{'row': i, 'crop': crop, 'fertilizer': fertilizer}
+            for i, (crop, fertilizer) in enumerate(zip(crops, fertilizers))]
+
+
+def to_csv(samples, header=CROP_FEATURES):
+    lines = [','.join(header)] + [','.join(str(s[f]) for f in CROP_FEATURES) for s in samples]
+    return '\n'.join(lines) + '\n'
+
+
+@pytest.mark.parametrize('body', [{'samples': SAMPLES}, SAMPLES])
+def test_json_body(client, body):
+    data = client.post('/api/predict_batch', json=body).get_json()
+    assert data == {'count': 2, 'results': expected(SAMPLES), 'errors': []}
+
+
+def test_csv_upload(client):
+    upload = {'file': (io.BytesIO(('\ufeff' + to_csv(SAMPLES)).encode('utf-8')), 'samples.csv')}
+    data = client.post('/api/predict_batch', data=upload, content_type='multipart/form-data').get_json()
+    assert data == {'count': 2, 'results': expected(SAMPLES), 'errors': []}
+
+
+def test_csv_body(client):
+    data = client.post('/api/predict_batch', data=to_csv(SAMPLES), content_type='text/csv').get_json()
+    assert data == {'count': 2, 'results': expected(SAMPLES), 'errors': []}
+
+
+def test_field_name_aliases(client):
+    # Dataset headers (N, P, K) and any case or surrounding space are accepted
+    header = ['N', ' p ', 'K', 'Temperature', 'HUMIDITY', 'ph', 'Rainfall']
+    data = client.post('/api/predict_batch', data=to_csv(SAMPLES, header), content_type='text/csv').get_json()
+    assert data['results'] == expected(SAMPLES) and data['errors'] == []
+    rows = [{'N': s['nitrogen'], 'P': s['phosphorus'], 'K': s['potassium'],
+             **{f: s[f] for f in CROP_FEATURES[3:]}} for s in SAMPLES]
+    assert client.post('/api/predict_batch', json=rows).get_json()['results'] == expected(SAMPLES)
+
+
+def test_bad_rows_are_reported_next_to_good_ones(client):
+    rows = [SAMPLES[0], dict(SAMPLES[1], ph=''), 'not a sample', dict(SAMPLES[1], rainfall='lots'),
+            dict(SAMPLES[1], humidity='nan'), SAMPLES[1]]
+    data = client.post('/api/predict_batch', json=rows).get_json()
+    assert data['count'] == 6
+    good = expected(SAMPLES)
+    assert data['results'] == [good[0], dict(good[1], row=5)]
+    assert data['errors'] == [
+        {'row': 1, 'error': "Missing value for 'ph'."},
+        {'row': 2, 'error': "Each sample must be an object of feature values."},
+        {'row': 3, 'error': "Invalid value for 'rainfall': 'lots'."},
+        {'row': 4, 'error': "Invalid value for 'humidity': 'nan'."},
+    ]
+
+
+def test_too_many_rows(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'MAX_BATCH_ROWS', 2)
+    assert client.post('/api/predict_batch', json=SAMPLES).status_code == 200
+    response = client.post('/api/predict_batch', json=SAMPLES + SAMPLES[:1])
+    assert response.status_code == 413
+    assert response.get_json() == {'error': "Too many samples: 3 (limit is 2)."}
+    response = client.post('/api/predict_batch', data=to_csv(SAMPLES * 2), content_type='text/csv')
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize('body', [[], {'samples': []}, {'rows': SAMPLES}, 'nitrogen'])
+def test_no_samples(client, body):
+    response = client.post('/api/predict_batch', json=body)
+    assert response.status_code == 400
@@ -0,0 +1,115 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+import app as app_module
+from krishi.price_encoder import PriceEncoder
+
+pytestmark = pytest.mark.skipif(not os.path.exists(os.path.join(app_module.registry.base_dir, 'crop_price.pkl')),
+                                reason="models/crop_price.pkl is not present")
+
+MONTHS = ['January', 'february', 'MARCH', 'April', '5', '6', 7, '8', 'September', '10', 'november', 12]
+
+
+@pytest.fixture(scope='module')
+def encoder():
+    # The pandas path never sets a one-hot column, so parity holds for one_hot=False
+    registry = app_module.registry
+    return PriceEncoder(registry.get('price_model_columns'), registry.get('price_original_numerical_cols'),
+                        registry.get('price_original_categorical_cols'), registry.get('price_scaler'),
+                        target=app_module.PRICE_TARGET_VARIABLE)
+
+
+def _reference(data):
+    return app_module.preprocess_price_input(dict(data)).to_numpy(dtype=np.float64)
+
+
+def _random_inputs(n, seed=0):
+    history = app_module.registry.get('price_history')
+    names = {col: history.dictionaries[col].names for col in ('commodity_name', 'state_name', 'district_name')}
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        row = {col: rng.choice(values) for col, values in names.items()}
+        row['calculationType'] = rng.choice(['Monthly', 'Weekly'])
+        row['month'] = rng.choice(MONTHS)
+        row['avg_min_price'] = rng.choice([rng.uniform(500, 5000), str(rng.randint(500, 5000))])
+        row['avg_max_price'] = rng.uniform(500, 8000)
+        if rng.random() < 0.8:
+            row['change'] = rng.choice([rng.uniform(-300, 300), 'n/a', None])
+        rows.append(row)
+    return rows
+
+
+def test_encode_matches_pandas(encoder):
+    rows = _random_inputs(500)
+    for row in rows:
+        np.testing.assert_allclose(encoder.encode(row), _reference(row), rtol=0, atol=1e-12, err_msg=str(row))
+
+
+def test_encode_batch_matches_pandas(encoder):
+    rows = _random_inputs(200, seed=1)
+    expected = np.vstack([_reference(row) for row in rows])
+    np.testing.assert_allclose(encoder.encode_batch(rows), expected, rtol=0, atol=1e-12)
+
+
+def test_live_encoder_sets_the_training_one_hot_columns():
+    live = app_module.registry.get('price_encoder')
+    assert live.one_hot
+    rows = _random_inputs(200, seed=2)
+    columns = {name: i for i, name in enumerate(live.columns)}
+    for row in rows:
+        expected = _reference(row)
+        for col in live.categorical_cols:
+            i = columns.get(f"{col}_{row[col]}")
+            if i is not None:
+                expected[0, i] = 1.0
+        np.testing.assert_allclose(live.encode(row), expected, rtol=0, atol=1e-12, err_msg=str(row))
+    assert any(f"commodity_name_{row['commodity_name']}" in columns for row in rows)
+
+
+def test_unknown_categories_encode_like_pandas(encoder):
+    row = dict(app_module.PRICE_DEFAULTS, month='March', commodity_name='Dragonfruit', state_name='Atlantis',
+               district_name='Nowhere', calculationType='Monthly')
+    np.testing.assert_allclose(encoder.encode(row), _reference(row), rtol=0, atol=1e-12)
+
+
+VALID = dict(app_module.PRICE_DEFAULTS, month='March', commodity_name='Rice', state_name='Punjab',
+             district_name='Ludhiana', calculationType='Monthly')
+
+
+@pytest.mark.parametrize('change', [
+    {'month': 'Smarch'},
+    {'month': '13'},
+    {'month': ''},
+    {'avg_min_price': 'cheap'},
+    {'avg_max_price': None},
+    {'commodity_name': None},
+])
+def test_invalid_input_raises_the_same_error(encoder, change):
+    row = dict(VALID)
+    for key, value in change.items():
+        if value is None:
+            del row[key]
+        else:
+            row[key] = value
+    with pytest.raises(ValueError) as reference:
+        _reference(row)
+    with pytest.raises(ValueError) as encoded:
+        encoder.encode(row)
+    assert str(encoded.value) == str(reference.value)
+    with pytest.raises(ValueError) as batched:
+        encoder.encode_batch([VALID, row])
+    assert str(batched.value) == f"Row 1: {reference.value}"
+
+
+def test_missing_month_and_non_dict(encoder):
+    row = {key: value for key, value in VALID.items() if key != 'month'}
+    for data in (row, ['not', 'a', 'dict']):
+        with pytest.raises(ValueError) as reference:
+            app_module.preprocess_price_input(data)
+        with pytest.raises(ValueError) as encoded:
+            encoder.encode(data)
+        assert str(encoded.value) == str(reference.value)
@@ -0,0 +1,124 @@
+import pytest
+
+from krishi import price_history as price_history_module
+from krishi.price_history import COLUMNS, PriceHistory, append_rows, parse_month
+
+
+def row(month, commodity='Wheat', modal=2000.0, state='India', district='All', change=''):
+    return {'month': month, 'commodity_name': commodity, 'avg_modal_price': modal, 'avg_min_price': modal - 100,
+            'avg_max_price': modal + 100, 'state_name': state, 'district_name': district,
+            'calculationType': 'Monthly', 'change': change}
+
+
+def write_csv(path, rows):
+    lines = [','.join(COLUMNS)] + [','.join(str(r[col]) for col in COLUMNS) for r in rows]
+    path.write_bytes(('\r\n'.join(lines) + '\r\n').encode())
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_history_module, 'REFRESH_INTERVAL', 0.0)  # every query looks at the file
+    path = tmp_path / 'prices.csv'
+    write_csv(path, [row('2024-03-01', modal=2100), row('2024-01-01', modal=2000), row('2024-02-01', modal=2050),
+                     row('2024-01-01', 'Rice', 3000), row('2024-02-01', 'Rice', 3100, state='Punjab', district='Ludhiana')])
+    return path
+
+
+def months(series):
+    return [point['month'] for point in series['points']]
+
+
+def test_rows_are_sorted_by_series_and_month(csv_path):
+    history = PriceHistory.from_csv(str(csv_path))
+    wheat, = history.query('wheat')  # names ignore case
+    assert months(wheat) == ['2024-01', '2024-02', '2024-03']
+    assert [point['change'] for point in wheat['points']] == [None, 50.0, 50.0]  # filled from the modal prices
+    assert wheat['summary']['latest_modal_price'] == 2100.0 and wheat['summary']['total_change'] == 100.0
+    assert [(s['state_name'], s['district_name']) for s in history.query('Rice')] == [('India', 'All'), ('Punjab', 'Ludhiana')]
+    assert history.query('Rice', 'Punjab') [0]['points'][0]['avg_modal_price'] == 3100.0
+    assert history.query('Millet') == []
+
+
+def test_range_queries(csv_path):
+    history = PriceHistory.from_csv(str(csv_path))
+    assert months(history.query('Wheat', start='2024-02')[0]) == ['2024-02', '2024-03']
+    assert months(history.query('Wheat', end='2024-02-01')[0]) == ['2024-01', '2024-02']
+    assert months(history.query('Wheat', start='2024-02', end='2024-02')[0]) == ['2024-02']
+    empty, = history.query('Wheat', start='2025-01')
+    assert empty['points'] == [] and empty['summary'] == {'count': 0}
+    yearly = history.query('Wheat', group='year')[0]['yearly']
+    assert yearly == [{'year': 2024, 'months': 3, 'mean_modal_price': 2050.0}]
+    with pytest.raises(ValueError):
+        history.query('Wheat', start='2024-13')
+
+
+def test_appended_rows_are_picked_up_in_sorted_position(csv_path):
+    history = PriceHistory.from_csv(str(csv_path))
+    assert append_rows(str(csv_path), [row('2023-12', modal=1900), row('2024-04', modal=2200),
+                                       row('2024-02', modal=2075)]) == 3  # the last one replaces February
+    wheat, = history.query('Wheat')
+    assert months(wheat) == ['2023-12', '2024-01', '2024-02', '2024-03', '2024-04']
+    assert [point['avg_modal_price'] for point in wheat['points']] == [1900.0, 2000.0, 2075.0, 2100.0, 2200.0]
+    assert len(history) == 7
+    assert history.refresh(force=True) == 0  # nothing new
+
+
+def test_insert_keeps_series_contiguous(csv_path):
+    history = PriceHistory.from_csv(str(csv_path))
+    history.insert([row('2024-01', 'Maize', 1800), row('2023-06', 'Rice', 2900), row('2024-02', 'Maize', 1850)])
+    assert months(history.query('Maize')[0]) == ['2024-01', '2024-02']
+    assert months(history.query('Rice', 'India')[0]) == ['2023-06', '2024-01']
+    assert months(history.query('Wheat')[0]) == ['2024-01', '2024-02', '2024-03']
+    assert history.stats()['series'] == 4
+
+
+def test_partial_line_waits_for_its_newline(csv_path):
+    history = PriceHistory.from_csv(str(csv_path))
+    with open(csv_path, 'ab') as f:
+        f.write(b'2024-04-01,Wheat,2200,2100,2300,India,All,Monthly,')
+    assert history.refresh(force=True) == 0
+    with open(csv_path, 'ab') as f:
+        f.write(b'\r\n')
+    assert history.refresh(force=True) == 1
+    assert months(history.query('Wheat')[0])[-1] == '2024-04'
+
+
+def test_replaced_file_is_reloaded(csv_path):
+    history = PriceHistory.from_csv(str(csv_path))
+    write_csv(csv_path, [row('2020-05-01', 'Tea', 150)])  # shorter than what was loaded
+    assert history.query('Wheat') == []
+    assert months(history.query('Tea')[0]) == ['2020-05']
+    assert len(history) == 1
+
+
+@pytest.mark.parametrize('line', [
+    b'2024-04-01,Wheat,abc,2100,2300,India,All,Monthly,',
+    b'2024-13-01,Wheat,2200,2100,2300,India,All,Monthly,',
+    b'2024-04-01,Wheat,2200,2100',
+    b'2024-04-01,,2200,2100,2300,India,All,Monthly,',
+    b'2024-04-01,Wheat,inf,2100,2300,India,All,Monthly,',
+])
+def test_malformed_rows_are_skipped(csv_path, line):
+    history = PriceHistory.from_csv(str(csv_path))
+    with open(csv_path, 'ab') as f:
+        f.write(line + b'\r\n2024-05-01,Wheat,2250,2150,2350,India,All,Monthly,\r\n')
+    wheat, = history.query('Wheat')  # does not raise
+    assert months(wheat) == ['2024-01', '2024-02', '2024-03', '2024-05']
+    assert history.stats()['skipped_rows'] == 1
+    # The offset moved past the bad row, so it is not read (or reported) again
+    append_rows(str(csv_path), [row('2024-06')])
+    assert months(history.query('Wheat')[0])[-1] == '2024-06'
+    assert history.stats()['skipped_rows'] == 1
+
+
+def test_append_rows_validates_before_writing(csv_path):
+    size = csv_path.stat().st_size
+    with pytest.raises(ValueError, match="Row 2: missing state_name"):
+        append_rows(str(csv_path), [row('2024-04'), dict(row('2024-05'), state_name='')])
+    assert csv_path.stat().st_size == size
+
+
+def test_parse_month():
+    assert parse_month('2024-01-01') == parse_month('2024-01') == 2024 * 12
+    with pytest.raises(ValueError):
+        parse_month('January')
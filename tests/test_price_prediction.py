@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pytest
+
+import app as app_module
+
+pytestmark = pytest.mark.skipif(not os.path.exists(os.path.join(app_module.registry.base_dir, 'crop_price.pkl')),
+                                reason="models/crop_price.pkl is not present")
+
+INPUTS = [
+    dict(month='March', commodity_name='Rice', state_name='Uttar Pradesh', district_name='Lucknow', calculationType='Monthly'),
+    dict(month='11', commodity_name='Wheat', state_name='Punjab', district_name='Ludhiana', calculationType='Monthly'),
+    dict(month='July', commodity_name='Maize', state_name='Bihar', district_name='Patna', calculationType='Monthly',
+         avg_min_price=1500.0, avg_max_price=2300.0, change=-40.0),
+]
+
+
+def _with_defaults(data):
+    return dict(app_module.PRICE_DEFAULTS, **data)
+
+
+@pytest.mark.parametrize('data', INPUTS)
+def test_inverse_transform_matches_the_scaler(data, monkeypatch):
+    """predict_price undoes the MinMax scaling of the target exactly as the fitted scaler would."""
+    monkeypatch.setattr(app_module, 'PRICE_TABLE', 'off')
+    data = _with_defaults(data)
+    registry = app_module.registry
+    scaled = registry.get('price_model').predict(registry.get('price_encoder').encode(data))[0]
+    scaler = registry.get('price_scaler')
+    row = np.zeros((1, scaler.n_features_in_))
+    row[0, 0] = scaled  # the scaler was fitted with the target first
+    expected = scaler.inverse_transform(row)[0, 0]
+    assert app_module.predict_price(data) == pytest.approx(expected, rel=1e-9)
+
+
+@pytest.mark.parametrize('data', INPUTS[:2])
+def test_table_matches_the_model(data, monkeypatch):
+    data = _with_defaults(data)
+    from_table = app_module.predict_price(data)
+    monkeypatch.setattr(app_module, 'PRICE_TABLE', 'off')
+    assert from_table == pytest.approx(app_module.predict_price(data), rel=1e-9)
@@ -0,0 +1,33 @@
+import time
+
+from krishi.profiler import SamplingProfiler
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+def test_samples_are_final_once_stop_returns(tmp_path):
+    for _ in range(20):
+        profiler = SamplingProfiler(interval=0.0005).start()
+        busy(0.01)
+        profiler.stop()
+        snapshot = dict(profiler.samples)
+        time.sleep(0.003)  # several intervals: a sampler still running would add samples
+        assert dict(profiler.samples) == snapshot
+        with open(profiler.save(str(tmp_path), 'busy'), encoding='utf-8') as f:
+            assert f.read() == profiler.folded()
+
+
+def test_folded_output_names_the_profiled_function():
+    profiler = SamplingProfiler(interval=0.001).start()
+    busy(0.05)
+    profiler.stop()
+    folded = profiler.folded()
+    assert 'busy (test_profiler.py:' in folded
+    for line in folded.splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert ';' in stack and int(count) > 0
+    assert profiler.duration >= 0.05
@@ -0,0 +1,81 @@
+import os
+import pickle
+
+import pytest
+
+import app as app_module
+from krishi.registry import ModelRegistry, file_fingerprint
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    (tmp_path / 'model.pkl').write_bytes(pickle.dumps('v1'))
+    return tmp_path
+
+
+def replace(path, value):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump(value, f)
+    os.replace(tmp, path)
+
+
+def test_fingerprint_is_of_the_file_as_loaded(models_dir):
+    registry = ModelRegistry(str(models_dir))
+    registry.register('model', 'model.pkl')
+    path = str(models_dir / 'model.pkl')
+    v1 = file_fingerprint(path)
+    assert registry.get('model') == 'v1' and registry.fingerprint('model') == v1
+    version = registry.version(['model'])
+
+    # The file changes on disk but this process still serves v1, so the version stays
+    replace(path, 'v2')
+    assert registry.fingerprint('model') == v1 and registry.version(['model']) == version
+
+    registry.unload('model')
+    assert registry.get('model') == 'v2'
+    assert registry.fingerprint('model') == file_fingerprint(path)
+    assert registry.version(['model']) != version
+
+
+def test_file_replaced_during_the_load_is_loaded_again(models_dir):
+    path = str(models_dir / 'model.pkl')
+    loads = []
+
+    def load(path, mmap_mode=None):
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+        if not loads:
+            replace(path, 'v2')  # swapped in while the first load was running
+        loads.append(value)
+        return value
+
+    registry = ModelRegistry(str(models_dir))
+    registry.register('model', 'model.pkl', loader=load)
+    assert registry.get('model') == 'v2'
+    assert loads == ['v1', 'v2']
+    assert registry.fingerprint('model') == file_fingerprint(path)
+    assert registry.stats()['artifacts']['model']['fingerprint'] == file_fingerprint(path)
+
+
+def test_derived_artifacts_report_their_source(models_dir):
+    class Derived:
+        source_fingerprint = 'abc'
+
+    registry = ModelRegistry(str(models_dir))
+    registry.register_factory('derived', lambda reg: Derived())
+    registry.register_factory('plain', lambda reg: object())
+    assert registry.fingerprint('derived') == 'abc'
+    with pytest.raises(ValueError, match="does not record"):
+        registry.fingerprint('plain')
+
+
+def test_result_cache_keys_follow_the_loaded_models():
+    registry = app_module.registry
+    cache = registry.get('result_cache')
+    names = app_module.result_cache_artifacts()
+    assert cache.version == registry.version(names)
+    models = registry.base_dir
+    crop = registry.fingerprint(names[2])
+    assert crop == file_fingerprint(os.path.join(models, 'crop_model.pkl'))
+    assert registry.fingerprint('fertilizer_lookup') == file_fingerprint(os.path.join(models, 'fertilizer.pkl'))
@@ -0,0 +1,29 @@
+from krishi.result_cache import MemoryBackend, ResultCache, SQLiteBackend
+
+
+def test_entries_from_another_model_version_are_not_served(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    old = ResultCache(SQLiteBackend(path, 100), version='v1')
+    key, = old.keys(old.quantize([[90, 42, 43, 20.879, 82, 6.5, 202.9]]))
+    old.put(key, 'rice')
+    assert old.get(key) == 'rice'
+
+    # A worker started after the model files changed shares the file but not the keys
+    new = ResultCache(SQLiteBackend(path, 100), version='v2')
+    new_key, = new.keys(new.quantize([[90, 42, 43, 20.879, 82, 6.5, 202.9]]))
+    assert new_key != key and new.get(new_key) is None
+    assert new.stats()['misses'] == 1
+
+
+def test_inputs_are_quantized_per_feature():
+    cache = ResultCache(MemoryBackend(10), decimals=[0, 1])
+    assert cache.keys(cache.quantize([[1.4, 2.26]])) == cache.keys(cache.quantize([[0.6, 2.34]]))
+    assert cache.keys(cache.quantize([[1.4, 2.26]])) != cache.keys(cache.quantize([[1.4, 2.36]]))
+
+
+def test_memory_backend_evicts_least_recently_used():
+    cache = ResultCache(MemoryBackend(2))
+    for key in 'abc':
+        cache.put(key, key.upper())
+    assert cache.get('a') is None and cache.get('c') == 'C'
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,71 @@
+"""A Gemini that takes seconds to answer must not slow the model routes, and must be shed with 503s."""
+import threading
+import time
+
+import pytest
+import requests
+
+import app as app_module
+from benchmarks.load import InProcessServer
+from benchmarks.routes import PREDICT_FORM
+from benchmarks.stubs import GeminiStub
+from krishi.limits import UpstreamLimiter
+
+GEMINI_DELAY = 3.0
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(app_module, 'chat_cache', None)  # every chat must wait on the stub
+    monkeypatch.setattr(app_module, 'get_gemini_model', lambda: GeminiStub(GEMINI_DELAY))
+    # Two calls in flight, one queued for 2 s (less than the upstream delay)
+    monkeypatch.setattr(app_module, 'gemini_limiter', UpstreamLimiter('gemini', 2, 1, 2.0, retry_after=7))
+    with InProcessServer(app_module.app) as server:
+        requests.post(server.url + '/predict', data=PREDICT_FORM, timeout=30)  # load the models before timing
+        yield server
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_slow_gemini_is_shed_while_model_routes_stay_fast(server):
+    limiter = app_module.gemini_limiter
+    chats = []
+
+    def chat(index):
+        response = requests.post(server.url + '/api/chat', timeout=30,
+                                 json={'message': 'When do I sow wheat?', 'session_id': f"slow{index}"})
+        chats.append(response)
+
+    threads = [threading.Thread(target=chat, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: limiter.stats()['active'] == 2 and limiter.stats()['waiting'] == 1)
+
+    # Both slots and the queue place are taken: the next chat is refused at once
+    started = time.monotonic()
+    busy = requests.post(server.url + '/api/chat', json={'message': 'Which fertilizer for paddy?'}, timeout=30)
+    assert time.monotonic() - started < 0.5
+    assert busy.status_code == 503 and busy.headers['Retry-After'] == '7'
+    stream = requests.post(server.url + '/api/chat/stream', json={'message': 'Which fertilizer for paddy?'}, timeout=30)
+    assert stream.status_code == 503 and stream.headers['Retry-After'] == '7'
+
+    # CPU-bound routes do not queue behind the stalled upstream calls
+    session = requests.Session()
+    for _ in range(5):
+        started = time.monotonic()
+        assert session.post(server.url + '/predict', data=PREDICT_FORM, timeout=30).status_code == 200
+        assert time.monotonic() - started < 0.5
+    assert limiter.stats()['active'] == 2
+
+    for thread in threads:
+        thread.join()
+    # The two admitted chats were answered; the queued one gave up after queue_timeout
+    assert sorted(response.status_code for response in chats) == [200, 200, 503]
+    stats = limiter.stats()
+    assert stats['rejected_full'] == 2 and stats['rejected_timeout'] == 1
+    assert stats['peak_active'] == 2 and stats['active'] == 0
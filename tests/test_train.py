@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from krishi import train
+
+
+@pytest.mark.parametrize('kind, params', [
+    ('crop', {'n_estimators': 10, 'max_depth': 8}),
+    ('fertilizer', {'n_estimators': 25, 'max_depth': 5}),
+    ('price', {'n_estimators': 10, 'max_depth': 5}),
+])
+def test_latency_is_timed_on_the_served_model(kind, params):
+    data = train._dataset(kind, 'datasets')
+    model = train._estimator(kind, params).fit(data[0], data[2] if kind != 'price' else data[3])
+    X_test = data[1]
+    served = train.serving_model(kind, model)
+    np.testing.assert_array_equal(served.predict(X_test), model.predict(X_test))
+    assert train.measure_latency(served, X_test[:1], calls=3) > 0
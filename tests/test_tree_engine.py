@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from krishi.tree_engine import FlatForest, load_sources, parity_inputs
+
+
+@pytest.fixture(scope='module')
+def sources():
+    return load_sources('models')
+
+
+@pytest.fixture(scope='module')
+def inputs(sources):
+    _, ms, sc = sources
+    return parity_inputs('datasets', ms, sc, random_rows=5000)
+
+
+@pytest.mark.parametrize('name', ['crop_model', 'fertilizer_model'])
+def test_flat_forest_matches_sklearn(sources, inputs, name):
+    estimator = sources[0][name][1]
+    forest = FlatForest.from_estimator(estimator)
+    X = inputs[name]
+    np.testing.assert_array_equal(forest.predict(X), estimator.predict(X))
+    np.testing.assert_allclose(forest.predict_proba(X), estimator.predict_proba(X), rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('name', ['crop_model', 'fertilizer_model'])
+def test_saved_forest_matches_sklearn(sources, inputs, name, tmp_path):
+    estimator = sources[0][name][1]
+    directory = str(tmp_path / name)
+    FlatForest.from_estimator(estimator).save(directory)
+    forest, _ = FlatForest.load(directory)  # memory-mapped, as the app serves it
+    X = inputs[name][:2000]
+    np.testing.assert_array_equal(forest.predict(X), estimator.predict(X))
+    np.testing.assert_allclose(forest.predict_proba(X), estimator.predict_proba(X), rtol=0, atol=1e-12)
+
+
+def test_rejects_wrong_shape(sources):
+    forest = FlatForest.from_estimator(sources[0]['crop_model'][1])
+    with pytest.raises(ValueError):
+        forest.predict(np.zeros((2, forest.n_features_in_ + 1)))
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from benchmarks.stubs import WeatherStub
+from krishi.weather import WeatherClient
+
+
+@pytest.fixture
+def stub():
+    with WeatherStub(delay=0.2) as stub:
+        yield stub
+
+
+def _concurrently(n, fn):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def call(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_identical_requests_share_one_upstream_call(stub):
+    client = WeatherClient('test', url=stub.url)
+    results = _concurrently(20, lambda: client.get_weather('Lucknow'))
+    assert stub.calls == 1
+    assert all(result == results[0] and result['temperature'] == 29.5 for result in results)
+    stats = client.stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == 19
+
+
+def test_city_key_ignores_case_and_spacing(stub):
+    client = WeatherClient('test', url=stub.url)
+    client.get_weather('New Delhi')
+    client.get_weather('  new   DELHI ')
+    assert stub.calls == 1
+
+
+def test_not_found_is_cached(stub):
+    client = WeatherClient('test', url=stub.url)
+    first = client.get_weather('Nowhere')
+    second = client.get_weather('Nowhere')
+    assert "not found" in first['error'] and second == first
+    assert stub.calls == 1
+    assert client.stats()['negative_hits'] == 1
+
+
+def test_other_errors_are_not_cached():
+    client = WeatherClient('test', url='http://127.0.0.1:9/unreachable', timeout=(0.2, 0.2))
+    assert client.get_weather('Lucknow')['error']
+    assert client.get_weather('Lucknow')['error']
+    assert client.stats()['upstream_calls'] == 2
+
+
+def test_stale_while_revalidate_refreshes_once_in_the_background(stub):
+    client = WeatherClient('test', url=stub.url, ttl=0.5, stale_ttl=30)
+    client.get_weather('Lucknow')
+    time.sleep(0.6)  # expired, but within stale_ttl
+
+    started = time.monotonic()
+    results = _concurrently(10, lambda: client.get_weather('Lucknow'))
+    assert time.monotonic() - started < stub.delay  # served from the stale entry, not upstream
+    assert all(result['temperature'] == 29.5 for result in results)
+    assert client.stats()['stale_hits'] == 10
+
+    deadline = time.monotonic() + 5
+    while client.stats()['in_flight'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stub.calls == 2  # the first lookup and exactly one refresh
+    client.get_weather('Lucknow')
+    assert client.stats()['hits'] == 1 and stub.calls == 2